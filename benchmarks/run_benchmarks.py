@@ -0,0 +1,291 @@
+"""
+Benchmark suite
+
+Times the Mortgage hot paths, schedule generation, report rendering and the CLI end to end. Results are written
+as JSON and can be compared against a stored baseline:
+
+    python -m benchmarks.run_benchmarks run -o benchmarks/results.json
+    python -m benchmarks.run_benchmarks compare benchmarks/baseline.json benchmarks/results.json
+
+The scaling of the parallel schedule over worker counts is reported separately:
+
+    python -m benchmarks.run_benchmarks scaling -w 1,2,4,8,16,32
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+from typing import Any, Callable, Dict, List
+
+import click
+import numpy as np
+
+from mortgage_simulator import __version__
+from mortgage_simulator.mortgage import Mortgage
+from mortgage_simulator.parallel_schedule import parallel_schedule
+from mortgage_simulator.portfolio import MortgagePortfolio
+from mortgage_simulator.schedule_report import ScheduleReport
+from mortgage_simulator.simulation_report import SimulationReport
+from mortgage_simulator.tranches import MultiTrancheMortgage
+
+BENCHMARKS: Dict[str, Callable[[], Callable[[], Any]]] = {}
+
+PROPERTY_VALUE = 4000000
+DOWN_PAYMENT = 800000
+YEARLY_INCOME = 600000
+RATE = 0.0275
+SCALING_WORKERS = "1,2,4,8,16,32"
+
+
+def benchmark(name: str) -> Callable:
+    """
+    Register a benchmark, the decorated function does the setup and returns the callable to time
+    :param name:
+    :return:
+    """
+
+    def decorator(setup: Callable[[], Callable[[], Any]]) -> Callable[[], Callable[[], Any]]:
+        BENCHMARKS[name] = setup
+        return setup
+
+    return decorator
+
+
+def _loan() -> Mortgage:
+    return Mortgage(PROPERTY_VALUE, DOWN_PAYMENT, YEARLY_INCOME, RATE)
+
+
+def _payment_for_months(loan: Mortgage, months: int) -> float:
+    return loan.monthly_payment(months / 12.0)
+
+
+@benchmark("mortgage.construct")
+def _construct():
+    return _loan
+
+
+@benchmark("mortgage.properties")
+def _properties():
+    def run():
+        loan = _loan()
+        return loan.minimum_monthly_payment, loan.maximum_term_y, loan.min_amort_rate, loan.apy
+
+    return run
+
+
+@benchmark("mortgage.simulate_by_payment")
+def _simulate_by_payment():
+    loan = _loan()
+    return lambda: loan.simulate_by_payment(20000, title="monthly payment")
+
+
+for _months in (12, 360, 600):
+
+    @benchmark(f"mortgage.get_payment_schedule.{_months}")
+    def _schedule(months: int = _months):
+        loan = _loan()
+        payment = _payment_for_months(loan, 600)
+        return lambda: loan.get_payment_schedule(payment, months)
+
+
+@benchmark("schedule_report.get_report.360")
+def _schedule_report():
+    loan = _loan()
+    schedule = loan.get_payment_schedule(_payment_for_months(loan, 360), 360)
+    return lambda: ScheduleReport(schedule).get_report()
+
+
+@benchmark("simulation_report.get_report")
+def _simulation_report():
+    loan = _loan()
+    simulations = [
+        loan.simulate_by_payment(20000, title="monthly payment"),
+        loan.simulate_by_payment(loan.minimum_monthly_payment, title="minimum payment"),
+        loan.simulate_by_term(15, title="term 15.0 Y"),
+    ]
+
+    def run():
+        report = SimulationReport()
+        for simulation in simulations:
+            report.add_simulation(simulation)
+        return report.get_report()
+
+    return run
+
+
+@benchmark("tranches.simulation_values.100k")
+def _tranche_simulation_values():
+    rng = np.random.default_rng(0)
+    loans = rng.uniform(100000, 1000000, (100000, 8))
+    loans[:, 5:] *= rng.random((100000, 3)) < 0.5
+    households = MultiTrancheMortgage(
+        loans.sum(axis=1) / 0.75, loans.sum(axis=1) / 5, loans, rng.uniform(1, 5, (100000, 8))
+    )
+    payments = households.minimum_monthly_payment * 1.2
+    return lambda: households.simulation_values(payments)
+
+
+def _loan_book(loans: int) -> MortgagePortfolio:
+    rng = np.random.default_rng(0)
+    return MortgagePortfolio(rng.uniform(2e6, 6e6, loans), rng.uniform(5e5, 1.5e6, loans), YEARLY_INCOME, RATE)
+
+
+@benchmark("parallel_schedule.10k.360")
+def _parallel_schedule():
+    portfolio = _loan_book(10000)
+    payments = portfolio.minimum_monthly_payment * 1.2
+    return lambda: parallel_schedule(portfolio, payments, 360).close()
+
+
+def _cli(*args: str) -> Callable[[], Any]:
+    command = [sys.executable, "-m", "mortgage_simulator.simulate_mortgage", *args]
+    return lambda: subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+
+
+@benchmark("cli.simulate")
+def _cli_simulate():
+    return _cli("simulate", "-v", str(PROPERTY_VALUE), "-d", str(DOWN_PAYMENT), "-p", "20000")
+
+
+@benchmark("cli.schedule")
+def _cli_schedule():
+    return _cli("schedule", "-v", str(PROPERTY_VALUE), "-d", str(DOWN_PAYMENT), "-p", "20000")
+
+
+@benchmark("cli.minimum_payment")
+def _cli_minimum_payment():
+    return _cli("minimum-payment", "-p", "3000000", "-a", "0.02")
+
+
+def time_benchmark(function: Callable[[], Any], repeat: int, min_time: float) -> Dict[str, Any]:
+    """
+    Time a callable, the number of calls per sample is chosen so that a sample lasts at least `min_time`
+    :param function:
+    :param repeat: number of samples
+    :param min_time: minimum duration of a sample in seconds
+    :return: seconds per call statistics
+    """
+    timer = timeit.Timer(function)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    samples = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {"min": min(samples), "median": statistics.median(samples), "number": number, "repeat": repeat}
+
+
+def run_benchmarks(names: List[str], repeat: int, min_time: float) -> Dict[str, Any]:
+    """
+    Run benchmarks
+    :param names: benchmark name prefixes, all benchmarks when empty
+    :param repeat:
+    :param min_time:
+    :return:
+    """
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if names and not any(name.startswith(prefix) for prefix in names):
+            continue
+        results[name] = time_benchmark(setup(), repeat, min_time)
+        click.echo(f"{name:<40} {results[name]['min'] * 1e6:>14,.1f} us", err=True)
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+
+
+def schedule_scaling(workers: List[int], loans: int, months: int, repeat: int) -> Dict[str, Any]:
+    """
+    Time `parallel_schedule` for every worker count, process pool start up included. The efficiency of n workers
+    is the speedup over one worker divided by n, worker counts above the CPU count cannot reach 1
+    :param workers: worker counts, 1 being the reference
+    :param loans:
+    :param months:
+    :param repeat: samples per worker count, the fastest one is kept
+    :return:
+    """
+    portfolio = _loan_book(loans)
+    payments = portfolio.minimum_monthly_payment * 1.2
+    results = {}
+    for count in sorted(set(workers) | {1}):
+        results[count] = min(
+            timeit.repeat(
+                lambda: parallel_schedule(portfolio, payments, months, workers=count).close(), number=1, repeat=repeat
+            )
+        )
+    scaling = []
+    for count, seconds in results.items():
+        speedup = results[1] / seconds
+        scaling.append({"workers": count, "seconds": seconds, "speedup": speedup, "efficiency": speedup / count})
+        click.echo(f"{count:>4} workers {seconds:>10.3f} s {speedup:>8.2f}x {speedup / count:>8.1%}", err=True)
+    return {"cpus": os.cpu_count(), "loans": loans, "months": months, "scaling": scaling}
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Compare benchmark results on their minimum time
+    :param baseline:
+    :param current:
+    :param threshold: relative slowdown flagged as a regression, e.g. 0.2 for 20 %
+    :return: one entry per benchmark present in both results
+    """
+    comparison = []
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        ratio = result["min"] / baseline["results"][name]["min"]
+        comparison.append({"name": name, "ratio": ratio, "regression": ratio > 1.0 + threshold})
+    return comparison
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command("run", help="run the benchmarks and write the results as JSON")
+@click.argument("names", nargs=-1)
+@click.option("-o", "--output", type=click.File("w"), default="-", help="JSON results file, stdout by default")
+@click.option("-r", "--repeat", type=int, default=5, show_default=True, help="samples per benchmark")
+@click.option("--min-time", type=float, default=0.05, show_default=True, help="minimum seconds per sample")
+def run_command(names: List[str], output, repeat: int, min_time: float) -> None:
+    json.dump(run_benchmarks(list(names), repeat, min_time), output, indent=2)
+    output.write("\n")
+
+
+@cli.command("scaling", help="report the scaling efficiency of the parallel schedule over worker counts as JSON")
+@click.option("-o", "--output", type=click.File("w"), default="-", help="JSON results file, stdout by default")
+@click.option("-w", "--workers", default=SCALING_WORKERS, show_default=True, help="comma separated worker counts")
+@click.option("-n", "--loans", type=int, default=100000, show_default=True, help="loans in the book")
+@click.option("-m", "--months", type=int, default=360, show_default=True, help="scheduled months")
+@click.option("-r", "--repeat", type=int, default=3, show_default=True, help="samples per worker count")
+def scaling_command(output, workers: str, loans: int, months: int, repeat: int) -> None:
+    counts = [int(count) for count in workers.split(",")]
+    json.dump(schedule_scaling(counts, loans, months, repeat), output, indent=2)
+    output.write("\n")
+
+
+@cli.command("compare", help="compare results against a baseline, exits with 1 on regressions")
+@click.argument("baseline", type=click.File("r"))
+@click.argument("current", type=click.File("r"))
+@click.option("-t", "--threshold", type=float, default=0.2, show_default=True, help="tolerated relative slowdown")
+def compare_command(baseline, current, threshold: float) -> None:
+    comparison = compare_results(json.load(baseline), json.load(current), threshold)
+    for entry in comparison:
+        flag = "REGRESSION" if entry["regression"] else ""
+        click.echo(f"{entry['name']:<40} {entry['ratio']:>8.2f}x {flag}")
+    if any(entry["regression"] for entry in comparison):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
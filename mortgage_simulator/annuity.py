@@ -0,0 +1,131 @@
+"""
+Closed-form annuity formulas
+
+`loan` is the outstanding principal, `r` the monthly interest rate and `payment` the constant monthly
+installment. All functions broadcast over NumPy arrays and also accept plain floats.
+"""
+from typing import Any, Dict
+
+import numpy as np
+
+
+def term_m(loan: Any, r: Any, payment: Any) -> Any:
+    """
+    number of months needed to repay the loan, NaN when the payment does not cover the interest
+    :param loan:
+    :param r:
+    :param payment:
+    :return:
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (np.log(payment / r) - np.log(payment / r - loan)) / np.log(1 + r)
+
+
+def monthly_payment(loan: Any, r: Any, term_months: Any) -> Any:
+    """
+    constant installment repaying the loan in `term_months` months
+    :param loan:
+    :param r:
+    :param term_months:
+    :return:
+    """
+    return r * loan / (1 - (1 + r) ** (-term_months))
+
+
+def balance(loan: Any, r: Any, payment: Any, months: Any) -> Any:
+    """
+    remaining principal after `months` installments
+    :param loan:
+    :param r:
+    :param payment:
+    :param months:
+    :return:
+    """
+    growth = (1 + r) ** months
+    return loan * growth - payment * (growth - 1) / r
+
+
+def cumulative_interest(loan: Any, r: Any, payment: Any, months: Any) -> Any:
+    """
+    interest paid over the first `months` installments
+    :param loan:
+    :param r:
+    :param payment:
+    :param months:
+    :return:
+    """
+    return payment * months - (loan - balance(loan, r, payment, months))
+
+
+def monthly_payment_derivatives(loan: Any, r: Any, term_months: Any) -> Dict[str, Any]:
+    """
+    partial derivatives of `monthly_payment` with respect to the loan, the monthly rate and the term
+    :param loan:
+    :param r:
+    :param term_months:
+    :return: keyed by "loan", "r" and "term_months"
+    """
+    discount = (1 + r) ** (-term_months)
+    denominator = 1 - discount
+    payment = r * loan / denominator
+    return {
+        "loan": r / denominator,
+        "r": payment / r - payment * term_months * discount / ((1 + r) * denominator),
+        "term_months": -payment * discount * np.log1p(r) / denominator,
+    }
+
+
+def term_m_derivatives(loan: Any, r: Any, payment: Any) -> Dict[str, Any]:
+    """
+    partial derivatives of `term_m` with respect to the loan, the monthly rate and the payment, NaN when the
+    payment does not cover the interest
+    :param loan:
+    :param r:
+    :param payment:
+    :return: keyed by "loan", "r" and "payment"
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_growth = np.log1p(r)
+        # payment left for amortization in the first month, the term diverges as it goes to 0
+        amortization = np.where(payment > r * loan, payment - r * loan, np.nan)
+        return {
+            "loan": r / (amortization * log_growth),
+            "r": loan / (amortization * log_growth) - term_m(loan, r, payment) / ((1 + r) * log_growth),
+            "payment": -r * loan / (payment * amortization * log_growth),
+        }
+
+
+def total_interest_derivatives(loan: Any, r: Any, payment: Any) -> Dict[str, Any]:
+    """
+    partial derivatives of the total interest `payment * term_m - loan` with respect to the loan, the monthly rate
+    and the payment
+    :param loan:
+    :param r:
+    :param payment:
+    :return: keyed by "loan", "r" and "payment"
+    """
+    term = term_m_derivatives(loan, r, payment)
+    with np.errstate(invalid="ignore"):
+        return {
+            "loan": payment * term["loan"] - 1,
+            "r": payment * term["r"],
+            "payment": term_m(loan, r, payment) + payment * term["payment"],
+        }
+
+
+def balance_derivatives(loan: Any, r: Any, payment: Any, months: Any) -> Dict[str, Any]:
+    """
+    partial derivatives of `balance` with respect to the loan, the monthly rate and the payment
+    :param loan:
+    :param r:
+    :param payment:
+    :param months:
+    :return: keyed by "loan", "r" and "payment"
+    """
+    growth = (1 + r) ** months
+    growth_derivative = months * growth / (1 + r)
+    return {
+        "loan": growth,
+        "r": loan * growth_derivative - payment * (growth_derivative * r - (growth - 1)) / r**2,
+        "payment": -(growth - 1) / r,
+    }
@@ -0,0 +1,236 @@
+"""
+Batch simulation of loan applications
+
+Records are read one at a time from CSV or JSON lines, grouped in chunks and evaluated as a `MortgagePortfolio`
+on a process pool. Only a bounded window of chunks is in flight, and results are written in input order. Every
+output record is the input record with the missing fields filled in and the simulation results appended.
+"""
+import collections
+import csv
+import itertools
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Mapping, TextIO, Tuple
+
+import numpy as np
+
+from mortgage_simulator.constants import BATCH_FORMATS, DEFAULT_CHUNK_SIZE
+from mortgage_simulator.mortgage import SENSITIVITY_FIELDS
+from mortgage_simulator.portfolio import MortgagePortfolio
+from mortgage_simulator.profiling import stage
+from mortgage_simulator.utils import normalize_rate
+
+BATCH_FIELDS = (
+    "property_value",
+    "down_payment",
+    "interest_rate",
+    "mortgage_term",
+    "monthly_income",
+    "monthly_payment",
+)
+
+BATCH_COLUMNS = (
+    "loan",
+    "loan_to_value_ratio",
+    "loan_to_income_ratio",
+    "exceeds_loan_to_value_limit",
+    "min_amort_rate",
+    "minimum_monthly_payment",
+    "below_minimum_payment",
+    "term_y",
+    "total_interest",
+    "minimum_payment_term_y",
+    "minimum_payment_total_interest",
+    "term_monthly_payment",
+    "term_total_interest",
+)
+
+FLAG_COLUMNS = ("exceeds_loan_to_value_limit", "below_minimum_payment")
+
+Record = Dict[str, Any]
+
+
+def infer_batch_format(path: str) -> str:
+    """
+    Batch file format from the file extension, CSV by default
+    :param path:
+    :return:
+    """
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    return "jsonl" if extension in ("jsonl", "ndjson", "json") else "csv"
+
+
+def read_records(stream: TextIO, file_format: str) -> Iterator[Record]:
+    """
+    Read records lazily
+    :param stream:
+    :param file_format: one of BATCH_FORMATS
+    :return:
+    """
+    if file_format == "csv":
+        yield from csv.DictReader(stream)
+    elif file_format == "jsonl":
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f"Unknown batch format {file_format}, expected one of {', '.join(BATCH_FORMATS)}")
+
+
+def record_values(record: Mapping[str, Any], defaults: Mapping[str, float]) -> Tuple[List[float], Record]:
+    """
+    Numeric inputs of a record, field names may use dashes as the command line options do
+    :param record:
+    :param defaults: values of the BATCH_FIELDS missing from the record, None for required fields
+    :return: values in BATCH_FIELDS order and the defaults that were used
+    """
+    if None in record:
+        # csv.DictReader collects the cells beyond the header under None
+        raise ValueError(f"{len(record[None])} more values than fields")
+    fields = {key.replace("-", "_"): value for key, value in record.items() if value not in (None, "")}
+    missing = {field: defaults.get(field) for field in BATCH_FIELDS if field not in fields}
+    required = [field for field, value in missing.items() if value is None]
+    if required:
+        raise ValueError(f"missing {', '.join(required)}")
+    fields.update(missing)
+    values = [float(fields[field]) for field in BATCH_FIELDS]
+    values[BATCH_FIELDS.index("interest_rate")] = normalize_rate(values[BATCH_FIELDS.index("interest_rate")])
+    inputs = dict(zip(BATCH_FIELDS, values))
+    # checked per record, `MortgagePortfolio` would only report the position within the chunk
+    if inputs["down_payment"] > inputs["property_value"]:
+        raise ValueError("negative loan to value ratio, the down payment exceeds the property value")
+    if inputs["monthly_income"] < 0:
+        raise ValueError("negative loan to income ratio, the monthly income is negative")
+    return values, missing
+
+
+def simulate_batch(values: np.ndarray, sensitivities: bool = False) -> np.ndarray:
+    """
+    Simulate records by monthly payment, by minimum payment and by term, as the simulate command does
+    :param values: one row per record with BATCH_FIELDS as columns
+    :param sensitivities: append the SENSITIVITY_FIELDS at the monthly payment and the mortgage term
+    :return: one row per record with BATCH_COLUMNS, and SENSITIVITY_FIELDS when requested, as columns
+    """
+    property_value, down_payment, interest_rate, mortgage_term, monthly_income, monthly_payment = values.T
+    portfolio = MortgagePortfolio(property_value, down_payment, monthly_income * 12, interest_rate)
+    minimum_payment = portfolio.minimum_monthly_payment
+    term_payment = portfolio.monthly_payment(mortgage_term)
+    columns = [
+        portfolio.loan,
+        portfolio.loan_to_value_ratio,
+        portfolio.loan_to_income_ratio,
+        portfolio.exceeds_loan_to_value_limit,
+        portfolio.min_amort_rate,
+        minimum_payment,
+        monthly_payment < minimum_payment,
+        portfolio.term_y(monthly_payment),
+        portfolio.total_interest(monthly_payment),
+        portfolio.term_y(minimum_payment),
+        portfolio.total_interest(minimum_payment),
+        term_payment,
+        portfolio.total_interest(term_payment),
+    ]
+    if sensitivities:
+        derivatives = portfolio.sensitivities(monthly_payment, mortgage_term)
+        columns += [derivatives[field] for field in SENSITIVITY_FIELDS]
+    return np.column_stack(columns)
+
+
+def run_batch(
+    records: Iterable[Record],
+    defaults: Mapping[str, float],
+    workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    sensitivities: bool = False,
+) -> Iterator[Record]:
+    """
+    Simulate records chunk by chunk, output records are yielded in input order
+    :param records:
+    :param defaults: values of the BATCH_FIELDS missing from a record
+    :param workers: number of worker processes, 1 runs in process
+    :param chunk_size: records per task
+    :param sensitivities: append the SENSITIVITY_FIELDS
+    :return:
+    """
+    chunks = _chunks(iter(records), defaults, chunk_size)
+    columns = BATCH_COLUMNS + SENSITIVITY_FIELDS if sensitivities else BATCH_COLUMNS
+    if workers <= 1:
+        for chunk, values in chunks:
+            with stage("compute"):
+                results = simulate_batch(values, sensitivities)
+            yield from _merge(chunk, results, columns)
+        return
+    # at most two chunks per worker are held in memory
+    pending: Deque[Tuple[List[Tuple[Record, Record]], Any]] = collections.deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk, values in chunks:
+            pending.append((chunk, executor.submit(simulate_batch, values, sensitivities)))
+            if len(pending) >= 2 * workers:
+                chunk, future = pending.popleft()
+                with stage("compute"):
+                    results = future.result()
+                yield from _merge(chunk, results, columns)
+        while pending:
+            chunk, future = pending.popleft()
+            with stage("compute"):
+                results = future.result()
+            yield from _merge(chunk, results, columns)
+
+
+def write_records(records: Iterable[Record], stream: TextIO, file_format: str) -> None:
+    """
+    Write records, the CSV header is taken from the first record
+    :param records:
+    :param stream:
+    :param file_format: one of BATCH_FORMATS
+    :return:
+    """
+    if file_format == "jsonl":
+        for record in records:
+            stream.write(json.dumps(record) + "\n")
+        return
+    if file_format != "csv":
+        raise ValueError(f"Unknown batch format {file_format}, expected one of {', '.join(BATCH_FORMATS)}")
+    writer = None
+    for record in records:
+        if writer is None:
+            writer = csv.DictWriter(stream, fieldnames=list(record), lineterminator="\n")
+            writer.writeheader()
+        writer.writerow(record)
+
+
+def _chunks(
+    records: Iterator[Record], defaults: Mapping[str, float], chunk_size: int
+) -> Iterator[Tuple[List[Tuple[Record, Record]], np.ndarray]]:
+    start = 0
+    while True:
+        with stage("parse"):
+            chunk = list(itertools.islice(records, chunk_size))
+            if not chunk:
+                return
+            values = []
+            missing = []
+            for index, record in enumerate(chunk, start=start):
+                try:
+                    record_value, record_missing = record_values(record, defaults)
+                except (ValueError, TypeError) as e:
+                    raise ValueError(f"Invalid record {index}: {e}") from e
+                values.append(record_value)
+                missing.append(record_missing)
+            start += len(chunk)
+            array = np.array(values, dtype=float).reshape(-1, len(BATCH_FIELDS))
+        yield list(zip(chunk, missing)), array
+
+
+def _merge(
+    chunk: List[Tuple[Record, Record]], results: np.ndarray, columns: Tuple[str, ...] = BATCH_COLUMNS
+) -> Iterator[Record]:
+    flags = [columns.index(column) for column in FLAG_COLUMNS]
+    for (record, missing), row in zip(chunk, results.tolist()):
+        for i in flags:
+            row[i] = bool(row[i])
+        # terms are undefined when the payment does not cover the interest
+        row = [None if isinstance(value, float) and math.isnan(value) else value for value in row]
+        yield {**record, **missing, **dict(zip(columns, row))}
@@ -0,0 +1,232 @@
+"""
+Aggregate cash flows of a loan book
+
+Loans are streamed in chunks. The month by month interest, amortization and remaining loan of a chunk are evaluated
+as one loans x months array with the closed-form schedule and added into running totals, so memory depends on the
+chunk size and the horizon, never on the number of loans, and no per-loan schedule is kept. Totals can be broken
+down by rate bucket or by any record field, e.g. an origination cohort.
+"""
+import itertools
+import re
+from typing import Any, Dict, Iterable, List, Mapping, Optional, TextIO
+
+import numpy as np
+
+from mortgage_simulator import annuity
+from mortgage_simulator.batch import (
+    BATCH_FIELDS,
+    Record,
+    infer_batch_format,
+    read_records,
+    record_values,
+    write_records,
+)
+from mortgage_simulator.constants import DEFAULT_CHUNK_SIZE
+from mortgage_simulator.portfolio import MortgagePortfolio
+from mortgage_simulator.profiling import stage
+from mortgage_simulator.schedule import PaymentSchedule
+
+CASH_FLOW_COLUMNS = ("month", "active_loans", "interest", "amortization", "remaining_loan")
+TOTAL_GROUP = "total"
+# record field of the months elapsed since origination, cash flows of older loans start further into their schedule
+AGE_FIELD = "age_months"
+DEFAULT_RATE_BUCKET = 0.005
+
+
+def loan_cash_flows(loan: Any, r: Any, monthly_payment: Any, months: Any) -> Dict[str, np.ndarray]:
+    """
+    Interest, amortization and remaining loan of loans at the end of the given months since origination, loans
+    stopping once repaid, their last installment only covering what remains. Inputs broadcast, e.g. loans as a
+    column against a row of months.
+    :param loan: loans at origination
+    :param r: monthly interest rates
+    :param monthly_payment:
+    :param months:
+    :return:
+    """
+    months = np.asarray(months)
+    remaining_loan = annuity.balance(loan, r, monthly_payment, months)
+    previous_loan = annuity.balance(loan, r, monthly_payment, np.maximum(months - 1, 0))
+    paying = (months > 0) & (previous_loan > 0)
+    interest = np.where(paying, previous_loan * r, 0.0)
+    amortization = np.where(paying, np.minimum(monthly_payment - interest, previous_loan), 0.0)
+    remaining_loan = np.maximum(remaining_loan, 0.0)
+    return {
+        "active_loans": remaining_loan > 0,
+        "interest": interest,
+        "amortization": amortization,
+        "remaining_loan": remaining_loan,
+    }
+
+
+def rate_buckets(rate: Any, width: float = DEFAULT_RATE_BUCKET) -> np.ndarray:
+    """
+    Rate bucket labels, e.g. "2.50-3.00 %"
+    :param rate: yearly rates
+    :param width: bucket width
+    :return:
+    """
+    # the tolerance keeps rates on a bucket bound in the bucket they start
+    lower = np.floor(np.asarray(rate) / width + 1e-9) * width
+    return np.array([f"{100 * bound:.2f}-{100 * (bound + width):.2f} %" for bound in lower.tolist()])
+
+
+class CashFlowAccumulator:
+    """
+    Running month by month cash flow totals of a loan book, in total and per group
+    """
+
+    def __init__(self, horizon_months: int):
+        """
+        Accumulator constructor
+        :param horizon_months: projected months, month 0 being the current state
+        """
+        self.months = np.arange(horizon_months + 1)
+        self.loans = 0
+        self.totals: Dict[str, Dict[str, np.ndarray]] = {}
+        self._group_totals(TOTAL_GROUP)
+
+    def add(self, loan: Any, r: Any, monthly_payment: Any, age_months: Any = 0, groups: Any = None) -> None:
+        """
+        Add the cash flows of loans to the totals
+        :param loan: loans at origination
+        :param r: monthly interest rates
+        :param monthly_payment:
+        :param age_months: months elapsed since origination
+        :param groups: group labels, one per loan, None to only keep the totals
+        :return:
+        """
+        loan, r, monthly_payment, age_months = (
+            values.reshape(-1, 1) for values in np.broadcast_arrays(loan, r, monthly_payment, age_months)
+        )
+        with stage("compute"):
+            flows = loan_cash_flows(loan, r, monthly_payment, age_months + self.months)
+            # month 0 is the current state, its installment is already paid
+            flows["interest"][:, 0] = 0.0
+            flows["amortization"][:, 0] = 0.0
+        with stage("aggregate"):
+            self._add(TOTAL_GROUP, flows, slice(None))
+            if groups is not None:
+                labels = np.asarray(groups)
+                for group in np.unique(labels).tolist():
+                    self._add(str(group), flows, labels == group)
+        self.loans += len(loan)
+
+    def result(self) -> Dict[str, PaymentSchedule]:
+        """
+        Projected cash flows, the total first then every group in natural order
+        :return:
+        """
+        groups = [TOTAL_GROUP] + sorted((group for group in self.totals if group != TOTAL_GROUP), key=_natural_key)
+        return {group: PaymentSchedule({"month": self.months, **self.totals[group]}) for group in groups}
+
+    def _group_totals(self, group: str) -> Dict[str, np.ndarray]:
+        if group not in self.totals:
+            self.totals[group] = {
+                column: np.zeros(len(self.months), dtype=int if column == "active_loans" else float)
+                for column in CASH_FLOW_COLUMNS[1:]
+            }
+        return self.totals[group]
+
+    def _add(self, group: str, flows: Mapping[str, np.ndarray], rows: Any) -> None:
+        totals = self._group_totals(group)
+        for column, values in flows.items():
+            totals[column] += values[rows].sum(axis=0)
+
+
+def project_cash_flows(
+    records: Iterable[Record],
+    defaults: Mapping[str, float],
+    horizon_months: int,
+    group_by: str = None,
+    rate_bucket: float = DEFAULT_RATE_BUCKET,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict[str, PaymentSchedule]:
+    """
+    Month by month cash flows of a loan book read lazily, see `CashFlowAccumulator.result`
+    :param records: loans with the BATCH_FIELDS and optionally AGE_FIELD and the `group_by` field
+    :param defaults: values of the BATCH_FIELDS missing from a record
+    :param horizon_months: projected months
+    :param group_by: "rate" for rate buckets, a record field, e.g. an origination cohort, or None for totals only
+    :param rate_bucket: rate bucket width
+    :param chunk_size: loans evaluated at once
+    :return:
+    """
+    accumulator = CashFlowAccumulator(horizon_months)
+    records = iter(records)
+    for start in itertools.count(0, chunk_size):
+        with stage("parse"):
+            chunk = list(itertools.islice(records, chunk_size))
+            if not chunk:
+                break
+            values: List[List[float]] = []
+            ages: List[int] = []
+            labels: List[str] = []
+            for index, record in enumerate(chunk, start=start):
+                try:
+                    values.append(record_values(record, defaults)[0])
+                    fields = {key.replace("-", "_"): value for key, value in record.items()}
+                    ages.append(int(float(fields.get(AGE_FIELD) or 0)))
+                    if group_by not in (None, "rate"):
+                        if fields.get(group_by) in (None, ""):
+                            raise ValueError(f"missing {group_by}")
+                        labels.append(str(fields[group_by]))
+                except (ValueError, TypeError) as e:
+                    raise ValueError(f"Invalid record {index}: {e}") from e
+            inputs = dict(zip(BATCH_FIELDS, np.array(values, dtype=float).reshape(-1, len(BATCH_FIELDS)).T))
+            portfolio = MortgagePortfolio(
+                inputs["property_value"], inputs["down_payment"], inputs["monthly_income"] * 12, inputs["interest_rate"]
+            )
+        groups = rate_buckets(portfolio.rate, rate_bucket) if group_by == "rate" else labels or None
+        accumulator.add(portfolio.loan, portfolio.r, inputs["monthly_payment"], ages, groups)
+    return accumulator.result()
+
+
+def run_cash_flows(
+    input_file: TextIO,
+    output: TextIO,
+    file_format: Optional[str],
+    defaults: Mapping[str, float],
+    horizon_months: int,
+    group_by: str = None,
+    rate_bucket_percent: float = 100 * DEFAULT_RATE_BUCKET,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> None:
+    """
+    Project the cash flows of the loans of a batch file and write them, as the cash-flow command does
+    :param input_file:
+    :param output:
+    :param file_format: one of BATCH_FORMATS for both files, inferred from the input file name when None
+    :param defaults: see `project_cash_flows`
+    :param horizon_months:
+    :param group_by: see `project_cash_flows`
+    :param rate_bucket_percent: rate bucket width in percent
+    :param chunk_size:
+    :return:
+    """
+    file_format = file_format or infer_batch_format(input_file.name)
+    records = read_records(input_file, file_format)
+    projection = project_cash_flows(records, defaults, horizon_months, group_by, rate_bucket_percent / 100, chunk_size)
+    with stage("write"):
+        write_cash_flows(projection, output, file_format)
+
+
+def write_cash_flows(projection: Mapping[str, PaymentSchedule], stream: TextIO, file_format: str) -> None:
+    """
+    Write projected cash flows as one record per group and month
+    :param projection: see `project_cash_flows`
+    :param stream:
+    :param file_format: one of BATCH_FORMATS
+    :return:
+    """
+    records = (
+        {"group": group, **dict(zip(CASH_FLOW_COLUMNS, row))}
+        for group, schedule in projection.items()
+        for row in zip(*(schedule[column].tolist() for column in CASH_FLOW_COLUMNS))
+    )
+    write_records(records, stream, file_format)
+
+
+def _natural_key(label: str) -> List[Any]:
+    # numbers within labels compare numerically, e.g. rate buckets "2.50-3.00 %" before "10.00-10.50 %"
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", label)]
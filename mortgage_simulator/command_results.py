@@ -0,0 +1,139 @@
+"""
+Results of the simulate and schedule commands
+
+Every result is computed from the normalized command options, the inputs the persistent result cache keys it by.
+Computation modules are imported on first use, so that cached runs of the command line never load them.
+"""
+# pylint: disable=import-outside-toplevel
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+import click
+
+from .profiling import stage
+
+if TYPE_CHECKING:
+    from .tranches import MultiTrancheMortgage
+
+
+def tranche_mortgage(
+    property_value: int,
+    down_payment: int,
+    yearly_income: int,
+    interest_rate: float,
+    tranches: List[Tuple[float, float]],
+) -> "MultiTrancheMortgage":
+    """
+    Household of the --tranche options, the rest of the loan being a tranche at the interest rate
+    :param property_value:
+    :param down_payment:
+    :param yearly_income:
+    :param interest_rate:
+    :param tranches: (loan, rate) pairs
+    :return:
+    """
+    from .tranches import MultiTrancheMortgage
+
+    if sum(loan for loan, _ in tranches) < property_value - down_payment:
+        tranches = tranches + [(-1.0, interest_rate)]
+    try:
+        return MultiTrancheMortgage.from_tranches(property_value, down_payment, yearly_income, tranches)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="'--tranche'") from e
+
+
+def simulations(
+    property_value: int,
+    down_payment: int,
+    yearly_income: int,
+    interest_rate: float,
+    mortgage_term: int,
+    monthly_payment: int,
+    tranches: List[Tuple[float, float]],
+) -> List[Tuple[str, Dict[str, float]]]:
+    """
+    Simulation figures of the simulate command, as expected by export.simulation_records
+    :return:
+    """
+    if tranches:
+        with stage("compute"):
+            household = tranche_mortgage(property_value, down_payment, yearly_income, interest_rate, tranches)
+            return household.simulations(monthly_payment)
+    with stage("import"):
+        from .scenario import Scenario
+    with stage("compute"):
+        scenario = Scenario(property_value, down_payment, yearly_income, interest_rate, monthly_payment, mortgage_term)
+    return scenario.simulations()
+
+
+def simulation_report(
+    property_value: int,
+    down_payment: int,
+    yearly_income: int,
+    interest_rate: float,
+    mortgage_term: int,
+    monthly_payment: int,
+    tranches: List[Tuple[float, float]],
+    color: bool,
+    sensitivities: bool,
+) -> str:
+    """
+    Report of the simulate command, the sensitivities being added to single tranche reports
+    :return:
+    """
+    if tranches:
+        with stage("compute"):
+            household = tranche_mortgage(property_value, down_payment, yearly_income, interest_rate, tranches)
+            return household.get_report(monthly_payment, color=color)
+    with stage("import"):
+        from .scenario import Scenario
+        from .simulation_report import get_sensitivity_report
+    with stage("compute"):
+        scenario = Scenario(property_value, down_payment, yearly_income, interest_rate, monthly_payment, mortgage_term)
+    report = scenario.get_report(color=color)
+    if sensitivities:
+        with stage("compute"):
+            simulation_sensitivities = scenario.sensitivities()
+        report += "\n" + get_sensitivity_report(simulation_sensitivities)
+    return report
+
+
+def payment_schedule(
+    property_value: int,
+    down_payment: int,
+    yearly_income: int,
+    interest_rate: float,
+    monthly_payment: int,
+    period_months: int,
+    resolution: str,
+    stepped: bool,
+    events: list,
+    tranches: List[Tuple[float, float]],
+) -> Any:
+    """
+    Payment schedule of the schedule command
+    :return:
+    """
+    if tranches:
+        with stage("compute"):
+            household = tranche_mortgage(property_value, down_payment, yearly_income, interest_rate, tranches)
+            return household.get_payment_schedule(monthly_payment, period_months, resolution)
+    with stage("import"):
+        from .mortgage import Mortgage
+    with stage("compute"):
+        loan = Mortgage(property_value, down_payment, yearly_income, interest_rate)
+        if stepped:
+            return loan.get_stepped_payment_schedule(monthly_payment, period_months, resolution)
+        if events:
+            return loan.get_event_payment_schedule(monthly_payment, events, period_months, resolution)
+        return loan.get_payment_schedule(monthly_payment, period_months, resolution)
+
+
+def schedule_report(loan_schedule: Any) -> str:
+    """
+    Report of the schedule command
+    :param loan_schedule: see `payment_schedule`
+    :return:
+    """
+    with stage("import"):
+        from .schedule_report import ScheduleReport
+    return ScheduleReport(loan_schedule).get_report()
@@ -0,0 +1,16 @@
+"""
+Constants shared by the command line and the modules it loads on demand
+
+Kept free of heavy imports so that the command line can build its options without loading NumPy or the
+report dependencies.
+"""
+EXPORT_FORMATS = ("npy", "arrow", "parquet")
+BATCH_FORMATS = ("csv", "jsonl")
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_CACHE_SIZE = 4096
+DEFAULT_DISK_CACHE_MB = 256
+
+DISK_CACHE_ENV = "MORTGAGE_SIMULATOR_CACHE"
+DISK_CACHE_DIR_ENV = "MORTGAGE_SIMULATOR_CACHE_DIR"
+DISK_CACHE_SIZE_ENV = "MORTGAGE_SIMULATOR_CACHE_MB"
@@ -0,0 +1,281 @@
+"""
+Persistent result cache
+
+Results are kept in a SQLite database under a cache directory so that repeated runs, also from concurrent
+processes, reuse them. Entries are keyed by a hash of their kind, their normalized inputs and the package version,
+and the least recently read entries are evicted once the cache exceeds its size. Values are bytes: report texts,
+JSON simulation figures or npz schedule columns, never pickles, so a shared cache directory cannot run code.
+The module only imports NumPy to encode schedules, warm hits on reports skip loading the computation modules.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Mapping, Optional, Tuple, TypeVar
+
+from mortgage_simulator import __version__
+from mortgage_simulator.constants import DEFAULT_DISK_CACHE_MB
+from mortgage_simulator.profiling import stage
+
+if TYPE_CHECKING:
+    from mortgage_simulator.schedule import PaymentSchedule
+
+logger = logging.getLogger(__name__)
+
+DATABASE_NAME = "results.sqlite3"
+# seconds a process waits for another one to release the database
+LOCK_TIMEOUT = 30.0
+# eviction frees room down to this share of the cache size, so that not every insert evicts
+EVICTION_TARGET = 0.9
+# seconds between attempts to set up a database another process is setting up
+SETUP_RETRY_DELAY = 0.01
+
+T = TypeVar("T")
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS entries "
+    "(key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)",
+)
+
+
+def default_cache_dir() -> str:
+    """
+    Cache directory of the current user, following the XDG base directory convention
+    :return:
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "mortgage-simulator")
+
+
+def cache_key(kind: str, inputs: Mapping[str, Any]) -> str:
+    """
+    Canonical hash of a result, numbers are compared as floats so that 4000000 and 4e6 share an entry
+    :param kind: kind of result, e.g. "simulation report"
+    :param inputs: normalized inputs the result depends on, e.g. rates as fractions
+    :return:
+    """
+    payload = {"kind": kind, "version": __version__, "inputs": _canonical(inputs)}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+class DiskCache:
+    """
+    Size-bounded least recently used cache in a SQLite database, safe to share between processes
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = DEFAULT_DISK_CACHE_MB * 2**20):
+        """
+        Cache constructor, creates the directory and the database when missing
+        :param directory: cache directory, `default_cache_dir()` by default
+        :param max_bytes: total size of the cached values
+        """
+        self.directory = directory or default_cache_dir()
+        self.path = os.path.join(self.directory, DATABASE_NAME)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._connection: Optional[sqlite3.Connection] = None
+        # switching a new database to WAL can fail without waiting while another process sets it up, retry until
+        # the lock timeout
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                self._connect()
+                break
+            except sqlite3.OperationalError:
+                self.close()
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(SETUP_RETRY_DELAY)
+
+    def __len__(self) -> int:
+        return self._query("SELECT COUNT(*) FROM entries")[0]
+
+    @property
+    def size(self) -> int:
+        """
+        Total size of the cached values in bytes
+        :return:
+        """
+        return self._query("SELECT COALESCE(SUM(size), 0) FROM entries")[0]
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Cached value, None when missing or when the database cannot be read
+        :param key: see `cache_key`
+        :return:
+        """
+        try:
+            row = self._connection.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._connection.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache {self.path} unavailable: {e}")
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return bytes(row[0])
+
+    def put(self, key: str, value: bytes) -> None:
+        """
+        Cache a value, evicting the least recently read entries beyond the cache size
+        :param key: see `cache_key`
+        :param value:
+        :return:
+        """
+        if len(value) > self.max_bytes:
+            return
+        try:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                    (key, value, len(value), time.time()),
+                )
+                self._evict()
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache {self.path} unavailable: {e}")
+
+    def clear(self) -> None:
+        self._connection.execute("DELETE FROM entries")
+        self._connection.execute("VACUUM")
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _connect(self) -> None:
+        # transactions are explicit, writers take the database lock up front with BEGIN IMMEDIATE
+        self._connection = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, isolation_level=None)
+        # the journal mode is persistent, only the first connection needs the exclusive lock to set it
+        if self._query("PRAGMA journal_mode")[0] != "wal":
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            self._connection.execute(statement)
+
+    def _evict(self) -> None:
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - int(self.max_bytes * EVICTION_TARGET)
+        evicted = []
+        for key, size in self._connection.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            evicted.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._connection.executemany("DELETE FROM entries WHERE key = ?", evicted)
+
+    def _query(self, statement: str) -> Any:
+        return self._connection.execute(statement).fetchone()
+
+
+def cached(
+    cache: Optional[DiskCache],
+    kind: str,
+    inputs: Mapping[str, Any],
+    compute: Callable[[], T],
+    encoding: str = "text",
+) -> T:
+    """
+    Result from the cache, computed and cached when missing
+    :param cache: None to always compute
+    :param kind: see `cache_key`
+    :param inputs: see `cache_key`
+    :param compute:
+    :param encoding: one of ENCODINGS
+    :return:
+    """
+    if cache is None:
+        return compute()
+    encode, decode = ENCODINGS[encoding]
+    key = cache_key(kind, inputs)
+    with stage("cache"):
+        value = cache.get(key)
+    if value is not None:
+        return decode(value)
+    result = compute()
+    with stage("cache"):
+        cache.put(key, encode(result))
+    return result
+
+
+def encode_text(text: str) -> bytes:
+    return text.encode()
+
+
+def decode_text(value: bytes) -> str:
+    return value.decode()
+
+
+def encode_json(payload: Any) -> bytes:
+    return json.dumps(payload).encode()
+
+
+def decode_json(value: bytes) -> Any:
+    return json.loads(value)
+
+
+def encode_schedule(schedule: "PaymentSchedule") -> bytes:
+    """
+    Schedule columns as an uncompressed npz archive, one array per column
+    :param schedule:
+    :return:
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+
+    output = io.BytesIO()
+    # typed as Any, the arrays would otherwise be checked against the keyword options of savez
+    columns: Dict[str, Any] = {column: schedule[column] for column in schedule.columns}
+    np.savez(output, **columns)
+    return output.getvalue()
+
+
+def decode_schedule(value: bytes) -> "PaymentSchedule":
+    """
+    Schedule from an npz archive written by `encode_schedule`, pickled arrays are refused
+    :param value:
+    :return:
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+
+    from mortgage_simulator.schedule import PaymentSchedule  # pylint: disable=import-outside-toplevel
+
+    with np.load(io.BytesIO(value), allow_pickle=False) as columns:
+        return PaymentSchedule({column: columns[column] for column in columns.files})
+
+
+# (encode, decode) of the cached results
+ENCODINGS: Dict[str, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    "text": (encode_text, decode_text),
+    "json": (encode_json, decode_json),
+    "schedule": (encode_schedule, decode_schedule),
+}
+
+
+def _canonical(value: Any) -> Any:
+    if isinstance(value, (bool, str)) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        # -0.0 and 0.0 share an entry
+        return float(value) + 0.0
+    if isinstance(value, Mapping):
+        return {str(name): _canonical(item) for name, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if hasattr(value, "item"):
+        # NumPy scalars
+        return _canonical(value.item())
+    raise TypeError(f"Cannot use {type(value).__name__} as a cache input")
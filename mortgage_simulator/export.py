@@ -0,0 +1,164 @@
+"""
+Binary columnar export of schedules and simulations
+
+Records are NumPy structured arrays with a `loan id` field so that several loans can share one file. They are
+written as `.npy`, which `np.load(path, mmap_mode="r")` maps without parsing, or as Arrow IPC (`.arrow`) and
+Parquet (`.parquet`) files when pyarrow is installed. Arrow IPC files are memory-mappable with
+`pyarrow.memory_map`.
+"""
+import ast
+import os
+import struct
+from typing import Any, Dict, Sequence, Tuple
+
+import numpy as np
+
+from mortgage_simulator.constants import EXPORT_FORMATS as FORMATS
+from mortgage_simulator.mortgage import SIMULATION_FIELDS
+from mortgage_simulator.schedule import PaymentSchedule
+
+LOAN_ID = "loan id"
+SIMULATION_TITLE = "simulation"
+TITLE_LENGTH = 32
+
+_NPY_MAGIC = b"\x93NUMPY"
+# room left in .npy headers for the row count to grow when appending
+_NPY_HEADER_RESERVE = 32
+
+
+def schedule_records(schedule: PaymentSchedule, loan_id: int = 0) -> np.ndarray:
+    """
+    Schedule as a record array
+    :param schedule:
+    :param loan_id:
+    :return:
+    """
+    dtype = [(LOAN_ID, np.int64)] + [(name, schedule[name].dtype) for name in schedule.columns]
+    records = np.empty(len(schedule), dtype=dtype)
+    records[LOAN_ID] = loan_id
+    for name in schedule.columns:
+        records[name] = schedule[name]
+    return records
+
+
+def simulation_records(simulations: Sequence[Tuple[str, Dict[str, float]]], loan_id: int = 0) -> np.ndarray:
+    """
+    Simulations as a record array
+    :param simulations: (title, `Mortgage.simulation_values` output) pairs
+    :param loan_id:
+    :return:
+    """
+    dtype = [(LOAN_ID, np.int64), (SIMULATION_TITLE, f"U{TITLE_LENGTH}")] + [(f, np.float64) for f in SIMULATION_FIELDS]
+    return np.array(
+        [
+            (loan_id, title[:TITLE_LENGTH]) + tuple(values[f] for f in SIMULATION_FIELDS)
+            for title, values in simulations
+        ],
+        dtype=dtype,
+    )
+
+
+def infer_format(path: str) -> str:
+    """
+    File format from the file extension
+    :param path:
+    :return:
+    """
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    if extension in ("arrow", "feather", "ipc"):
+        return "arrow"
+    if extension in FORMATS:
+        return extension
+    raise ValueError(f"Cannot infer export format of {path}, expected one of {', '.join(FORMATS)}")
+
+
+def export_records(records: np.ndarray, path: str, file_format: str = None, append: bool = False) -> None:
+    """
+    Write records to a file
+    :param records:
+    :param path:
+    :param file_format: one of FORMATS, inferred from the extension by default
+    :param append: add the records to an existing file with the same fields, npy files grow in place while
+        Arrow and Parquet files are rewritten
+    :return:
+    """
+    file_format = file_format or infer_format(path)
+    if file_format == "npy":
+        if append and os.path.exists(path):
+            _append_npy(records, path)
+        else:
+            _write_npy(records, path)
+    elif file_format in ("arrow", "parquet"):
+        _write_arrow(records, path, file_format, append)
+    else:
+        raise ValueError(f"Unknown export format {file_format}, expected one of {', '.join(FORMATS)}")
+
+
+def _npy_header(dtype: np.dtype, rows: int, size: int = None) -> bytes:
+    header = repr({"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (rows,)}).encode(
+        "latin1"
+    )
+    if size is None:
+        prefix = len(_NPY_MAGIC) + 2 + 4
+        size = -(-(prefix + len(header) + _NPY_HEADER_RESERVE + 1) // 64) * 64 - prefix
+    if len(header) + 1 > size:
+        raise ValueError("npy header does not fit")
+    return header.ljust(size - 1) + b"\n"
+
+
+def _write_npy(records: np.ndarray, path: str) -> None:
+    header = _npy_header(records.dtype, len(records))
+    with open(path, "wb") as f:
+        f.write(_NPY_MAGIC + bytes([2, 0]) + struct.pack("<I", len(header)) + header)
+        f.write(np.ascontiguousarray(records).tobytes())
+
+
+def _append_npy(records: np.ndarray, path: str) -> None:
+    with open(path, "r+b") as f:
+        version = np.lib.format.read_magic(f)
+        length_format = "<H" if version == (1, 0) else "<I"
+        length_start = f.tell()
+        size = struct.unpack(length_format, f.read(struct.calcsize(length_format)))[0]
+        header = ast.literal_eval(f.read(size).decode("latin1"))
+        data_start = f.tell()
+        dtype = np.lib.format.descr_to_dtype(header["descr"])
+        if dtype != records.dtype or header["fortran_order"] or len(header["shape"]) != 1:
+            raise ValueError(f"Cannot append {records.dtype} records to {path} holding {dtype} records")
+        existing_rows = header["shape"][0]
+        try:
+            new_header = _npy_header(dtype, existing_rows + len(records), size)
+        except ValueError:
+            # files written without header reserve are rewritten
+            new_header = None
+        else:
+            f.seek(length_start + struct.calcsize(length_format))
+            f.write(new_header)
+            f.seek(data_start + existing_rows * dtype.itemsize)
+            f.write(np.ascontiguousarray(records).tobytes())
+    if new_header is None:
+        _write_npy(np.concatenate([np.load(path), records]), path)
+
+
+def _write_arrow(records: np.ndarray, path: str, file_format: str, append: bool) -> None:
+    try:
+        import pyarrow as pa  # pylint: disable=import-outside-toplevel
+    except ImportError as e:
+        raise ImportError(f"Exporting to {file_format} requires pyarrow, use npy or install pyarrow") from e
+
+    table = pa.table({name: records[name] for name in records.dtype.names})
+    if file_format == "parquet":
+        import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+
+        if append and os.path.exists(path):
+            table = pa.concat_tables([pq.read_table(path), table])
+        pq.write_table(table, path)
+        return
+    if append and os.path.exists(path):
+        table = pa.concat_tables([_read_arrow(pa, path), table])
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _read_arrow(pa: Any, path: str) -> Any:
+    with pa.OSFile(path, "rb") as source:
+        return pa.ipc.open_file(source).read_all()
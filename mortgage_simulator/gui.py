@@ -1,60 +1,387 @@
 """
-ZetCode PyQt5 tutorial
+Interactive mortgage simulator
 
-This program creates a skeleton of
-a classic GUI application with a menubar,
-toolbar, statusbar, and a central widget.
-
-Author: Jan Bodnar
-Website: zetcode.com
+Sliders set the mortgage inputs, the simulation report figures and a schedule chart follow them live. Slider moves
+are debounced and sent to a worker thread holding a `Scenario`, which only recomputes the figures the changed inputs
+affect. Requests are numbered: the worker skips requests superseded by newer ones and the window ignores stale
+results, so the interface never waits for a computation.
 """
-
+import math
 import sys
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+from PyQt5.QtCore import QObject, QPointF, QRectF, Qt, QThread, QTimer, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QColor, QPainter, QPainterPath, QPen
+from PyQt5.QtWidgets import (
+    QAction,
+    QApplication,
+    QFormLayout,
+    QHBoxLayout,
+    QHeaderView,
+    QLabel,
+    QMainWindow,
+    QSlider,
+    QSplitter,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
 
-from PyQt5.QtGui import QIcon
-from PyQt5.QtWidgets import QAction, QApplication, QMainWindow, QTextEdit
+from mortgage_simulator.mortgage import Mortgage
+from mortgage_simulator.scenario import SIMULATIONS, Scenario
+from mortgage_simulator.simulation_report import ROW_INDEX
 
+# quiet time after the last slider move before computing
+DEBOUNCE_MS = 40
+MORTGAGE_TERM = 25
+CHART_POINTS = 241
+# schedules are charted up to 50 years
+MAX_CHART_MONTHS = 600
 
-class Example(QMainWindow):
+
+class SliderSpec(NamedTuple):
     """
-    GUI class
+    Slider of a scenario input
     """
 
+    name: str
+    label: str
+    minimum: float
+    maximum: float
+    step: float
+    default: float
+    text: Callable[[float], str]
+    # scenario input per slider unit, e.g. 12 for a monthly income setting the yearly income
+    scale: float = 1.0
+
+
+def _sek(value: float) -> str:
+    return f"{value:,.0f} sek"
+
+
+SLIDERS = (
+    SliderSpec("property_value", "Property value", 500000, 15000000, 50000, 4000000, _sek),
+    SliderSpec("downpayment", "Down payment", 0, 5000000, 25000, 1000000, _sek),
+    SliderSpec("rate", "Interest rate", 0.001, 0.1, 0.0005, 0.03, lambda value: f"{100 * value:.2f} %"),
+    SliderSpec("yearly_income", "Monthly income", 10000, 200000, 1000, 40000, _sek, 12.0),
+    SliderSpec("monthly_payment", "Monthly payment", 1000, 100000, 500, 15000, _sek),
+)
+
+
+class SimulationResult(NamedTuple):
+    """
+    Figures of one request
+    """
+
+    generation: int
+    # report texts of every simulation, titles first, see `Scenario.report_columns`
+    columns: List[List[str]]
+    months: np.ndarray
+    remaining_loan: np.ndarray
+    total_interest: np.ndarray
+
+
+def schedule_curves(loan: Mortgage, monthly_payment: float, points: int = CHART_POINTS) -> Dict[str, np.ndarray]:
+    """
+    Remaining loan and total interest paid until repayment, sampled on at most `points` months
+    :param loan:
+    :param monthly_payment:
+    :param points:
+    :return:
+    """
+    term = loan.term_m(monthly_payment)
+    end = math.ceil(min(term, MAX_CHART_MONTHS)) if math.isfinite(term) else MAX_CHART_MONTHS
+    months = np.unique(np.linspace(0, end, points).round().astype(int))
+    schedule = loan.get_payment_schedule_months(monthly_payment, months)
+    # the last installment only covers what remains
+    return {
+        "months": months,
+        "remaining_loan": np.maximum(schedule["remaining loan"], 0),
+        "total_interest": schedule["total interest paid"],
+    }
+
+
+class SimulationWorker(QObject):
+    """
+    Computes requests on its own thread, skipping requests older than the latest one
+    """
+
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(int, str)
+
     def __init__(self):
         super().__init__()
+        # newest requested generation, set by the window before sending a request
+        self.latest = 0
+        # number of computed requests, skipped requests excluded
+        self.computed = 0
+        self.scenario: Optional[Scenario] = None
+
+    def is_stale(self, generation: int) -> bool:
+        return generation < self.latest
+
+    @pyqtSlot(int, object)
+    def compute(self, generation: int, inputs: Dict[str, float]) -> None:
+        """
+        Update the scenario and the chart curves, emits `finished` unless a newer request came in meanwhile
+        :param generation: request number
+        :param inputs: scenario inputs
+        :return:
+        """
+        if self.is_stale(generation):
+            return
+        try:
+            if self.scenario is None:
+                self.scenario = Scenario(**inputs)
+            else:
+                self.scenario.update(**inputs)
+            if self.is_stale(generation):
+                return
+            columns = self.scenario.report_columns()
+            curves = schedule_curves(self.scenario.loan, inputs["monthly_payment"])
+        except (ValueError, ArithmeticError) as e:
+            # a failed update may leave the scenario half updated, the next request starts over
+            self.scenario = None
+            self.failed.emit(generation, str(e))
+            return
+        self.computed += 1
+        if not self.is_stale(generation):
+            self.finished.emit(SimulationResult(generation, columns, **curves))
+
+
+class ScheduleChart(QWidget):
+    """
+    Remaining loan and total interest paid over the years
+    """
+
+    CURVES = (
+        ("remaining_loan", "Remaining loan", QColor(31, 119, 180)),
+        ("total_interest", "Total interest", QColor(214, 39, 40)),
+    )
+    MARGIN = 40
+
+    def __init__(self, parent: QWidget = None):
+        super().__init__(parent)
+        self.curves: Dict[str, np.ndarray] = {}
+        self.setMinimumSize(320, 200)
 
-        self.initUI()
+    def set_curves(self, curves: Dict[str, np.ndarray]) -> None:
+        """
+        Replace the charted curves
+        :param curves: months and one array per CURVES name
+        :return:
+        """
+        self.curves = curves
+        self.update()
 
-    def initUI(self):
+    def paintEvent(self, _event: Any) -> None:  # pylint: disable=invalid-name
         """
-        init
+        Draw the curves against years, scaled to the largest value
+        :param _event:
         :return:
         """
-        textEdit = QTextEdit()
-        self.setCentralWidget(textEdit)
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.fillRect(self.rect(), Qt.GlobalColor.white)
+        if not self.curves or len(self.curves["months"]) < 2:
+            return
+        plot = QRectF(self.rect()).adjusted(self.MARGIN * 1.5, self.MARGIN / 2, -self.MARGIN / 2, -self.MARGIN)
+        years = self.curves["months"] / 12
+        top = max(float(np.max(self.curves[name])) for name, _, _ in self.CURVES) or 1.0
+
+        def point(x: float, y: float) -> QPointF:
+            return QPointF(plot.left() + x / years[-1] * plot.width(), plot.bottom() - y / top * plot.height())
+
+        painter.setPen(QPen(Qt.GlobalColor.gray))
+        painter.drawRect(plot)
+        painter.drawText(QPointF(plot.left(), plot.bottom() + 15), "0")
+        painter.drawText(QPointF(plot.right() - 50, plot.bottom() + 15), f"{years[-1]:.0f} years")
+        painter.drawText(QPointF(4, plot.top() + 10), f"{top / 1e6:.1f} M")
+        for i, (name, label, color) in enumerate(self.CURVES):
+            path = QPainterPath(point(years[0], self.curves[name][0]))
+            for x, y in zip(years[1:].tolist(), self.curves[name][1:].tolist()):
+                path.lineTo(point(x, y))
+            painter.setPen(QPen(color, 2))
+            painter.drawPath(path)
+            painter.drawText(QPointF(plot.right() - 110, plot.top() + 15 * (i + 1)), label)
+
+
+class SimulatorWindow(QMainWindow):
+    """
+    Simulator window: input sliders, simulation report table and schedule chart
+    """
+
+    requested = pyqtSignal(int, object)
+
+    def __init__(self, debounce_ms: int = DEBOUNCE_MS):
+        """
+        Window constructor, starts the worker thread and the first computation
+        :param debounce_ms: quiet time after the last slider move before computing
+        """
+        super().__init__()
+        # last request sent and last result shown
+        self.generation = 0
+        self.shown = 0
+        self.sliders: Dict[str, QSlider] = {}
+        self.labels: Dict[str, QLabel] = {}
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(debounce_ms)
+        self._timer.timeout.connect(self.submit)
+
+        self.worker = SimulationWorker()
+        self._thread = QThread(self)
+        self.worker.moveToThread(self._thread)
+        self.requested.connect(self.worker.compute)
+        self.worker.finished.connect(self.show_result)
+        self.worker.failed.connect(self.show_error)
+        self._thread.start()
+
+        self._init_ui()
+        self.submit()
+
+    def value(self, name: str) -> float:
+        """
+        Slider value, in slider units
+        :param name: SLIDERS name
+        :return:
+        """
+        spec = _slider_spec(name)
+        return spec.minimum + self.sliders[name].value() * spec.step
+
+    def set_value(self, name: str, value: float) -> None:
+        """
+        Move a slider, rounding to its step
+        :param name: SLIDERS name
+        :param value: in slider units
+        :return:
+        """
+        spec = _slider_spec(name)
+        self.sliders[name].setValue(round((value - spec.minimum) / spec.step))
+
+    def inputs(self) -> Dict[str, float]:
+        """
+        Scenario inputs set by the sliders
+        :return:
+        """
+        inputs = {spec.name: self.value(spec.name) * spec.scale for spec in SLIDERS}
+        inputs["mortgage_term"] = MORTGAGE_TERM
+        return inputs
+
+    def submit(self) -> None:
+        """
+        Send the current inputs to the worker, superseding pending requests
+        :return:
+        """
+        self.generation += 1
+        self.worker.latest = self.generation
+        self.statusBar().showMessage("Computing...")
+        self.requested.emit(self.generation, self.inputs())
+
+    @pyqtSlot(object)
+    def show_result(self, result: SimulationResult) -> None:
+        """
+        Show a result in the table and the chart unless a newer request was sent
+        :param result:
+        :return:
+        """
+        if result.generation < self.generation:
+            return
+        self.shown = result.generation
+        for j, column in enumerate(result.columns):
+            self.table.setHorizontalHeaderItem(j, QTableWidgetItem(column[0]))
+            for i, text in enumerate(column[1:]):
+                item = QTableWidgetItem(text)
+                item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.table.setItem(i, j, item)
+        self.chart.set_curves(
+            {"months": result.months, "remaining_loan": result.remaining_loan, "total_interest": result.total_interest}
+        )
+        self.statusBar().clearMessage()
+
+    @pyqtSlot(int, str)
+    def show_error(self, generation: int, message: str) -> None:
+        """
+        Show the error of a request in the status bar unless a newer request was sent
+        :param generation: request the error belongs to
+        :param message:
+        :return:
+        """
+        if generation < self.generation:
+            return
+        self.shown = generation
+        self.statusBar().showMessage(message)
+
+    def closeEvent(self, event: Any) -> None:  # pylint: disable=invalid-name
+        self._timer.stop()
+        self._thread.quit()
+        self._thread.wait()
+        super().closeEvent(event)
+
+    def _quit(self) -> None:
+        self.close()
+
+    def _init_ui(self) -> None:
+        form = QFormLayout()
+        for spec in SLIDERS:
+            slider = QSlider(Qt.Orientation.Horizontal)
+            slider.setRange(0, round((spec.maximum - spec.minimum) / spec.step))
+            label = QLabel()
+            label.setMinimumWidth(110)
+            self.sliders[spec.name] = slider
+            self.labels[spec.name] = label
+            self.set_value(spec.name, spec.default)
+            self._update_label(spec.name)
+            slider.valueChanged.connect(lambda _, name=spec.name: self._slider_moved(name))
+            row = QHBoxLayout()
+            row.addWidget(slider)
+            row.addWidget(label)
+            form.addRow(spec.label, row)
+
+        self.table = QTableWidget(len(ROW_INDEX) - 1, len(SIMULATIONS))
+        self.table.setVerticalHeaderLabels(ROW_INDEX[1:])
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.chart = ScheduleChart()
+
+        splitter = QSplitter(Qt.Orientation.Vertical)
+        splitter.addWidget(self.table)
+        splitter.addWidget(self.chart)
+        layout = QVBoxLayout()
+        layout.addLayout(form)
+        layout.addWidget(splitter)
+        central = QWidget()
+        central.setLayout(layout)
+        self.setCentralWidget(central)
+
+        exit_action = QAction("Exit", self)
+        exit_action.setShortcut("Ctrl+Q")
+        exit_action.setStatusTip("Exit application")
+        exit_action.triggered.connect(self._quit)
+        self.menuBar().addMenu("&File").addAction(exit_action)
 
-        exitAct = QAction(QIcon("exit24.png"), "Exit", self)
-        exitAct.setShortcut("Ctrl+Q")
-        exitAct.setStatusTip("Exit application")
-        exitAct.triggered.connect(self.close)
+        self.setGeometry(300, 300, 900, 900)
+        self.setWindowTitle("Mortgage simulator")
 
-        self.statusBar()
+    def _slider_moved(self, name: str) -> None:
+        self._update_label(name)
+        self._timer.start()
 
-        menubar = self.menuBar()
-        fileMenu = menubar.addMenu("&File")
-        fileMenu.addAction(exitAct)
+    def _update_label(self, name: str) -> None:
+        self.labels[name].setText(_slider_spec(name).text(self.value(name)))
 
-        toolbar = self.addToolBar("Exit")
-        toolbar.addAction(exitAct)
 
-        self.setGeometry(300, 300, 350, 250)
-        self.setWindowTitle("Main window")
-        self.show()
+def _slider_spec(name: str) -> SliderSpec:
+    return next(spec for spec in SLIDERS if spec.name == name)
 
 
 def main():
     app = QApplication(sys.argv)
-    Example()
+    window = SimulatorWindow()
+    window.show()
     sys.exit(app.exec_())
 
 
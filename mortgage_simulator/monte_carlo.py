@@ -0,0 +1,133 @@
+"""
+Monte Carlo simulation of variable-rate (rörlig ränta) mortgages
+
+Rate paths are paths x months arrays of yearly rates. They are kept in column-major order so that the
+month-by-month amortization loop reads one contiguous column per month while updating every path at once.
+"""
+from typing import Dict, Sequence
+
+import numpy as np
+
+from mortgage_simulator.mortgage import Mortgage
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def vasicek_paths(
+    n_paths: int,
+    n_months: int,
+    initial_rate: float,
+    mean_rate: float,
+    reversion: float = 0.2,
+    volatility: float = 0.01,
+    floor: float = 0.0,
+    seed: int = None,
+) -> np.ndarray:
+    """
+    Yearly rate paths from a Vasicek short-rate model, sampled monthly with the exact transition
+    :param n_paths:
+    :param n_months:
+    :param initial_rate: rate applied during the first month
+    :param mean_rate: long term mean
+    :param reversion: mean reversion speed per year
+    :param volatility: yearly volatility
+    :param floor: rates are floored to this value, None to allow any rate
+    :param seed: random generator seed
+    :return: paths x months array
+    """
+    if n_paths < 1 or n_months < 1:
+        raise ValueError(f"Rate paths need at least one path and one month, got {n_paths} x {n_months}")
+    dt = 1.0 / 12.0
+    decay = np.exp(-reversion * dt)
+    if reversion > 0:
+        step_std = volatility * np.sqrt((1.0 - decay**2) / (2.0 * reversion))
+    else:
+        step_std = volatility * np.sqrt(dt)
+
+    rng = np.random.default_rng(seed)
+    rates = np.empty((n_months, n_paths))
+    rates[0] = initial_rate
+    for m in range(1, n_months):
+        rates[m] = mean_rate + (rates[m - 1] - mean_rate) * decay + step_std * rng.standard_normal(n_paths)
+        if floor is not None:
+            np.maximum(rates[m], floor, out=rates[m])
+    return rates.T
+
+
+def load_rate_paths(path: str) -> np.ndarray:
+    """
+    Load yearly rate paths, one path per row, from a .npy file or a comma separated text file. Rates are read as the
+    rate options are, a file holding any rate above 0.5 holds percentages
+    :param path:
+    :return: paths x months array of rates as fractions
+    """
+    if path.endswith(".npy"):
+        rates = np.load(path)
+    else:
+        rates = np.loadtxt(path, delimiter=",", ndmin=2)
+    if rates.ndim != 2:
+        raise ValueError(f"Rate paths must be a paths x months array, got shape {rates.shape}")
+    largest = np.nanmax(rates) if rates.size else 0.0
+    if largest > 100:
+        raise ValueError(f"Invalid interest rate {largest} in rate paths")
+    return rates / 100 if largest > 0.5 else rates
+
+
+class RatePathSimulation:
+    """
+    Amortization of one mortgage along many rate paths
+    """
+
+    def __init__(self, loan: Mortgage, rate_paths: np.ndarray, monthly_payment: float = None):
+        """
+        Run the simulation
+        :param loan: mortgage, its own rate is ignored in favour of the paths
+        :param rate_paths: paths x months array of yearly rates
+        :param monthly_payment: constant monthly payment, defaults to the mortgage minimum payment
+        """
+        if monthly_payment is None:
+            monthly_payment = loan.minimum_monthly_payment
+        self.monthly_payment = monthly_payment
+        self.n_paths, self.n_months = rate_paths.shape
+
+        rates = np.asfortranarray(rate_paths)
+        remaining_loan = np.full(self.n_paths, float(loan.property_value - loan.downpayment))
+        month_interest = np.empty(self.n_paths)
+        self.total_interest = np.zeros(self.n_paths)
+        self.peak_monthly_interest = np.zeros(self.n_paths)
+        self.payoff_month = np.zeros(self.n_paths, dtype=int)
+
+        for m in range(self.n_months):
+            np.multiply(remaining_loan, rates[:, m] / 12.0, out=month_interest)
+            self.total_interest += month_interest
+            np.maximum(self.peak_monthly_interest, month_interest, out=self.peak_monthly_interest)
+            remaining_loan -= monthly_payment - month_interest
+            self.payoff_month[(remaining_loan <= 0) & (self.payoff_month == 0)] = m + 1
+            np.maximum(remaining_loan, 0.0, out=remaining_loan)
+
+        self.remaining_loan = remaining_loan
+
+    @property
+    def paid_off(self) -> np.ndarray:
+        return self.payoff_month > 0
+
+    def summary(self, percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, np.ndarray]:
+        """
+        Distribution of the simulated figures, payoff month percentiles only cover paths paid off in the horizon
+        :param percentiles:
+        :return: mean followed by the requested percentiles for every figure
+        """
+        figures = {
+            "total interest": self.total_interest,
+            "peak monthly interest": self.peak_monthly_interest,
+            "payoff month": self.payoff_month[self.paid_off].astype(float),
+            "remaining loan": self.remaining_loan,
+        }
+        return {
+            name: (
+                np.concatenate([[np.mean(values)], np.percentile(values, percentiles)])
+                if values.size
+                else np.full(len(percentiles) + 1, np.nan)
+            )
+            for name, values in figures.items()
+        }
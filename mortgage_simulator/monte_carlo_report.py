@@ -0,0 +1,35 @@
+"""
+report generation
+"""
+import math
+from typing import Sequence
+
+from mortgage_simulator.monte_carlo import DEFAULT_PERCENTILES, RatePathSimulation
+from mortgage_simulator.table import render_table
+
+
+class MonteCarloReport:
+    """
+    Variable-rate simulation report generator
+    """
+
+    def __init__(self, simulation: RatePathSimulation, percentiles: Sequence[float] = DEFAULT_PERCENTILES):
+        self.simulation = simulation
+        self.percentiles = percentiles
+
+    def get_report(self) -> str:
+        """
+        Get report
+        :return:
+        """
+        header = ["", "mean"] + [f"p{p:g}" for p in self.percentiles]
+        rows = [header]
+        for name, values in self.simulation.summary(self.percentiles).items():
+            rows.append([name] + ["-" if math.isnan(v) else f"{round(v):,}" for v in values.tolist()])
+        paid_off = self.simulation.paid_off.mean()
+        return render_table(
+            rows,
+            right=range(1, len(header)),
+            title=f" {self.simulation.n_paths:,} paths, {self.simulation.n_months} months,"
+            f" {100 * paid_off:.1f} % paid off ",
+        )
@@ -3,22 +3,143 @@ Created on Sun Aug  2 20:37:24 2020
 
 @author: soussi
 """
+import functools
 import logging
 import math
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, TypeVar
 
+import numpy as np
+
+from mortgage_simulator import annuity, rules, schedule
+from mortgage_simulator.profiling import stage
+from mortgage_simulator.rules import TAX_DEDUCTION_RATE
+from mortgage_simulator.schedule import PaymentSchedule
 from mortgage_simulator.utils import add_color
 
 logger = logging.getLogger(__name__)
 
-TAX_DEDUCTION_RATE = 0.3
+T = TypeVar("T")
+
+
+INPUTS = ("property_value", "downpayment", "yearly_income", "rate")
+
+# inputs every cached property of Mortgage depends on
+DERIVED_INPUTS: Dict[str, FrozenSet[str]] = {}
+
 
+def derived(*inputs: str) -> Callable[[Callable[["Mortgage"], T]], Callable[["Mortgage"], T]]:
+    """
+    Cached Mortgage property getter, computed on first access, to be wrapped in `property`
+    :param inputs: names of the constructor inputs the property depends on
+    :return:
+    """
 
-class Mortgage:
+    def decorator(method: Callable[["Mortgage"], T]) -> Callable[["Mortgage"], T]:
+        name = method.__name__
+        DERIVED_INPUTS[name] = frozenset(inputs)
+
+        @functools.wraps(method)
+        def getter(self: "Mortgage") -> T:
+            try:
+                return self._cache[name]  # pylint: disable=protected-access
+            except KeyError:
+                value = self._cache[name] = method(self)  # pylint: disable=protected-access
+                return value
+
+        return getter
+
+    return decorator
+
+
+# terms of the payments memoized by `Mortgage.term_m`, depending on every input
+DERIVED_INPUTS["term_m"] = frozenset(INPUTS)
+# payments whose term is memoized per mortgage, the oldest one is dropped beyond
+TERM_CACHE_SIZE = 16
+
+SIMULATION_FIELDS = (
+    "property_value",
+    "downpayment",
+    "loan",
+    "rate",
+    "loan_to_value_ratio",
+    "loan_to_income_ratio",
+    "min_amort_rate",
+    "minimum_amortization",
+    "minimum_monthly_payment",
+    "maximum_term_y",
+    "monthly_payment",
+    "monthly_interest",
+    "tax_deduction",
+    "interest_post_tax_deduction",
+    "amortization",
+    "amortization_rate",
+    "term_y",
+    "total_principal",
+    "total_interest",
+    "total_payment",
+    "interest_to_principal",
+    "apy",
+    "apr",
+)
+
+# analytic derivatives of the term and the total interest at a monthly payment and of the monthly payment at a
+# term, rates being yearly rates: multiply by 1e-4 for the change per basis point
+SENSITIVITY_FIELDS = (
+    "monthly_payment_per_rate",
+    "monthly_payment_per_loan",
+    "monthly_payment_per_term_y",
+    "term_y_per_rate",
+    "term_y_per_payment",
+    "term_y_per_loan",
+    "total_interest_per_rate",
+    "total_interest_per_payment",
+    "total_interest_per_loan",
+)
+
+
+def sensitivity_values(loan: Any, r: Any, monthly_payment: Any, term_y: Any) -> Dict[str, Any]:
+    """
+    Sensitivities of one or many loans, see SENSITIVITY_FIELDS, all derivatives share one evaluation
+    :param loan:
+    :param r: monthly interest rate
+    :param monthly_payment: payment the term and total interest are derived at
+    :param term_y: term the monthly payment is derived at
+    :return:
+    """
+    payment = annuity.monthly_payment_derivatives(loan, r, np.asarray(term_y, dtype=float) * 12)
+    term = annuity.term_m_derivatives(loan, r, monthly_payment)
+    interest = annuity.total_interest_derivatives(loan, r, monthly_payment)
+    # d/d yearly rate = d/dr / 12
+    return {
+        "monthly_payment_per_rate": payment["r"] / 12.0,
+        "monthly_payment_per_loan": payment["loan"],
+        "monthly_payment_per_term_y": payment["term_months"] * 12.0,
+        "term_y_per_rate": term["r"] / 144.0,
+        "term_y_per_payment": term["payment"] / 12.0,
+        "term_y_per_loan": term["loan"] / 12.0,
+        "total_interest_per_rate": interest["r"] / 12.0,
+        "total_interest_per_payment": interest["payment"],
+        "total_interest_per_loan": interest["loan"],
+    }
+
+
+class Mortgage:  # pylint: disable=too-many-public-methods
     """
     Mortgage simulator class
+
+    Mortgages are immutable values, derived figures are computed lazily and cached. Use `replace` to get a
+    mortgage with other inputs, it keeps every cached figure that does not depend on the changed inputs.
     """
 
+    __slots__ = INPUTS + ("_cache",)
+
+    property_value: float
+    downpayment: float
+    yearly_income: float
+    rate: float
+    # derived figures by property name, see `derived`, and memoized terms by payment under "term_m"
+    _cache: Dict[str, Any]
+
     def __init__(self, property_value, downpayment: float, yearly_income: float, rate: float = 0.0115):
         """
         Mortgage simulator constructor
@@ -27,22 +148,72 @@ class Mortgage:
         :param yearly_income:
         :param rate:
         """
-        self.rate = rate / (100.0 if rate > 1.0 else 1.0)
-        self.property_value = property_value
-        self.yearly_income = yearly_income
-        self.downpayment = downpayment
+        self._set_inputs(
+            property_value=property_value,
+            downpayment=downpayment,
+            yearly_income=yearly_income,
+            rate=_normalize_rate(rate),
+            cache={},
+        )
 
         self.check_loan_to_value_limit()
 
+    def _set_inputs(self, cache: Dict[str, Any], **inputs: float) -> None:
+        for name, value in inputs.items():
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, "_cache", cache)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"Mortgage is immutable, use replace({name}=...) instead")
+
+    def __reduce__(self):
+        return self.__class__, tuple(getattr(self, name) for name in INPUTS)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Mortgage):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in INPUTS)
+
+    def __hash__(self) -> int:
+        return hash(tuple(getattr(self, name) for name in INPUTS))
+
+    def __repr__(self) -> str:
+        inputs = ", ".join(f"{name}={getattr(self, name)!r}" for name in INPUTS)
+        return f"{self.__class__.__name__}({inputs})"
+
+    def replace(self, **changes: float) -> "Mortgage":
+        """
+        Mortgage with some inputs changed, cached figures that do not depend on them are carried over
+        :param changes: new values for any of property_value, downpayment, yearly_income and rate
+        :return:
+        """
+        unknown = set(changes) - set(INPUTS)
+        if unknown:
+            raise TypeError(f"Unknown mortgage inputs {sorted(unknown)}")
+        if "rate" in changes:
+            changes["rate"] = _normalize_rate(changes["rate"])
+        inputs = {name: changes.get(name, getattr(self, name)) for name in INPUTS}
+        changed = {name for name, value in changes.items() if value != getattr(self, name)}
+
+        loan = self.__class__.__new__(self.__class__)
+        cache = {key: value for key, value in self._cache.items() if not DERIVED_INPUTS[key] & changed}
+        self.__class__._set_inputs(loan, cache=cache, **inputs)
+        if changed & DERIVED_INPUTS["_loan_to_value_ratio"]:
+            loan.check_loan_to_value_limit()
+        return loan
+
     @property
+    @derived("property_value", "downpayment")
     def _loan(self) -> float:
         return self.property_value - self.downpayment
 
     @property
+    @derived("property_value", "downpayment")
     def _loan_to_value_ratio(self) -> float:
         return self._loan / self.property_value
 
     @property
+    @derived("property_value", "downpayment")
     def _loan_to_val_amort_rate(self) -> float:
         """
         amortization rate based on loan to value
@@ -50,23 +221,18 @@ class Mortgage:
         """
         if self._loan_to_value_ratio < 0:
             raise ValueError("Negative loan to value ratio " f"{self._loan_to_value_ratio:.2f}")
-        if self._loan_to_value_ratio < 0.5:
-            amort_rate = 0.0
-        elif self._loan_to_value_ratio < 0.7:
-            amort_rate = 0.01
-        elif self._loan_to_value_ratio < 0.85:
-            amort_rate = 0.02
-        else:
-            amort_rate = 0.02
-
-        logger.debug(f"Loan to value ration {self._loan_to_value_ratio} requires minimum amortization {amort_rate}")
+        amort_rate = rules.loan_to_value_amort_rate(self._loan_to_value_ratio)
+
+        logger.debug("Loan to value ration %s requires minimum amortization %s", self._loan_to_value_ratio, amort_rate)
         return amort_rate
 
     @property
+    @derived("rate")
     def _r(self):
         return self.rate / 12.0
 
     @property
+    @derived("rate")
     def apy(self):
         return (1 + self.rate / 12.0) ** 12 - 1.0
 
@@ -75,10 +241,12 @@ class Mortgage:
         return self.rate
 
     @property
+    @derived("property_value", "downpayment", "yearly_income")
     def loan_to_income_ratio(self) -> float:
         return self._loan / self.yearly_income
 
     @property
+    @derived("property_value", "downpayment", "yearly_income")
     def income_debt_amort_rate(self) -> float:
         """
         amortization rate based on income
@@ -86,44 +254,52 @@ class Mortgage:
         """ ""
         if self.loan_to_income_ratio < 0:
             raise ValueError("Negative income to loan ratio" f"{self.loan_to_income_ratio:.2f}")
-        if self.loan_to_income_ratio < 4.5:
-            amort_rate = 0.0
-        else:
-            amort_rate = 0.01
+        amort_rate = rules.loan_to_income_amort_rate(self.loan_to_income_ratio)
 
-        logger.debug(f"Loan to income ration {self.loan_to_income_ratio} requires minimum amortization {amort_rate}")
+        logger.debug("Loan to income ration %s requires minimum amortization %s", self.loan_to_income_ratio, amort_rate)
         return amort_rate
 
     @property
+    @derived("property_value", "downpayment", "yearly_income")
     def min_amort_rate(self) -> float:
+        """
+        minimum amortization rate, sum of the loan to value and loan to income requirements
+        :return:
+        """
         amort_rate = self._loan_to_val_amort_rate + self.income_debt_amort_rate
-        logger.debug(f"Minimum amortization rate is: {amort_rate} ")
+        logger.debug("Minimum amortization rate is: %s ", amort_rate)
         return amort_rate
 
     @property
+    @derived("property_value", "downpayment", "rate")
     def monthly_interest(self) -> float:
         return self._loan * self._r
 
     @property
+    @derived("property_value", "downpayment", "yearly_income")
     def minimum_amortization(self) -> float:
         return self._loan * self.min_amort_rate / 12.0
 
     @property
+    @derived(*INPUTS)
     def minimum_monthly_payment(self) -> float:
         return self.monthly_interest + self.minimum_amortization
 
     @property
+    @derived(*INPUTS)
     def maximum_term_m(self) -> float:
         return self.term_m(self.minimum_monthly_payment)
 
     @property
+    @derived(*INPUTS)
     def maximum_term_y(self) -> float:
-        return self.term_y(self.minimum_monthly_payment)
+        return self.maximum_term_m / 12.0
 
     def amortization(self, monthly_payment: float) -> float:
         return monthly_payment - self.monthly_interest
 
     @property
+    @derived("property_value", "downpayment", "rate")
     def tax_deduction(self) -> float:
         return self.monthly_interest * TAX_DEDUCTION_RATE
 
@@ -131,8 +307,11 @@ class Mortgage:
         return self.amortization(monthly_payment) / self._loan * 12.0
 
     def check_loan_to_value_limit(self) -> None:
-        if self._loan_to_value_ratio > 0.85:
-            logger.warning("Your loan to value ratio is too large:" f" {self._loan / self.property_value:.2f} > 0.85")
+        if self._loan_to_value_ratio > rules.LOAN_TO_VALUE_LIMIT:
+            logger.warning(
+                "Your loan to value ratio is too large:"
+                f" {self._loan / self.property_value:.2f} > {rules.LOAN_TO_VALUE_LIMIT}"
+            )
 
     def term_m(self, monthly_payment: float) -> float:
         """
@@ -140,21 +319,25 @@ class Mortgage:
         :param monthly_payment:
         :return:
         """
+        terms = self._cache.setdefault("term_m", {})
+        try:
+            return terms[monthly_payment]
+        except KeyError:
+            pass
         if monthly_payment <= self._loan * self._r:
             raise ValueError(
                 f"Monthly payment {monthly_payment} needs to be above monthly interest {self._loan * self._r}"
             )
-        loan_term = (math.log(monthly_payment / self._r) - math.log(monthly_payment / self._r - self._loan)) / math.log(
-            1 + self._r
-        )
+        if len(terms) >= TERM_CACHE_SIZE:
+            del terms[next(iter(terms))]
+        loan_term = terms[monthly_payment] = float(annuity.term_m(self._loan, self._r, monthly_payment))
         return loan_term
 
     def term_y(self, monthly_payment: float) -> float:
         return self.term_m(monthly_payment) / 12.0
 
     def monthly_payment(self, term_y: float) -> float:
-        term_m = term_y * 12
-        return self._r * self._loan / (1 - (1 + self._r) ** (-term_m))
+        return float(annuity.monthly_payment(self._loan, self._r, term_y * 12))
 
     def total_payment(self, monthly_payment: float) -> float:
         return monthly_payment * self.term_m(monthly_payment)
@@ -172,96 +355,288 @@ class Mortgage:
         :param title:
         :return:
         """
+        return self._get_simulation_data(self.simulation_values(monthly_payment), title=title)
+
+    def simulation_values(self, monthly_payment: float = None, fields: Iterable[str] = None) -> Dict[str, float]:
+        """
+        Numeric simulation figures based on monthly payment, keyed by SIMULATION_FIELDS
+        :param monthly_payment:
+        :param fields: subset of SIMULATION_FIELDS to compute, all by default
+        :return:
+        """
         if monthly_payment is None:
             monthly_payment = self.minimum_monthly_payment
         if monthly_payment < self.minimum_monthly_payment:
             logger.warning(
                 f"Monthly payment {int(monthly_payment):,} is below minimum {int(self.minimum_monthly_payment):,}"
             )
-        amortization = self.amortization(monthly_payment)
-        amortization_rate = self.amort_rate(monthly_payment)
-        term = self.term_y(monthly_payment)
-
-        return self._get_simulation_data(
-            monthly_payment,
-            amortization,
-            amortization_rate,
-            term,
-            title=title,
-        )
+        return {field: SIMULATION_VALUES[field](self, monthly_payment) for field in fields or SIMULATION_FIELDS}
+
+    def sensitivities(self, monthly_payment: float, term_y: float = None) -> Dict[str, float]:
+        """
+        Analytic sensitivities keyed by SENSITIVITY_FIELDS, NaN where the payment does not cover the interest
+        :param monthly_payment: payment the term and total interest are derived at
+        :param term_y: term the monthly payment is derived at, the term at `monthly_payment` by default
+        :return:
+        """
+        if term_y is None:
+            term_y = float(annuity.term_m(self._loan, self._r, monthly_payment)) / 12.0
+        values = sensitivity_values(self._loan, self._r, monthly_payment, term_y)
+        return {field: float(values[field]) for field in SENSITIVITY_FIELDS}
+
+    def balance_sensitivities(self, monthly_payment: float, months: Any) -> Dict[str, Any]:
+        """
+        Analytic derivatives of the remaining loan after `months` installments, see schedule column "remaining loan"
+        :param monthly_payment:
+        :param months: month index or array of month indices
+        :return: keyed by "rate" (yearly), "payment" and "loan"
+        """
+        derivatives = annuity.balance_derivatives(self._loan, self._r, monthly_payment, np.asarray(months))
+        return {"rate": derivatives["r"] / 12.0, "payment": derivatives["payment"], "loan": derivatives["loan"]}
 
     def simulate_by_term(self, term: float = 20, title: str = "") -> List[str]:
         monthly_payment = self.monthly_payment(term)
         return self.simulate_by_payment(monthly_payment, title=title)
 
-    def get_payment_schedule(self, monthly_payment: int, period_months: int) -> Dict[str, List[Any]]:
+    def get_payment_schedule(
+        self, monthly_payment: float, period_months: int, resolution: str = "month"
+    ) -> PaymentSchedule:
+        """
+        Payment schedule from signature until `period_months`, or until total repayment
+        :param monthly_payment:
+        :param period_months:
+        :param resolution: one of schedule.RESOLUTIONS, coarser resolutions give one row per quarter or year with
+            the interest, amortization and tax return of the period, see schedule.PERIOD_COLUMNS
+        :return:
         """
+        if resolution not in schedule.RESOLUTIONS:
+            raise ValueError(f"Unknown resolution {resolution}, expected one of {', '.join(schedule.RESOLUTIONS)}")
+        period_months = self.schedule_length(monthly_payment, period_months)
+        if resolution == "month":
+            return schedule.schedule_period(
+                self._loan, self.property_value, self.downpayment, self._r, monthly_payment, period_months
+            )
+        return schedule.schedule_periods(
+            functools.partial(self.get_payment_schedule_months, monthly_payment),
+            period_months,
+            schedule.RESOLUTIONS[resolution],
+        )
 
+    def get_stepped_payment_schedule(
+        self, monthly_payment: float, period_months: int, resolution: str = "month"
+    ) -> PaymentSchedule:
+        """
+        Payment schedule re-evaluating the amortization requirement as the loan to value and loan to income ratios
+        fall, the payment being the larger of `monthly_payment` and the requirement, see
+        schedule.amortization_segments
+        :param monthly_payment: payment once the requirement falls below it, 0 to pay the requirement only
+        :param period_months: negative to schedule until total repayment
+        :param resolution: one of schedule.RESOLUTIONS
+        :return: schedule.STEPPED_COLUMNS by month, schedule.PERIOD_COLUMNS otherwise
+        """
+        if resolution not in schedule.RESOLUTIONS:
+            raise ValueError(f"Unknown resolution {resolution}, expected one of {', '.join(schedule.RESOLUTIONS)}")
+        segments = schedule.amortization_segments(
+            self._loan, self.property_value, self.yearly_income, self._r, monthly_payment
+        )
+        if math.isinf(segments["end"]):
+            if period_months < 0:
+                raise ValueError(
+                    f"Monthly payment {monthly_payment} does not repay the loan once amortization is no longer"
+                    " required, give the number of months to schedule"
+                )
+        elif period_months < 0 or period_months > math.ceil(segments["end"]):
+            period_months = math.ceil(segments["end"])
+
+        def evaluate(months: Any) -> PaymentSchedule:
+            return schedule.stepped_schedule_months(segments, self._loan, self.property_value, self.downpayment, months)
+
+        if resolution == "month":
+            return evaluate(np.arange(period_months + 1))
+        return schedule.schedule_periods(evaluate, period_months, schedule.RESOLUTIONS[resolution])
+
+    def get_event_payment_schedule(
+        self,
+        monthly_payment: float,
+        events: Iterable[schedule.ScheduleEvent],
+        period_months: int,
+        resolution: str = "month",
+    ) -> PaymentSchedule:
+        """
+        Payment schedule with prepayments, payment changes and rate changes at given months, see
+        schedule.event_segments
+        :param monthly_payment: payment until the first payment change
+        :param events: e.g. `[ScheduleEvent(12, "prepayment", 100000), ScheduleEvent(24, "rate", 0.04)]`
+        :param period_months: negative to schedule until total repayment
+        :param resolution: one of schedule.RESOLUTIONS
+        :return: schedule.SCHEDULE_COLUMNS by month, schedule.PERIOD_COLUMNS otherwise
+        """
+        if resolution not in schedule.RESOLUTIONS:
+            raise ValueError(f"Unknown resolution {resolution}, expected one of {', '.join(schedule.RESOLUTIONS)}")
+        segments = schedule.event_segments(self._loan, self._r, monthly_payment, events)
+        if math.isinf(segments["end"]):
+            if period_months < 0:
+                raise ValueError(
+                    f"Monthly payment {segments['payment'][-1]} after the last event needs to be above monthly"
+                    f" interest {segments['balance'][-1] * segments['rate'][-1]}, or give the number of months to"
+                    " schedule"
+                )
+        elif period_months < 0 or period_months > math.ceil(segments["end"]):
+            period_months = math.ceil(segments["end"])
+
+        def evaluate(months: Any) -> PaymentSchedule:
+            return schedule.segment_schedule_months(segments, self._loan, self.property_value, self.downpayment, months)
+
+        if resolution == "month":
+            return evaluate(np.arange(period_months + 1))
+        return schedule.schedule_periods(evaluate, period_months, schedule.RESOLUTIONS[resolution])
+
+    def iter_payment_schedule(
+        self, monthly_payment: float, period_months: int, chunk_months: int = 120
+    ) -> Iterator[PaymentSchedule]:
+        """
+        Payment schedule generated lazily in chunks of `chunk_months` months
         :param monthly_payment:
         :param period_months:
+        :param chunk_months:
+        :return:
+        """
+        period_months = self.schedule_length(monthly_payment, period_months)
+        for start in range(0, period_months + 1, chunk_months):
+            with stage("compute"):
+                months = np.arange(start, min(start + chunk_months, period_months + 1))
+                chunk = self.get_payment_schedule_months(monthly_payment, months)
+            yield chunk
+
+    def schedule_length(self, monthly_payment: float, period_months: int) -> int:
+        """
+        number of scheduled months, capped by the loan term
+        :param monthly_payment:
+        :param period_months: negative to schedule until total repayment
         :return:
         """
-        schedule = {
-            "year": [0],
-            "month": [0],
-            "debt ratio": [self._loan / self.property_value],
-            "month interest": [0],
-            "month amortization": [0],
-            "remaining loan": [self._loan],
-            "total paid": [self.downpayment],
-            "total interest paid": [0],
-            "total amortized": [self.downpayment],
-            "total tax return": [0],
-        }
         loan_term = math.ceil(self.term_m(monthly_payment))
         if period_months < 0 or period_months > loan_term:
             period_months = loan_term
+        return period_months
+
+    def get_payment_schedule_months(self, monthly_payment: float, months: Any) -> PaymentSchedule:
+        """
+        Payment schedule evaluated directly at the requested months
+        :param monthly_payment:
+        :param months: month index or array of month indices
+        :return:
+        """
+        return schedule.schedule_months(
+            self._loan, self.property_value, self.downpayment, self._r, monthly_payment, months
+        )
+
+    @staticmethod
+    def _get_simulation_data(values: Dict[str, float], title: str) -> List[str]:
+        """
+        Report column of simulation figures
+        :param values: keyed by SIMULATION_FIELDS
+        :param title:
+        :return: one text per simulation_report.ROW_INDEX row
+        """
+        with stage("format"):
+            return [title] + [SIMULATION_FORMATS[field](values[field]) for field in SIMULATION_FIELDS]
+
+
+# simulation figures of a mortgage at a monthly payment
+SIMULATION_VALUES: Dict[str, Callable[[Mortgage, float], float]] = {
+    "property_value": lambda loan, _: loan.property_value,
+    "downpayment": lambda loan, _: loan.downpayment,
+    "loan": lambda loan, _: loan._loan,  # pylint: disable=protected-access
+    "rate": lambda loan, _: loan.rate,
+    "loan_to_value_ratio": lambda loan, _: loan._loan_to_value_ratio,  # pylint: disable=protected-access
+    "loan_to_income_ratio": lambda loan, _: loan.loan_to_income_ratio,
+    "min_amort_rate": lambda loan, _: loan.min_amort_rate,
+    "minimum_amortization": lambda loan, _: loan.minimum_amortization,
+    "minimum_monthly_payment": lambda loan, _: loan.minimum_monthly_payment,
+    "maximum_term_y": lambda loan, _: loan.maximum_term_y,
+    "monthly_payment": lambda _, payment: payment,
+    "monthly_interest": lambda loan, _: loan.monthly_interest,
+    "tax_deduction": lambda loan, _: loan.tax_deduction,
+    "interest_post_tax_deduction": lambda loan, _: loan.monthly_interest - loan.tax_deduction,
+    "amortization": lambda loan, payment: loan.amortization(payment),
+    "amortization_rate": lambda loan, payment: loan.amort_rate(payment),
+    "term_y": lambda loan, payment: loan.term_y(payment),
+    "total_principal": lambda loan, _: loan._loan,  # pylint: disable=protected-access
+    "total_interest": lambda loan, payment: loan.total_interest(payment),
+    "total_payment": lambda loan, payment: loan.total_payment(payment),
+    "interest_to_principal": lambda loan, payment: loan.interest_to_principal(payment),
+    "apy": lambda loan, _: loan.apy,
+    "apr": lambda loan, _: loan.apr,
+}
+
+# mortgage inputs every simulation figure depends on, "monthly_payment" standing for the simulated payment
+_PAYMENT_INPUTS = frozenset(("property_value", "downpayment", "rate", "monthly_payment"))
+SIMULATION_FIELD_INPUTS: Dict[str, FrozenSet[str]] = {
+    "property_value": frozenset(("property_value",)),
+    "downpayment": frozenset(("downpayment",)),
+    "loan": DERIVED_INPUTS["_loan"],
+    "rate": frozenset(("rate",)),
+    "loan_to_value_ratio": DERIVED_INPUTS["_loan_to_value_ratio"],
+    "loan_to_income_ratio": DERIVED_INPUTS["loan_to_income_ratio"],
+    "min_amort_rate": DERIVED_INPUTS["min_amort_rate"],
+    "minimum_amortization": DERIVED_INPUTS["minimum_amortization"],
+    "minimum_monthly_payment": DERIVED_INPUTS["minimum_monthly_payment"],
+    "maximum_term_y": DERIVED_INPUTS["maximum_term_y"],
+    "monthly_payment": frozenset(("monthly_payment",)),
+    "monthly_interest": DERIVED_INPUTS["monthly_interest"],
+    "tax_deduction": DERIVED_INPUTS["tax_deduction"],
+    "interest_post_tax_deduction": DERIVED_INPUTS["tax_deduction"],
+    "amortization": _PAYMENT_INPUTS,
+    "amortization_rate": _PAYMENT_INPUTS,
+    "term_y": _PAYMENT_INPUTS,
+    "total_principal": DERIVED_INPUTS["_loan"],
+    "total_interest": _PAYMENT_INPUTS,
+    "total_payment": _PAYMENT_INPUTS,
+    "interest_to_principal": _PAYMENT_INPUTS,
+    "apy": DERIVED_INPUTS["apy"],
+    "apr": frozenset(("rate",)),
+}
+
+# report text of every simulation figure, in simulation_report.ROW_INDEX order
+SIMULATION_FORMATS: Dict[str, Callable[[float], str]] = {
+    "property_value": lambda value: f"{int(value):,} sek",
+    "downpayment": lambda value: f"{int(value):,} sek",
+    "loan": lambda value: f"{int(value):,} sek",
+    "rate": lambda value: f"{100 * value:.2f} %",
+    "loan_to_value_ratio": lambda value: f"{value * 100:.1f} %",
+    "loan_to_income_ratio": lambda value: f"{value:.2f}",
+    "min_amort_rate": lambda value: f"{100 * value:.2f} %",
+    "minimum_amortization": lambda value: f"{int(value):,} sek",
+    "minimum_monthly_payment": lambda value: f"{int(value):,} sek",
+    "maximum_term_y": lambda value: f"{value:.1f} Y",
+    "monthly_payment": lambda value: add_color("monthly_payment", f"{int(value):,} sek"),
+    "monthly_interest": lambda value: f"{int(value):,} sek",
+    "tax_deduction": lambda value: f"{int(value):,} sek",
+    "interest_post_tax_deduction": lambda value: f"{int(value):,} sek",
+    "amortization": lambda value: f"{int(value):,} sek",
+    "amortization_rate": lambda value: f"{100 * value:.2f} %",
+    "term_y": lambda value: f"{value:.1f} Years",
+    "total_principal": lambda value: f"{int(value):,} sek",
+    "total_interest": lambda value: f"{int(value):,} sek",
+    "total_payment": lambda value: f"{int(value):,} sek",
+    "interest_to_principal": lambda value: f"{100 * value:.2f} %",
+    "apy": lambda value: f"{100 * value:.2f} %",
+    "apr": lambda value: f"{100 * value:.2f} %",
+}
+
+
+def simulation_field_inputs(payment_inputs: FrozenSet[str]) -> Dict[str, FrozenSet[str]]:
+    """
+    Inputs of every simulation figure when the simulated payment is itself derived from inputs
+    :param payment_inputs: inputs the simulated payment depends on, e.g. those of the minimum payment
+    :return: SIMULATION_FIELD_INPUTS with "monthly_payment" replaced by `payment_inputs`
+    """
+    return {
+        field: (inputs - {"monthly_payment"}) | payment_inputs if "monthly_payment" in inputs else inputs
+        for field, inputs in SIMULATION_FIELD_INPUTS.items()
+    }
+
 
-        for m in range(1, period_months + 1):
-            month_interest = schedule["remaining loan"][-1] * self._r
-            month_amortization = monthly_payment - month_interest
-            schedule["year"].append((m - 1) // 12 + 1)
-            schedule["month"].append(m)
-            schedule["month interest"].append(month_interest)
-            schedule["month amortization"].append(month_amortization)
-            schedule["total paid"].append(schedule["total paid"][-1] + monthly_payment)
-            schedule["total interest paid"].append(schedule["total interest paid"][-1] + month_interest)
-            schedule["total amortized"].append(schedule["total amortized"][-1] + month_amortization)
-            schedule["total tax return"].append(schedule["total tax return"][-1] + month_interest * TAX_DEDUCTION_RATE)
-            schedule["remaining loan"].append(schedule["remaining loan"][-1] - month_amortization)
-            schedule["debt ratio"].append(schedule["remaining loan"][-1] / self.property_value)
-
-        return schedule
-
-    def _get_simulation_data(
-        self, monthly_payment: float, amortization: float, amortization_rate: float, term: float, title: str
-    ) -> List[str]:
-        """"""
-        data = [
-            title,
-            f"{int(self.property_value):,} sek",
-            f"{int(self.downpayment):,} sek",
-            f"{int(self._loan):,} sek",
-            f"{100 * self.rate:.2f} %",
-            f"{self._loan_to_value_ratio * 100:.1f} %",
-            f"{self.loan_to_income_ratio:.2f}",
-            f"{100 * self.min_amort_rate:.2f} %",
-            f"{int(self.minimum_amortization):,} sek",
-            f"{int(self.minimum_monthly_payment):,} sek",
-            f"{self.maximum_term_y:.1f} Y",
-            add_color("monthly_payment", f"{int(monthly_payment):,} sek"),
-            f"{int(self.monthly_interest):,} sek",
-            f"{int(self.tax_deduction):,} sek",
-            f"{int(self.monthly_interest - self.tax_deduction):,} sek",
-            f"{int(amortization):,} sek",
-            f"{100 * amortization_rate:.2f} %",
-            f"{term:.1f} Years",
-            f"{int(self._loan):,} sek",
-            f"{int(self.total_interest(monthly_payment)):,} sek",
-            f"{int(self.total_payment(monthly_payment)):,} sek",
-            f"{100 * self.interest_to_principal(monthly_payment):.2f} %",
-            f"{100 * self.apy:.2f} %",
-            f"{100 * self.apr:.2f} %",
-        ]
-
-        return data
+def _normalize_rate(rate: float) -> float:
+    return rate / (100.0 if rate > 1.0 else 1.0)
@@ -0,0 +1,215 @@
+"""
+Parallel payment schedules of a loan book
+
+Loans are split in blocks spread over a process pool. Every worker evaluates the closed-form schedule of its blocks
+and writes it straight into one preallocated shared memory array of columns x loans x months, so only the inputs of
+a block are sent to a worker and nothing is sent back. The year and month columns only depend on the month and are
+not stored per loan. Months after the repayment of a loan hold its final state: nothing remains nor is paid, and the
+totals stay at their value at repayment.
+
+Process pools need `multiprocessing.shared_memory`, i.e. Python 3.8, in process schedules run on any version.
+"""
+import math
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+from mortgage_simulator import schedule
+from mortgage_simulator.portfolio import MortgagePortfolio
+from mortgage_simulator.profiling import stage
+from mortgage_simulator.schedule import SCHEDULE_COLUMNS, PaymentSchedule
+
+if TYPE_CHECKING:
+    from multiprocessing import shared_memory
+
+# columns evaluated per loan, stored in this order along the first axis of the shared array
+LOAN_COLUMNS = [column for column in SCHEDULE_COLUMNS if column not in ("year", "month")]
+# columns that are zero once a loan is repaid, the other ones keep their value at repayment
+REPAID_ZERO_COLUMNS = ("debt ratio", "month interest", "month amortization", "remaining loan")
+
+MAX_BLOCK_SIZE = 1024
+
+# loan, property value, down payment, monthly rate and monthly payment of a block of loans
+_Inputs = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+class PortfolioSchedule:
+    """
+    Payment schedules of a loan book over a common horizon, `schedules[column]` being a loans x months array of one
+    of SCHEDULE_COLUMNS and `schedules.loan_schedule(i)` the `PaymentSchedule` of loan i
+
+    Arrays are views into the shared memory the workers wrote, they must not be used after `close`, copy them to
+    keep them longer.
+    """
+
+    def __init__(self, values: np.ndarray, lengths: np.ndarray, memory: Optional["shared_memory.SharedMemory"] = None):
+        """
+        Schedule constructor
+        :param values: LOAN_COLUMNS x loans x months array
+        :param lengths: scheduled months of every loan, see `Mortgage.schedule_length`
+        :param memory: shared memory holding `values`, released by `close`
+        """
+        self._values: Optional[np.ndarray] = values
+        self._memory = memory
+        self.lengths = lengths
+        self.months = np.arange(values.shape[2])
+        self.years = np.where(self.months > 0, (self.months - 1) // 12 + 1, 0)
+
+    def __enter__(self) -> "PortfolioSchedule":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    @property
+    def columns(self) -> Sequence[str]:
+        return SCHEDULE_COLUMNS
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        if column == "month":
+            return np.broadcast_to(self.months, (len(self), len(self.months)))
+        if column == "year":
+            return np.broadcast_to(self.years, (len(self), len(self.months)))
+        return self._array()[LOAN_COLUMNS.index(column)]
+
+    def loan_schedule(self, index: int) -> PaymentSchedule:
+        """
+        Schedule of one loan until its repayment or the horizon, as `Mortgage.get_payment_schedule` gives it
+        :param index:
+        :return:
+        """
+        values = self._array()
+        length = self.lengths[index] + 1
+        loan_columns = {column: values[i, index, :length] for i, column in enumerate(LOAN_COLUMNS)}
+        columns = {"year": self.years[:length], "month": self.months[:length], **loan_columns}
+        return PaymentSchedule({column: columns[column] for column in SCHEDULE_COLUMNS})
+
+    def close(self) -> None:
+        """
+        Release the shared memory, arrays taken from the schedule must be released first
+        :return:
+        """
+        self._values = None
+        if self._memory is not None:
+            self._memory.close()
+            self._memory = None
+
+    def _array(self) -> np.ndarray:
+        if self._values is None:
+            raise ValueError("Schedule is closed")
+        return self._values
+
+
+def parallel_schedule(
+    portfolio: MortgagePortfolio,
+    monthly_payment: Any,
+    period_months: int,
+    workers: int = 1,
+    block_size: int = None,
+) -> PortfolioSchedule:
+    """
+    Payment schedules of every loan of a portfolio from signature until `period_months`
+    :param portfolio:
+    :param monthly_payment: payment of every loan
+    :param period_months: horizon, negative to schedule until the last repayment
+    :param workers: number of worker processes, 1 runs in process without shared memory
+    :param block_size: loans per task, by default a few tasks per worker
+    :return: schedules over the horizon, loans stopping at their own repayment in `loan_schedule`
+    """
+    monthly_payment = np.broadcast_to(np.asarray(monthly_payment, dtype=float), portfolio.loan.shape).ravel()
+    inputs = (
+        portfolio.loan.ravel(),
+        portfolio.property_value.ravel(),
+        portfolio.downpayment.ravel(),
+        portfolio.r.ravel(),
+        monthly_payment,
+    )
+    # loans whose payment does not cover the interest are never repaid and scheduled until the horizon
+    loan_terms = np.ceil(portfolio.term_m(monthly_payment).ravel())
+    if period_months < 0:
+        if np.isnan(loan_terms).all():
+            raise ValueError("No loan is ever repaid, the horizon must be given")
+        period_months = int(np.nanmax(loan_terms))
+    lengths = np.where(np.isnan(loan_terms), period_months, np.minimum(loan_terms, period_months)).astype(int)
+
+    loans = len(monthly_payment)
+    shape = (len(LOAN_COLUMNS), loans, period_months + 1)
+    if block_size is None:
+        block_size = min(MAX_BLOCK_SIZE, max(1, math.ceil(loans / (4 * workers))))
+    blocks = [(start, min(start + block_size, loans)) for start in range(0, loans, block_size)]
+
+    if workers <= 1:
+        values = np.empty(shape)
+        with stage("compute"):
+            for start, stop in blocks:
+                _write_block(values, start, stop, _block_inputs(inputs, start, stop), lengths[start:stop])
+        return PortfolioSchedule(values, lengths)
+
+    from multiprocessing import shared_memory  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+    memory = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * 8))
+    try:
+        values = np.ndarray(shape, dtype=float, buffer=memory.buf)
+        with stage("compute"), ProcessPoolExecutor(max_workers=workers) as executor:
+            tasks = [
+                executor.submit(
+                    _fill_block,
+                    memory.name,
+                    shape,
+                    start,
+                    stop,
+                    _block_inputs(inputs, start, stop),
+                    lengths[start:stop],
+                )
+                for start, stop in blocks
+            ]
+            for task in tasks:
+                task.result()
+    except BaseException:
+        values = None
+        memory.close()
+        raise
+    finally:
+        # the parent keeps its mapping, the memory is freed once it is closed
+        memory.unlink()
+    return PortfolioSchedule(values, lengths, memory)
+
+
+def _block_inputs(inputs: _Inputs, start: int, stop: int) -> _Inputs:
+    loan, property_value, downpayment, r, monthly_payment = inputs
+    return (
+        loan[start:stop],
+        property_value[start:stop],
+        downpayment[start:stop],
+        r[start:stop],
+        monthly_payment[start:stop],
+    )
+
+
+def _write_block(values: np.ndarray, start: int, stop: int, inputs: _Inputs, lengths: np.ndarray) -> None:
+    # loans as a column against a row of months
+    loan, property_value, downpayment, r, monthly_payment = (column[:, np.newaxis] for column in inputs)
+    months = np.arange(values.shape[2])
+    columns = schedule.schedule_months(loan, property_value, downpayment, r, monthly_payment, months)
+    repaid = months > lengths[:, np.newaxis]
+    loans = np.arange(stop - start)
+    for i, column in enumerate(LOAN_COLUMNS):
+        block = np.broadcast_to(columns[column], repaid.shape)
+        final = 0.0 if column in REPAID_ZERO_COLUMNS else block[loans, lengths][:, np.newaxis]
+        values[i, start:stop] = np.where(repaid, final, block)
+
+
+def _fill_block(name: str, shape: Tuple[int, ...], start: int, stop: int, inputs: _Inputs, lengths: np.ndarray) -> None:
+    from multiprocessing import shared_memory  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        values = np.ndarray(shape, dtype=float, buffer=memory.buf)
+        _write_block(values, start, stop, inputs, lengths)
+        del values
+    finally:
+        memory.close()
@@ -0,0 +1,155 @@
+"""
+Columnar mortgage evaluation
+
+`MortgagePortfolio` holds one NumPy array per input and evaluates every derived quantity of
+`Mortgage` for the whole loan book in a single vectorized pass.
+"""
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+
+from mortgage_simulator import annuity, rules
+from mortgage_simulator.mortgage import TAX_DEDUCTION_RATE, Mortgage, sensitivity_values
+
+
+class MortgagePortfolio:
+    """
+    Vectorized counterpart of `Mortgage`, every attribute is an array with one entry per loan
+    """
+
+    def __init__(self, property_value: Any, downpayment: Any, yearly_income: Any, rate: Any = 0.0115):
+        """
+        Portfolio constructor, inputs are broadcast against each other
+        :param property_value:
+        :param downpayment:
+        :param yearly_income:
+        :param rate: yearly rates, values above 1 are read as percentages
+        """
+        property_value, downpayment, yearly_income, rate = np.broadcast_arrays(
+            *(np.asarray(x, dtype=float) for x in (property_value, downpayment, yearly_income, rate))
+        )
+        self.rate = np.where(rate > 1.0, rate / 100.0, rate)
+        self.property_value = property_value
+        self.yearly_income = yearly_income
+        self.downpayment = downpayment
+
+        self.loan = self.property_value - self.downpayment
+        self.loan_to_value_ratio = self.loan / self.property_value
+        self.loan_to_income_ratio = self.loan / self.yearly_income
+        if np.any(self.loan_to_value_ratio < 0):
+            raise ValueError(f"Negative loan to value ratio for loans {np.flatnonzero(self.loan_to_value_ratio < 0)}")
+        if np.any(self.loan_to_income_ratio < 0):
+            raise ValueError(f"Negative income to loan ratio for loans {np.flatnonzero(self.loan_to_income_ratio < 0)}")
+
+        self.r = self.rate / 12.0
+        self.loan_to_val_amort_rate = rules.loan_to_value_amort_rate(self.loan_to_value_ratio)
+        self.income_debt_amort_rate = rules.loan_to_income_amort_rate(self.loan_to_income_ratio)
+        self.min_amort_rate = self.loan_to_val_amort_rate + self.income_debt_amort_rate
+        self.monthly_interest = self.loan * self.r
+        self.minimum_amortization = self.loan * self.min_amort_rate / 12.0
+        self.minimum_monthly_payment = self.monthly_interest + self.minimum_amortization
+
+    @classmethod
+    def from_mortgages(cls, mortgages: Iterable[Mortgage]) -> "MortgagePortfolio":
+        """
+        Build a portfolio from scalar mortgages
+        :param mortgages:
+        :return:
+        """
+        mortgages = list(mortgages)
+        return cls(
+            property_value=[m.property_value for m in mortgages],
+            downpayment=[m.downpayment for m in mortgages],
+            yearly_income=[m.yearly_income for m in mortgages],
+            rate=[m.rate for m in mortgages],
+        )
+
+    def __len__(self) -> int:
+        return self.loan.size
+
+    def __getitem__(self, index: int) -> Mortgage:
+        return Mortgage(
+            property_value=float(self.property_value.flat[index]),
+            downpayment=float(self.downpayment.flat[index]),
+            yearly_income=float(self.yearly_income.flat[index]),
+            rate=float(self.rate.flat[index]),
+        )
+
+    def to_mortgages(self) -> List[Mortgage]:
+        return [self[i] for i in range(len(self))]
+
+    @property
+    def apy(self) -> np.ndarray:
+        return (1 + self.r) ** 12 - 1.0
+
+    @property
+    def apr(self) -> np.ndarray:
+        return self.rate
+
+    @property
+    def tax_deduction(self) -> np.ndarray:
+        return self.monthly_interest * TAX_DEDUCTION_RATE
+
+    @property
+    def exceeds_loan_to_value_limit(self) -> np.ndarray:
+        return self.loan_to_value_ratio > rules.LOAN_TO_VALUE_LIMIT
+
+    @property
+    def maximum_term_m(self) -> np.ndarray:
+        return self.term_m(self.minimum_monthly_payment)
+
+    @property
+    def maximum_term_y(self) -> np.ndarray:
+        return self.term_y(self.minimum_monthly_payment)
+
+    def amortization(self, monthly_payment: Any) -> np.ndarray:
+        return monthly_payment - self.monthly_interest
+
+    def amort_rate(self, monthly_payment: Any) -> np.ndarray:
+        return self.amortization(monthly_payment) / self.loan * 12.0
+
+    def term_m(self, monthly_payment: Any) -> np.ndarray:
+        """
+        mortgage term in months, NaN where the payment does not exceed the monthly interest
+        :param monthly_payment:
+        :return:
+        """
+        monthly_payment = np.asarray(monthly_payment, dtype=float)
+        loan_term = annuity.term_m(self.loan, self.r, monthly_payment)
+        return np.where(monthly_payment > self.monthly_interest, loan_term, np.nan)
+
+    def term_y(self, monthly_payment: Any) -> np.ndarray:
+        return self.term_m(monthly_payment) / 12.0
+
+    def monthly_payment(self, term_y: Any) -> np.ndarray:
+        return annuity.monthly_payment(self.loan, self.r, np.asarray(term_y, dtype=float) * 12)
+
+    def total_payment(self, monthly_payment: Any) -> np.ndarray:
+        return monthly_payment * self.term_m(monthly_payment)
+
+    def total_interest(self, monthly_payment: Any) -> np.ndarray:
+        return self.total_payment(monthly_payment) - self.loan
+
+    def interest_to_principal(self, monthly_payment: Any) -> np.ndarray:
+        return self.total_interest(monthly_payment) / self.loan
+
+    def sensitivities(self, monthly_payment: Any, term_y: Any = None) -> Dict[str, np.ndarray]:
+        """
+        Analytic sensitivities keyed by SENSITIVITY_FIELDS, NaN where the payment does not cover the interest
+        :param monthly_payment: payment the term and total interest are derived at
+        :param term_y: term the monthly payment is derived at, the term at `monthly_payment` by default
+        :return:
+        """
+        if term_y is None:
+            term_y = self.term_y(monthly_payment)
+        return sensitivity_values(self.loan, self.r, np.asarray(monthly_payment, dtype=float), term_y)
+
+    def balance_sensitivities(self, monthly_payment: Any, months: Any) -> Dict[str, np.ndarray]:
+        """
+        Analytic derivatives of the remaining loans after `months` installments
+        :param monthly_payment:
+        :param months:
+        :return: keyed by "rate" (yearly), "payment" and "loan"
+        """
+        derivatives = annuity.balance_derivatives(self.loan, self.r, monthly_payment, np.asarray(months))
+        return {"rate": derivatives["r"] / 12.0, "payment": derivatives["payment"], "loan": derivatives["loan"]}
@@ -0,0 +1,166 @@
+"""
+Stage timing of command line runs
+
+Code marks its stages with `stage`, e.g. `with stage("compute"):`. Stages are only timed once `enable` has been
+called, `stage` otherwise returns a shared no-op context manager. Stages may nest, the time of a nested stage is
+only counted in the nested stage so that stage times add up to at most the total time.
+"""
+import contextlib
+import time
+from typing import Any, ContextManager, Dict, Iterable, Iterator, List, Optional, TextIO, TypeVar
+
+T = TypeVar("T")
+
+PROFILE_ENV = "MORTGAGE_SIMULATOR_PROFILE"
+PROFILE_OUTPUT_ENV = "MORTGAGE_SIMULATOR_PROFILE_OUTPUT"
+
+
+class _NoStage:
+    """
+    Context manager doing nothing, shared by every stage while profiling is disabled
+    """
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc_info: Any) -> None:
+        return None
+
+
+_DISABLED = _NoStage()
+
+
+class Profiler:
+    """
+    Stage times of one run, optionally with a cProfile of the whole run
+    """
+
+    def __init__(self, command: str = None, profile_output: str = None):
+        """
+        Profiler constructor, starts the clock
+        :param command: name of the profiled command
+        :param profile_output: pstats file written by `finish`, "-" prints the statistics, no cProfile by default
+        """
+        self.command = command
+        self.profile_output = profile_output
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        # [stage, start, time spent in nested stages] of the open stages
+        self._open: List[List[Any]] = []
+        self._profile = None
+        if profile_output:
+            import cProfile  # pylint: disable=import-outside-toplevel
+
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """
+        Time a stage
+        :param name:
+        :return:
+        """
+        frame: List[Any] = [name, time.perf_counter(), 0.0]
+        self._open.append(frame)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - frame[1]
+            self._open.pop()
+            self.seconds[name] = self.seconds.get(name, 0.0) + elapsed - frame[2]
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if self._open:
+                self._open[-1][2] += elapsed
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Stage times in seconds, "other" being the time spent outside of any stage
+        :return:
+        """
+        total = time.perf_counter() - self._start
+        return {
+            "command": self.command,
+            "seconds": total,
+            "stages": {name: {"seconds": seconds, "calls": self.calls[name]} for name, seconds in self.seconds.items()},
+            "other": max(total - sum(self.seconds.values()), 0.0),
+        }
+
+    def finish(self, stream: TextIO) -> None:
+        """
+        Stop profiling, write the JSON summary and the cProfile statistics
+        :param stream: stream of the summary and printed statistics
+        :return:
+        """
+        import json  # pylint: disable=import-outside-toplevel
+
+        if self._profile is not None:
+            self._profile.disable()
+        stream.write(json.dumps(self.summary()) + "\n")
+        if self._profile is None:
+            return
+        if self.profile_output == "-":
+            import pstats  # pylint: disable=import-outside-toplevel
+
+            pstats.Stats(self._profile, stream=stream).sort_stats("cumulative").print_stats(30)
+        else:
+            self._profile.dump_stats(self.profile_output)
+
+
+_profiler: Optional[Profiler] = None
+
+
+def stage(name: str) -> ContextManager:
+    """
+    Context manager timing a stage of the current run, free when profiling is disabled
+    :param name: e.g. parse, compute, format, render or write
+    :return:
+    """
+    if _profiler is None:
+        return _DISABLED
+    return _profiler.stage(name)
+
+
+def stage_iter(name: str, items: Iterable[T]) -> Iterable[T]:
+    """
+    Time the production of every item of an iterable as a stage, e.g. results awaited from worker processes
+    :param name:
+    :param items:
+    :return: `items` itself when profiling is disabled
+    """
+    if _profiler is None:
+        return items
+    return _stage_iter(_profiler, name, iter(items))
+
+
+def _stage_iter(profiler: Profiler, name: str, items: Iterator[T]) -> Iterator[T]:
+    while True:
+        with profiler.stage(name):
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+        yield item
+
+
+def enable(command: str = None, profile_output: str = None) -> Profiler:
+    """
+    Start timing stages
+    :param command: name of the profiled command
+    :param profile_output: see `Profiler`
+    :return:
+    """
+    global _profiler  # pylint: disable=global-statement
+    _profiler = Profiler(command, profile_output)
+    return _profiler
+
+
+def disable() -> Optional[Profiler]:
+    """
+    Stop timing stages
+    :return: the profiler of the run, if any
+    """
+    global _profiler  # pylint: disable=global-statement
+    profiler, _profiler = _profiler, None
+    return profiler
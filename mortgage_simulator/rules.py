@@ -0,0 +1,50 @@
+"""
+Swedish amortization rules
+
+Every function works on scalars as well as on NumPy arrays, the thresholds are expressed as
+cumulative steps so that the same expression evaluates a single loan or a whole loan book.
+"""
+from typing import Any, Tuple
+
+# (threshold, additional amortization rate once the ratio reaches the threshold)
+LOAN_TO_VALUE_AMORT_STEPS: Tuple[Tuple[float, float], ...] = ((0.5, 0.01), (0.7, 0.01))
+LOAN_TO_INCOME_AMORT_STEPS: Tuple[Tuple[float, float], ...] = ((4.5, 0.01),)
+
+LOAN_TO_VALUE_LIMIT = 0.85
+
+TAX_DEDUCTION_RATE = 0.3
+
+
+def loan_to_value_amort_rate(loan_to_value_ratio: Any) -> Any:
+    """
+    amortization rate based on loan to value
+    :param loan_to_value_ratio: scalar or array
+    :return:
+    """
+    return _step_rate(loan_to_value_ratio, LOAN_TO_VALUE_AMORT_STEPS)
+
+
+def loan_to_income_amort_rate(loan_to_income_ratio: Any) -> Any:
+    """
+    amortization rate based on income
+    :param loan_to_income_ratio: scalar or array
+    :return:
+    """
+    return _step_rate(loan_to_income_ratio, LOAN_TO_INCOME_AMORT_STEPS)
+
+
+def min_amort_rate(loan_to_value_ratio: Any, loan_to_income_ratio: Any) -> Any:
+    """
+    minimum yearly amortization rate required by the Swedish rules
+    :param loan_to_value_ratio: scalar or array
+    :param loan_to_income_ratio: scalar or array
+    :return:
+    """
+    return loan_to_value_amort_rate(loan_to_value_ratio) + loan_to_income_amort_rate(loan_to_income_ratio)
+
+
+def _step_rate(ratio: Any, steps: Tuple[Tuple[float, float], ...]) -> Any:
+    amort_rate = 0.0
+    for threshold, step in steps:
+        amort_rate = amort_rate + step * (ratio >= threshold)
+    return amort_rate
@@ -0,0 +1,171 @@
+"""
+Incremental what-if scenarios
+
+A `Scenario` holds the simulations of the simulate command, by monthly payment, by minimum payment and by term,
+together with their report cells. Every simulation figure is tracked with the inputs it depends on, so updating an
+input recomputes and reformats only the cells that depend on it, the mortgage keeping every cached figure that does
+not depend on the change, see `Mortgage.replace`.
+"""
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, NamedTuple, Set, Tuple
+
+from mortgage_simulator.mortgage import INPUTS, SIMULATION_FIELDS, SIMULATION_FORMATS, Mortgage, simulation_field_inputs
+from mortgage_simulator.profiling import stage
+from mortgage_simulator.simulation_report import SimulationReport
+
+SCENARIO_INPUTS = INPUTS + ("monthly_payment", "mortgage_term")
+
+Cell = Tuple[int, str]
+
+
+class ScenarioSimulation(NamedTuple):
+    """
+    Simulation column of a scenario
+    """
+
+    title: Callable[[Mapping[str, Any]], str]
+    # scenario inputs the simulated payment depends on
+    payment_inputs: FrozenSet[str]
+    payment: Callable[[Mortgage, Mapping[str, Any]], float]
+
+
+SIMULATIONS = (
+    ScenarioSimulation(
+        lambda inputs: "monthly payment",
+        frozenset(("monthly_payment",)),
+        lambda loan, inputs: inputs["monthly_payment"],
+    ),
+    ScenarioSimulation(
+        lambda inputs: "minimum payment", frozenset(INPUTS), lambda loan, inputs: loan.minimum_monthly_payment
+    ),
+    ScenarioSimulation(
+        lambda inputs: f"term {inputs['mortgage_term']:.1f} Y",
+        frozenset(("property_value", "downpayment", "rate", "mortgage_term")),
+        lambda loan, inputs: loan.monthly_payment(inputs["mortgage_term"]),
+    ),
+)
+
+# inputs of every figure of every simulation, the simulated payment standing for its own inputs
+FIELD_INPUTS = [simulation_field_inputs(simulation.payment_inputs) for simulation in SIMULATIONS]
+
+
+class Scenario:
+    """
+    Simulations of one mortgage kept up to date as its inputs change
+    """
+
+    def __init__(
+        self,
+        property_value: float,
+        downpayment: float,
+        yearly_income: float,
+        rate: float,
+        monthly_payment: float,
+        mortgage_term: float,
+    ):
+        """
+        Scenario constructor
+        :param property_value:
+        :param downpayment:
+        :param yearly_income:
+        :param rate:
+        :param monthly_payment: payment of the first simulation
+        :param mortgage_term: term in years of the last simulation
+        """
+        self.loan = Mortgage(property_value, downpayment, yearly_income, rate)
+        self.inputs: Dict[str, Any] = {name: getattr(self.loan, name) for name in INPUTS}
+        self.inputs.update(monthly_payment=monthly_payment, mortgage_term=mortgage_term)
+        self.values: List[Dict[str, float]] = [{} for _ in SIMULATIONS]
+        self.cells: List[Dict[str, str]] = [{} for _ in SIMULATIONS]
+        self._refresh(set(SCENARIO_INPUTS))
+
+    def update(self, **changes: Any) -> List[Cell]:
+        """
+        Change some inputs in place
+        :param changes: new values for any of SCENARIO_INPUTS
+        :return: (simulation index, field) of the report cells whose text changed, "title" for simulation titles
+        """
+        unknown = set(changes) - set(SCENARIO_INPUTS)
+        if unknown:
+            raise TypeError(f"Unknown scenario inputs {sorted(unknown)}")
+        loan_changes = {name: value for name, value in changes.items() if name in INPUTS}
+        if loan_changes:
+            self.loan = self.loan.replace(**loan_changes)
+        changed = set()
+        for name, value in changes.items():
+            # the mortgage normalizes rates
+            value = getattr(self.loan, name) if name in INPUTS else value
+            if value != self.inputs[name]:
+                self.inputs[name] = value
+                changed.add(name)
+        return self._refresh(changed)
+
+    def variant(self, **changes: Any) -> "Scenario":
+        """
+        Scenario with some inputs changed, computed incrementally from this one
+        :param changes: new values for any of SCENARIO_INPUTS
+        :return:
+        """
+        scenario = self.__class__.__new__(self.__class__)
+        scenario.loan = self.loan
+        scenario.inputs = dict(self.inputs)
+        scenario.values = [dict(values) for values in self.values]
+        scenario.cells = [dict(cells) for cells in self.cells]
+        scenario.update(**changes)
+        return scenario
+
+    def simulations(self) -> List[Tuple[str, Dict[str, float]]]:
+        """
+        (title, simulation figures) of every simulation, as expected by export.simulation_records
+        :return:
+        """
+        return [(cells["title"], dict(values)) for cells, values in zip(self.cells, self.values)]
+
+    def sensitivities(self) -> List[Tuple[str, Dict[str, float]]]:
+        """
+        (title, `Mortgage.sensitivities`) of every simulation, at its monthly payment and term
+        :return:
+        """
+        return [
+            (cells["title"], self.loan.sensitivities(values["monthly_payment"], values["term_y"]))
+            for cells, values in zip(self.cells, self.values)
+        ]
+
+    def report_columns(self) -> List[List[str]]:
+        """
+        Report texts of every simulation, as `Mortgage.simulate_by_payment` returns them
+        :return:
+        """
+        return [[cells["title"]] + [cells[field] for field in SIMULATION_FIELDS] for cells in self.cells]
+
+    def get_report(self, color: bool = True) -> str:
+        """
+        Simulation report, see `SimulationReport`
+        :param color: keep field colors
+        :return:
+        """
+        report = SimulationReport()
+        for column in self.report_columns():
+            report.add_simulation(column)
+        return report.get_report(color=color)
+
+    def _refresh(self, changed: Set[str]) -> List[Cell]:
+        updated = []
+        for i, simulation in enumerate(SIMULATIONS):
+            cells = self.cells[i]
+            title = simulation.title(self.inputs)
+            if cells.get("title") != title:
+                cells["title"] = title
+                updated.append((i, "title"))
+            fields = [field for field in SIMULATION_FIELDS if FIELD_INPUTS[i][field] & changed]
+            if not fields:
+                continue
+            with stage("compute"):
+                values = self.loan.simulation_values(simulation.payment(self.loan, self.inputs), fields)
+            self.values[i].update(values)
+            with stage("format"):
+                texts = {field: SIMULATION_FORMATS[field](values[field]) for field in fields}
+            for field, text in texts.items():
+                if cells.get(field) != text:
+                    cells[field] = text
+                    updated.append((i, field))
+        return updated
@@ -0,0 +1,483 @@
+"""
+Closed-form payment schedule engine
+
+Every schedule column is a function of the month index only, so any month or range of months can be
+evaluated directly without walking through the preceding ones. Inputs broadcast, which lets callers
+evaluate loans x months grids in one step.
+"""
+import csv
+import json
+import math
+import os
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Union, overload
+
+import numpy as np
+
+from mortgage_simulator import annuity, rules
+from mortgage_simulator.rules import TAX_DEDUCTION_RATE
+from mortgage_simulator.utils import normalize_rate
+
+SCHEDULE_COLUMNS = [
+    "year",
+    "month",
+    "debt ratio",
+    "month interest",
+    "month amortization",
+    "remaining loan",
+    "total paid",
+    "total interest paid",
+    "total amortized",
+    "total tax return",
+]
+
+# schedule whose payment steps down with the amortization requirement
+STEPPED_COLUMNS = [
+    "year",
+    "month",
+    "debt ratio",
+    "monthly payment",
+    "amortization requirement",
+    "month interest",
+    "month amortization",
+    "remaining loan",
+    "total paid",
+    "total interest paid",
+    "total amortized",
+    "total tax return",
+]
+
+# months per row of a schedule rolled up by period
+RESOLUTIONS = {"month": 1, "quarter": 3, "year": 12}
+
+# prepayment: extra amortization paid at the end of the month, payment: new monthly payment and rate: new yearly
+# rate, both from the following month on
+EVENT_KINDS = ("prepayment", "payment", "rate")
+
+PERIOD_COLUMNS = [
+    "year",
+    "month",
+    "debt ratio",
+    "period interest",
+    "period amortization",
+    "period tax return",
+    "remaining loan",
+    "total paid",
+    "total interest paid",
+    "total amortized",
+    "total tax return",
+]
+
+
+class ScheduleEvent(NamedTuple):
+    """
+    Change to a loan at the end of a month, month 0 being the signature, see EVENT_KINDS
+    """
+
+    month: int
+    event: str
+    value: float
+
+
+class PaymentSchedule:
+    """
+    Columnar payment schedule, one contiguous array per column and one entry per month, or per period for
+    schedules rolled up by period
+
+    Indexing with a column name returns the column array, with an integer a `ScheduleRow` view and with a slice
+    a schedule sharing the same memory.
+    """
+
+    __slots__ = ("_columns",)
+
+    def __init__(self, columns: Mapping[str, Any]):
+        self._columns: Dict[str, np.ndarray] = {name: np.asarray(values) for name, values in columns.items()}
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    def keys(self) -> List[str]:
+        return self.columns
+
+    def items(self) -> Iterator:
+        return iter(self._columns.items())
+
+    def __len__(self) -> int:
+        return len(next(iter(self._columns.values()))) if self._columns else 0
+
+    @overload
+    def __getitem__(self, key: str) -> np.ndarray: ...
+
+    @overload
+    def __getitem__(self, key: int) -> "ScheduleRow": ...
+
+    @overload
+    def __getitem__(self, key: slice) -> "PaymentSchedule": ...
+
+    def __getitem__(self, key: Union[str, int, slice]) -> Union[np.ndarray, "ScheduleRow", "PaymentSchedule"]:
+        if isinstance(key, str):
+            return self._columns[key]
+        if isinstance(key, slice):
+            return PaymentSchedule({name: values[key] for name, values in self._columns.items()})
+        index = range(len(self))[key]
+        return ScheduleRow(self, index)
+
+    def __iter__(self) -> Iterator["ScheduleRow"]:
+        return (ScheduleRow(self, i) for i in range(len(self)))
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({len(self)} months, columns={self.columns})"
+
+    def to_dict(self) -> Dict[str, List[Any]]:
+        """
+        Schedule as a dictionary of lists
+        :return:
+        """
+        return {name: values.tolist() for name, values in self._columns.items()}
+
+
+class ScheduleRow:
+    """
+    One month of a payment schedule, columns are readable as attributes with underscores instead of spaces
+    """
+
+    __slots__ = ("_schedule", "_index")
+
+    def __init__(self, schedule: PaymentSchedule, index: int):
+        self._schedule = schedule
+        self._index = index
+
+    def __getitem__(self, column: str) -> Any:
+        return self._schedule[column][self._index].item()
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self[name.replace("_", " ")]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.to_dict()})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: self[name] for name in self._schedule.columns}
+
+
+def schedule_months(
+    loan: Any, property_value: Any, downpayment: Any, r: Any, monthly_payment: Any, months: Any
+) -> PaymentSchedule:
+    """
+    Schedule columns at the end of the given months, month 0 being the state at signature
+    :param loan:
+    :param property_value:
+    :param downpayment:
+    :param r: monthly interest rate
+    :param monthly_payment:
+    :param months: month index or array of month indices
+    :return:
+    """
+    months = np.asarray(months)
+    started = months > 0
+    remaining_loan = annuity.balance(loan, r, monthly_payment, months)
+    previous_loan = annuity.balance(loan, r, monthly_payment, np.maximum(months - 1, 0))
+    month_interest = np.where(started, previous_loan * r, 0.0)
+    month_amortization = np.where(started, monthly_payment - month_interest, 0.0)
+    interest_paid = monthly_payment * months - (loan - remaining_loan)
+
+    return PaymentSchedule(
+        {
+            "year": np.where(started, (months - 1) // 12 + 1, 0),
+            "month": months,
+            "debt ratio": remaining_loan / property_value,
+            "month interest": month_interest,
+            "month amortization": month_amortization,
+            "remaining loan": remaining_loan,
+            "total paid": downpayment + monthly_payment * months,
+            "total interest paid": interest_paid,
+            "total amortized": downpayment + loan - remaining_loan,
+            "total tax return": interest_paid * TAX_DEDUCTION_RATE,
+        }
+    )
+
+
+def schedule_period(
+    loan: Any, property_value: Any, downpayment: Any, r: Any, monthly_payment: Any, period_months: int
+) -> PaymentSchedule:
+    """
+    Schedule columns for months 0 to `period_months` as contiguous arrays
+    :param loan:
+    :param property_value:
+    :param downpayment:
+    :param r: monthly interest rate
+    :param monthly_payment:
+    :param period_months:
+    :return:
+    """
+    return schedule_months(loan, property_value, downpayment, r, monthly_payment, np.arange(period_months + 1))
+
+
+def schedule_periods(
+    evaluate: Callable[[np.ndarray], PaymentSchedule], period_months: int, months_per_period: int
+) -> PaymentSchedule:
+    """
+    Schedule rolled up by period, evaluated at the period ends only. Period figures are differences of the
+    cumulative columns, which are closed-form partial sums of the monthly figures.
+    :param evaluate: schedule at given months, e.g. `schedule_months` with the loan figures bound
+    :param period_months: last scheduled month
+    :param months_per_period: e.g. 12 for a yearly schedule, the last period may be shorter
+    :return: one row at signature then one row per period, `month` being the last month of the period
+    """
+    months = np.arange(0, period_months + 1, months_per_period)
+    if months[-1] != period_months:
+        months = np.append(months, period_months)
+    ends = evaluate(months)
+
+    def per_period(column: str) -> np.ndarray:
+        return np.diff(ends[column], prepend=ends[column][:1])
+
+    columns = {
+        "period interest": per_period("total interest paid"),
+        "period amortization": per_period("total amortized"),
+        "period tax return": per_period("total tax return"),
+    }
+    return PaymentSchedule({name: columns[name] if name in columns else ends[name] for name in PERIOD_COLUMNS})
+
+
+def amortization_segments(
+    loan: float, property_value: float, yearly_income: float, r: float, monthly_payment: float
+) -> Dict[str, np.ndarray]:
+    """
+    Segments of a schedule paying the larger of `monthly_payment` and the amortization requirement, the
+    requirement being re-evaluated whenever the balance falls below a loan to value or loan to income threshold.
+    The payment is constant within a segment, so every segment is an annuity and its threshold crossing month
+    follows from the balance formula.
+    :param loan:
+    :param property_value:
+    :param yearly_income:
+    :param r: monthly interest rate
+    :param monthly_payment: payment made once the requirement falls below it
+    :return: per segment arrays of the first month index ("start", the segment covers the following months),
+        balance at start, monthly payment, amortization requirement ("amort rate"), payments made before the
+        start, monthly rate and prepayment, see `segment_schedule_months`, along with the fractional repayment
+        month ("end"), infinite for loans left interest-only
+    """
+    thresholds = {property_value * threshold for threshold, _ in rules.LOAN_TO_VALUE_AMORT_STEPS}
+    thresholds |= {yearly_income * threshold for threshold, _ in rules.LOAN_TO_INCOME_AMORT_STEPS}
+    segments: Dict[str, List[float]] = {"start": [], "balance": [], "payment": [], "amort rate": [], "paid": []}
+    start, balance, paid = 0, float(loan), 0.0
+    while True:
+        amort_rate = float(rules.min_amort_rate(balance / property_value, balance / yearly_income))
+        # once no amortization is required, a payment below the interest leaves an interest-only loan
+        payment = max(float(monthly_payment), balance * (r + amort_rate / 12.0))
+        for name, value in zip(segments, (start, balance, payment, amort_rate, paid)):
+            segments[name].append(value)
+
+        # the requirement steps down once the balance is below the largest threshold it still reaches
+        active = [threshold for threshold in thresholds if 0 < threshold <= balance]
+        if amort_rate == 0 and monthly_payment <= balance * r:
+            end = math.inf
+            break
+        if amort_rate == 0 or not active:
+            with np.errstate(divide="ignore"):
+                end = start + float(annuity.term_m(balance, r, payment))
+            break
+        months = _crossing_month(balance, r, payment, max(active))
+        balance = float(annuity.balance(balance, r, payment, months))
+        paid += payment * months
+        start += months
+    result = {name: np.array(values) for name, values in segments.items()}
+    result["start"] = result["start"].astype(np.int64)
+    result["rate"] = np.full(len(result["start"]), float(r))
+    result["prepayment"] = np.zeros(len(result["start"]))
+    result["end"] = np.float64(end)
+    return result
+
+
+def stepped_schedule_months(
+    segments: Mapping[str, np.ndarray], loan: Any, property_value: Any, downpayment: Any, months: Any
+) -> PaymentSchedule:
+    """
+    Schedule with a stepped payment at the end of the given months, month 0 being the state at signature
+    :param segments: see `amortization_segments`
+    :param loan:
+    :param property_value:
+    :param downpayment:
+    :param months: month index or array of month indices
+    :return:
+    """
+    return segment_schedule_months(segments, loan, property_value, downpayment, months, STEPPED_COLUMNS)
+
+
+def segment_schedule_months(
+    segments: Mapping[str, np.ndarray],
+    loan: Any,
+    property_value: Any,
+    downpayment: Any,
+    months: Any,
+    columns: List[str] = None,
+) -> PaymentSchedule:
+    """
+    Schedule of a loan split in annuity segments at the end of the given months, month 0 being the state at
+    signature. Segment k covers the months after "start"[k] up to the next start, at the monthly rate "rate"[k]
+    and the payment "payment"[k]. The "prepayment" made at the end of a start month is amortized in that month.
+    :param segments: per segment arrays "start", "balance" (after the prepayment), "payment", "rate",
+        "prepayment" and "paid" (payments and prepayments made until the start), see `amortization_segments`
+        and `event_segments`
+    :param loan:
+    :param property_value:
+    :param downpayment:
+    :param months: month index or array of month indices
+    :param columns: SCHEDULE_COLUMNS by default, STEPPED_COLUMNS needs an "amort rate" segment array
+    :return:
+    """
+    months = np.asarray(months)
+    started = months > 0
+    # month m belongs to the segment starting before it, month 0 to the first segment
+    following = np.searchsorted(segments["start"], months, side="left")
+    segment = np.maximum(following - 1, 0)
+    elapsed = months - segments["start"][segment]
+    start_balance = segments["balance"][segment]
+    r = segments["rate"][segment]
+    payment = segments["payment"][segment]
+    # prepayment made at the end of the month, the first segment balance already accounts for one at signature
+    following = np.minimum(following, len(segments["start"]) - 1)
+    prepayment = np.where(segments["start"][following] == months, segments["prepayment"][following], 0.0)
+    later_prepayment = np.where(started, prepayment, 0.0)
+
+    remaining_loan = annuity.balance(start_balance, r, payment, elapsed) - later_prepayment
+    previous_loan = annuity.balance(start_balance, r, payment, np.maximum(elapsed - 1, 0))
+    month_interest = np.where(started, previous_loan * r, 0.0)
+    total_payments = segments["paid"][segment] + payment * elapsed + later_prepayment
+    interest_paid = total_payments - (loan - remaining_loan)
+
+    values = {
+        "year": np.where(started, (months - 1) // 12 + 1, 0),
+        "month": months,
+        "debt ratio": remaining_loan / property_value,
+        "monthly payment": np.where(started, payment, 0.0),
+        "month interest": month_interest,
+        "month amortization": np.where(started, payment - month_interest, 0.0) + prepayment,
+        "remaining loan": remaining_loan,
+        "total paid": downpayment + total_payments,
+        "total interest paid": interest_paid,
+        "total amortized": downpayment + loan - remaining_loan,
+        "total tax return": interest_paid * TAX_DEDUCTION_RATE,
+    }
+    if "amort rate" in segments:
+        values["amortization requirement"] = segments["amort rate"][segment]
+    return PaymentSchedule({name: values[name] for name in columns or SCHEDULE_COLUMNS})
+
+
+def load_events(path: str) -> List[ScheduleEvent]:
+    """
+    Load schedule events from a CSV file with month, event and value columns, from a JSON file (.json) holding a
+    list of such objects, or from a JSON lines file (.jsonl, .ndjson) with one object per line, e.g.
+    `{"month": 12, "event": "prepayment", "value": 100000}`
+    :param path:
+    :return:
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, encoding="utf-8") as stream:
+        if extension == ".json":
+            records = json.load(stream)
+            if not isinstance(records, list):
+                raise ValueError(f"Events in {path} must be a JSON list of objects")
+        elif extension in (".jsonl", ".ndjson"):
+            records = [json.loads(line) for line in stream if line.strip()]
+        else:
+            records = list(csv.DictReader(stream))
+    events = []
+    for i, record in enumerate(records):
+        try:
+            events.append(ScheduleEvent(int(record["month"]), str(record["event"]).strip(), float(record["value"])))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid event {i} in {path}: {record}") from e
+    return events
+
+
+def event_segments(loan: float, r: float, monthly_payment: float, events: Iterable[ScheduleEvent]) -> Dict[str, Any]:
+    """
+    Segments of a schedule between events, every segment being an annuity at a constant rate and payment.
+    Prepayments larger than the remaining loan repay it.
+    :param loan:
+    :param r: monthly interest rate at signature
+    :param monthly_payment: monthly payment at signature
+    :param events: events in any order, events of the same month apply together
+    :return: per segment arrays, see `segment_schedule_months`, along with the fractional repayment month
+        ("end"), infinite when the last payment does not cover the interest
+    """
+    changes: Dict[int, Dict[str, float]] = {}
+    for month, event, value in events:
+        if event not in EVENT_KINDS:
+            raise ValueError(f"Unknown event {event} at month {month}, expected one of {', '.join(EVENT_KINDS)}")
+        if month < 0 or value < 0:
+            raise ValueError(f"Invalid {event} event at month {month}: {value}")
+        change = changes.setdefault(month, {})
+        if event == "prepayment":
+            change["prepayment"] = change.get("prepayment", 0.0) + value
+        elif event == "rate":
+            change["rate"] = normalize_rate(value) / 12.0
+            if change["rate"] <= 0:
+                raise ValueError(f"Invalid rate event at month {month}: {value}")
+        else:
+            change["payment"] = value
+
+    segments: Dict[str, List[float]] = {
+        "start": [],
+        "balance": [],
+        "payment": [],
+        "rate": [],
+        "prepayment": [],
+        "paid": [],
+    }
+    start, balance, paid, payment = 0, float(loan), 0.0, float(monthly_payment)
+    end = math.inf
+    event_months = sorted(changes)
+    if not event_months or event_months[0] != 0:
+        event_months.insert(0, 0)
+    for i, month in enumerate(event_months):
+        if i:
+            elapsed = month - start
+            # the loan is repaid before the event
+            with np.errstate(divide="ignore"):
+                term = float(annuity.term_m(balance, r, payment))
+            if term <= elapsed:
+                end = start + term
+                break
+            balance = float(annuity.balance(balance, r, payment, elapsed))
+            paid += payment * elapsed
+        change = changes.get(month, {})
+        prepayment = min(change.get("prepayment", 0.0), balance)
+        balance -= prepayment
+        paid += prepayment
+        r = change.get("rate", r)
+        payment = change.get("payment", payment)
+        start = month
+        for name, value in zip(segments, (start, balance, payment, r, prepayment, paid)):
+            segments[name].append(value)
+        if balance <= 0:
+            end = start
+            break
+    else:
+        if payment > balance * r:
+            end = start + float(annuity.term_m(balance, r, payment))
+
+    result: Dict[str, Any] = {name: np.array(values) for name, values in segments.items()}
+    result["start"] = result["start"].astype(np.int64)
+    result["end"] = np.float64(end)
+    return result
+
+
+def _crossing_month(balance: float, r: float, payment: float, threshold: float) -> int:
+    """
+    First month at the end of which the balance is below `threshold`
+    """
+    # balance(m) = threshold solved for m
+    exact = math.log((payment / r - threshold) / (payment / r - balance)) / math.log(1 + r)
+    months = max(1, math.ceil(exact))
+    # guard against rounding in the logarithms
+    while annuity.balance(balance, r, payment, months) >= threshold:
+        months += 1
+    while months > 1 and annuity.balance(balance, r, payment, months - 1) < threshold:
+        months -= 1
+    return months
@@ -1,9 +1,40 @@
 """
 report generation
 """
-from typing import Any, Dict, List
+import io
+import itertools
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Sequence, TextIO, Tuple, Union
 
-from terminaltables import DoubleTable
+import numpy as np
+
+from mortgage_simulator.profiling import stage
+from mortgage_simulator.schedule import PaymentSchedule
+from mortgage_simulator.table import DoubleBoxTable
+
+
+def _whole(values: np.ndarray) -> np.ndarray:
+    # rounds half to even like round()
+    return np.rint(values).astype(np.int64)
+
+
+# values conversion, format spec, suffix and minimum width of every column
+COLUMN_FORMATS: Dict[str, Tuple[Callable[[np.ndarray], np.ndarray], str, str, int]] = {
+    "year": (lambda y: y.astype(np.int64), "", "", 2),
+    "month": (lambda m: m.astype(np.int64), "", "", 2),
+    "debt ratio": (lambda r: r * 100, ".1f", " %", 0),
+    "monthly payment": (_whole, ",", "", 0),
+    "amortization requirement": (lambda a: a * 100, ".1f", " %", 0),
+    "month interest": (_whole, ",", "", 0),
+    "month amortization": (_whole, ",", "", 0),
+    "period interest": (_whole, ",", "", 0),
+    "period amortization": (_whole, ",", "", 0),
+    "period tax return": (_whole, ",", "", 0),
+    "remaining loan": (_whole, ",", "", 0),
+    "total paid": (_whole, ",", "", 0),
+    "total interest paid": (_whole, ",", "", 0),
+    "total amortized": (_whole, ",", "", 0),
+    "total tax return": (_whole, ",", "", 0),
+}
 
 
 class ScheduleReport:
@@ -11,36 +42,84 @@ class ScheduleReport:
     Simulation report generator
     """
 
-    def __init__(self, data: Dict[str, List[Any]]):
-        self.data = _reformat_data(data)
+    def __init__(self, data: Union[PaymentSchedule, Mapping[str, Sequence[Any]]]):
+        if not isinstance(data, PaymentSchedule):
+            data = PaymentSchedule({column: np.asarray(values) for column, values in data.items()})
+        self.data = data
 
     def get_report(self) -> str:
         """
         Get report
         :return:
         """
+        output = io.StringIO()
+        self.write(output)
+        return output.getvalue()[:-1]
 
-        rows = [list(self.data.keys())]
-        for i in range(len(self.data["month"])):
-            rows.append([self.data[k][i] for k in rows[0]])
-        report_table = DoubleTable(rows)
+    def write(self, stream: TextIO) -> None:
+        """
+        Write report to stream
+        :param stream:
+        :return:
+        """
+        ScheduleStream(self.data).write([self.data], stream)
+
+
+class ScheduleStream:
+    """
+    Streaming schedule report, rows are formatted and written chunk by chunk
 
-        for i in range(1, len(rows)):
-            report_table.justify_columns[i] = "right"
+    Column widths are fixed up front from `bounds`, schedule rows holding the smallest and largest value of every
+    column (all schedule columns are monotonic, so the first months and the last month are enough). The printed
+    width of a formatted number only grows with its magnitude, so the extremes give the column widths.
+    """
+
+    def __init__(self, bounds: PaymentSchedule):
+        self.columns = [column for column in bounds.columns if column in COLUMN_FORMATS]
+        widths = []
+        for column in self.columns:
+            values = bounds[column]
+            extremes = [values.min(), values.max()] if len(values) else []
+            widths.append(max([len(column)] + [len(cell) for cell in _format_column(column, np.asarray(extremes))]))
+        self.table = DoubleBoxTable(widths, right=range(1, len(self.columns)))
+        # the first column is left-justified, its numbers are right-aligned within their own format first
+        self._template = self.table.row_template(
+            [""] + [COLUMN_FORMATS[column][1] for column in self.columns[1:]],
+            [""] + [COLUMN_FORMATS[column][2] for column in self.columns[1:]],
+        )
+
+    def iter_lines(self, chunks: Iterable[PaymentSchedule], chunk_rows: int = 120) -> Iterator[str]:
+        """
+        Report text in blocks of at most `chunk_rows` table rows
+        :param chunks: schedule column chunks
+        :param chunk_rows:
+        :return:
+        """
+        yield self.table.top() + self.table.line(self.columns) + self.table.separator()
+        for chunk in chunks:
+            for start in range(0, len(chunk), chunk_rows):
+                yield self._format_lines(chunk[start : start + chunk_rows])
+        yield self.table.bottom()
+
+    def write(self, chunks: Iterable[PaymentSchedule], stream: TextIO) -> None:
+        """
+        Write report to stream, flushing after every block
+        :param chunks: schedule column chunks
+        :param stream:
+        :return:
+        """
+        for block in self.iter_lines(chunks):
+            with stage("write"):
+                stream.write(block)
+                stream.flush()
 
-        return report_table.table
+    def _format_lines(self, chunk: PaymentSchedule) -> str:
+        with stage("format"):
+            first = _format_column(self.columns[0], chunk[self.columns[0]])
+            others = [COLUMN_FORMATS[k][0](chunk[k]).tolist() for k in self.columns[1:]]
+            return "".join(itertools.starmap(self._template.format, zip(first, *others)))
 
 
-def _reformat_data(data: Dict[str, Any]) -> Dict[str, List[str]]:
-    data_f = dict()
-    data_f["year"] = [f"{y:-2}" for y in data["year"]]
-    data_f["month"] = [f"{m:-2}" for m in data["month"]]
-    data_f["debt ratio"] = [f"{r * 100:.1f} %" for r in data["debt ratio"]]
-    data_f["month interest"] = [f"{round(mi):,}" for mi in data["month interest"]]
-    data_f["month amortization"] = [f"{round(mi):,}" for mi in data["month amortization"]]
-    data_f["remaining loan"] = [f"{round(r):,}" for r in data["remaining loan"]]
-    data_f["total paid"] = [f"{round(t):,}" for t in data["total paid"]]
-    data_f["total interest paid"] = [f"{round(i):,}" for i in data["total interest paid"]]
-    data_f["total amortized"] = [f"{round(t):,}" for t in data["total amortized"]]
-    data_f["total tax return"] = [f"{round(t):,}" for t in data["total tax return"]]
-    return data_f
+def _format_column(column: str, values: np.ndarray) -> List[str]:
+    convert, spec, suffix, width = COLUMN_FORMATS[column]
+    return [f"{value:>{width}{spec}}{suffix}" for value in convert(values).tolist()]
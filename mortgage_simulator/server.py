@@ -0,0 +1,377 @@
+"""
+Local HTTP service
+
+A minimal HTTP/1.1 server on asyncio streams exposing the simulate, minimum-payment and schedule commands as JSON
+endpoints. Parameters are the command line options, given as query parameters or as a JSON object body. Encoded
+responses are kept in an LRU cache keyed by the normalized parameters, and long schedules are computed in an
+executor so that the event loop keeps serving cached responses.
+"""
+import asyncio
+import collections
+import json
+import logging
+import math
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from mortgage_simulator.batch import BATCH_FIELDS
+from mortgage_simulator.constants import DEFAULT_CACHE_SIZE
+from mortgage_simulator.mortgage import Mortgage
+from mortgage_simulator.rules import LOAN_TO_VALUE_LIMIT
+from mortgage_simulator.utils import normalize_rate
+
+logger = logging.getLogger(__name__)
+
+# schedules longer than this are computed in the executor
+EXECUTOR_SCHEDULE_MONTHS = 120
+MAX_BODY_SIZE = 65536
+MAX_HEADERS = 100
+
+ENDPOINT_PARAMETERS = {
+    # the simulate endpoint takes the fields of a batch record
+    "/simulate": BATCH_FIELDS,
+    "/minimum-payment": ("principal", "amortization_rate", "interest_rate"),
+    "/schedule": (
+        "property_value",
+        "down_payment",
+        "interest_rate",
+        "monthly_income",
+        "monthly_payment",
+        "period_months",
+    ),
+}
+
+RATE_PARAMETERS = ("interest_rate", "amortization_rate")
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+Key = Tuple[str, Tuple[float, ...]]
+
+
+class HTTPError(Exception):
+    """
+    Error reported to the client with an HTTP status
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ResultCache:
+    """
+    Least recently used cache of encoded responses
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "collections.OrderedDict[Key, bytes]" = collections.OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Key) -> Optional[bytes]:
+        """
+        Cached response, None when missing
+        :param key:
+        :return:
+        """
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Key, value: bytes) -> None:
+        """
+        Cache a response, evicting the least recently used one when full
+        :param key:
+        :param value: encoded response
+        :return:
+        """
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+class MortgageServer:
+    """
+    JSON endpoints for the simulate, minimum-payment and schedule commands
+    """
+
+    def __init__(self, defaults: Mapping[str, float], cache_size: int = DEFAULT_CACHE_SIZE, executor: Executor = None):
+        """
+        Server constructor
+        :param defaults: values of the parameters missing from a request, None for required parameters
+        :param cache_size: number of cached responses
+        :param executor: executor for long schedules, the event loop default executor by default
+        """
+        self.defaults = defaults
+        self.cache = ResultCache(cache_size)
+        self.executor = executor
+        self.handlers: Dict[str, Callable[..., Any]] = {
+            "/simulate": self.simulate,
+            "/minimum-payment": self.minimum_payment,
+            "/schedule": self.schedule,
+        }
+
+    def normalize(self, path: str, parameters: Mapping[str, Any]) -> Key:
+        """
+        Cache key of a request, rates are normalized and parameter names may use dashes or underscores
+        :param path:
+        :param parameters:
+        :return:
+        """
+        names = ENDPOINT_PARAMETERS[path]
+        given = {name.replace("-", "_"): value for name, value in parameters.items()}
+        unknown = set(given) - set(names)
+        if unknown:
+            raise HTTPError(400, f"Unknown parameters {', '.join(sorted(unknown))}")
+        values = []
+        for name in names:
+            value = given.get(name, self.defaults.get(name))
+            if value is None:
+                raise HTTPError(400, f"Missing parameter {name}")
+            try:
+                value = float(value)
+                if name in RATE_PARAMETERS:
+                    value = normalize_rate(value)
+            except (TypeError, ValueError) as e:
+                raise HTTPError(400, f"Invalid {name}: {value}") from e
+            except Exception as e:  # pylint: disable=broad-except
+                raise HTTPError(400, f"{e}: {value}") from e
+            if not math.isfinite(value):
+                raise HTTPError(400, f"Invalid {name}: {value}")
+            values.append(value)
+        return path, tuple(values)
+
+    async def respond(self, path: str, parameters: Mapping[str, Any]) -> bytes:
+        """
+        Encoded JSON response, from the cache when possible
+        :param path:
+        :param parameters:
+        :return:
+        """
+        if path not in self.handlers:
+            raise HTTPError(404, f"Unknown endpoint {path}, expected one of {', '.join(self.handlers)}")
+        key = self.normalize(path, parameters)
+        body = self.cache.get(key)
+        if body is None:
+            try:
+                body = await self.handlers[path](*key[1])
+            except ValueError as e:
+                raise HTTPError(400, str(e)) from e
+            self.cache.put(key, body)
+        return body
+
+    async def simulate(
+        self,
+        property_value: float,
+        down_payment: float,
+        interest_rate: float,
+        mortgage_term: float,
+        monthly_income: float,
+        monthly_payment: float,
+    ) -> bytes:
+        """
+        Encoded simulation of the given payment, the minimum payment and the payment repaying over `mortgage_term`
+        :param property_value:
+        :param down_payment:
+        :param interest_rate:
+        :param mortgage_term: years
+        :param monthly_income:
+        :param monthly_payment:
+        :return:
+        """
+        loan = Mortgage(property_value, down_payment, monthly_income * 12, interest_rate)
+        simulations = {
+            "monthly payment": loan.simulation_values(monthly_payment),
+            "minimum payment": loan.simulation_values(loan.minimum_monthly_payment),
+            f"term {mortgage_term:.1f} Y": loan.simulation_values(loan.monthly_payment(mortgage_term)),
+        }
+        exceeds_limit = simulations["monthly payment"]["loan_to_value_ratio"] > LOAN_TO_VALUE_LIMIT
+        return _encode({"exceeds_loan_to_value_limit": exceeds_limit, "simulations": simulations})
+
+    async def minimum_payment(self, principal: float, amortization_rate: float, interest_rate: float) -> bytes:
+        """
+        Encoded minimum monthly payment of a principal and its amortization and interest parts
+        :param principal:
+        :param amortization_rate:
+        :param interest_rate:
+        :return:
+        """
+        amortization = amortization_rate / 12 * principal
+        interest = interest_rate / 12 * principal
+        return _encode(
+            {"minimum_monthly_payment": amortization + interest, "amortization": amortization, "interest": interest}
+        )
+
+    async def schedule(
+        self,
+        property_value: float,
+        down_payment: float,
+        interest_rate: float,
+        monthly_income: float,
+        monthly_payment: float,
+        period_months: float,
+    ) -> bytes:
+        """
+        Encoded payment schedule, long schedules are computed in the executor
+        :param property_value:
+        :param down_payment:
+        :param interest_rate:
+        :param monthly_income:
+        :param monthly_payment:
+        :param period_months: horizon, negative to schedule until the repayment
+        :return:
+        """
+        loan = Mortgage(property_value, down_payment, monthly_income * 12, interest_rate)
+        period_months = int(period_months)
+        if loan.schedule_length(monthly_payment, period_months) <= EXECUTOR_SCHEDULE_MONTHS:
+            return _encode_schedule(loan, monthly_payment, period_months)
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, _encode_schedule, loan, monthly_payment, period_months
+        )
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serve HTTP/1.1 requests on a connection until the client closes it
+        :param reader:
+        :param writer:
+        :return:
+        """
+        try:
+            while True:
+                keep_alive = await self._handle_request(reader, writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+        request_line = await reader.readline()
+        if not request_line:
+            return False
+        try:
+            method, target, version = request_line.decode("latin1").split()
+        except ValueError:
+            writer.write(_response(400, _encode({"error": "Malformed request line"}), False))
+            return False
+
+        headers = {}
+        for _ in range(MAX_HEADERS + 1):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            writer.write(_response(400, _encode({"error": "Too many headers"}), False))
+            return False
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            length = -1
+        if not 0 <= length <= MAX_BODY_SIZE:
+            writer.write(_response(413, _encode({"error": "Invalid or too large body"}), False))
+            return False
+        body = await reader.readexactly(length) if length else b""
+
+        try:
+            status, response = 200, await self._dispatch(method, target, body)
+        except HTTPError as e:
+            status, response = e.status, _encode({"error": str(e)})
+        except Exception as e:  # pylint: disable=broad-except
+            logger.exception("Failed to serve %s %s", method, target)
+            status, response = 500, _encode({"error": str(e)})
+        writer.write(_response(status, response, keep_alive))
+        return keep_alive
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> bytes:
+        url = urlsplit(target)
+        parameters: Dict[str, Any] = dict(parse_qsl(url.query))
+        if method not in ("GET", "POST"):
+            raise HTTPError(405, f"Method {method} not allowed, use GET or POST")
+        if method == "POST" and body:
+            try:
+                payload = json.loads(body)
+            except ValueError as e:
+                raise HTTPError(400, f"Invalid JSON body: {e}") from e
+            if not isinstance(payload, dict):
+                raise HTTPError(400, "JSON body must be an object")
+            parameters.update(payload)
+        return await self.respond(url.path, parameters)
+
+
+def serve(
+    host: str, port: int, defaults: Mapping[str, float], cache_size: int = DEFAULT_CACHE_SIZE
+) -> None:  # pragma: no cover
+    """
+    Run the server until interrupted
+    :param host:
+    :param port:
+    :param defaults: values of the parameters missing from a request, None for required parameters
+    :param cache_size: number of cached responses
+    :return:
+    """
+
+    async def main() -> None:
+        mortgage_server = MortgageServer(defaults, cache_size)
+        server = await asyncio.start_server(mortgage_server.handle_connection, host, port, backlog=1024)
+        logger.info("Serving on %s", ", ".join(str(s.getsockname()) for s in server.sockets))
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+def _encode_schedule(loan: Mortgage, monthly_payment: float, period_months: int) -> bytes:
+    return _encode(loan.get_payment_schedule(monthly_payment, period_months).to_dict())
+
+
+def _encode(payload: Any) -> bytes:
+    return json.dumps(_finite(payload), separators=(",", ":")).encode()
+
+
+def _finite(payload: Any) -> Any:
+    # JSON has no infinity nor NaN, undefined figures are sent as null
+    if isinstance(payload, float):
+        return payload if math.isfinite(payload) else None
+    if isinstance(payload, dict):
+        return {key: _finite(value) for key, value in payload.items()}
+    if isinstance(payload, list):
+        return [_finite(value) for value in payload]
+    return payload
+
+
+def _response(status: int, body: bytes, keep_alive: bool) -> bytes:
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin1") + body
@@ -1,15 +1,32 @@
 """Console script for mortgage_simulator."""
+# command dependencies are imported by the commands that need them to keep startup fast
+# pylint: disable=import-outside-toplevel
 import logging
+import math
 import os
+import sys
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, TextIO, Tuple
 
 import click
 
-from .mortgage import Mortgage
-from .schedule_report import ScheduleReport
-from .simulation_report import SimulationReport
-from .utils import normalize_rate
+from . import command_results, profiling
+from .constants import (
+    BATCH_FORMATS,
+    DEFAULT_CACHE_SIZE,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_DISK_CACHE_MB,
+    DISK_CACHE_DIR_ENV,
+    DISK_CACHE_ENV,
+    DISK_CACHE_SIZE_ENV,
+    EXPORT_FORMATS,
+)
+from .profiling import stage
+from .rules import LOAN_TO_VALUE_LIMIT
+from .utils import normalize_rate, parse_values
 
-logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
+if TYPE_CHECKING:
+    from .disk_cache import DiskCache
+    from .mortgage import Mortgage
 
 DEFAULT_DOWN_PAYMENT = 1000000
 DEFAULT_INTEREST_RATE = 0.0150
@@ -17,6 +34,8 @@ DEFAULT_MORTGAGE_TERM_IN_YEARS = 25
 DEFAULT_MONTHLY_INCOME = 40000
 DEFAULT_MONTHLY_PAYMENT = 10000
 
+logger = logging.getLogger(__name__)
+
 
 def get_minimum_monthly_amortization(principal, amortization_rate):
     return amortization_rate / 12 * principal
@@ -26,9 +45,149 @@ def get_monthly_starting_interest(principal, interest):
     return interest / 12 * principal
 
 
-@click.group()
-def loan_simulation():
-    pass
+def _option_defaults() -> Dict[str, Any]:
+    """
+    Default values of the simulation options, None for required options
+    :return:
+    """
+    return {
+        "property_value": None,
+        "down_payment": DEFAULT_DOWN_PAYMENT,
+        "interest_rate": DEFAULT_INTEREST_RATE,
+        "mortgage_term": DEFAULT_MORTGAGE_TERM_IN_YEARS,
+        "monthly_income": DEFAULT_MONTHLY_INCOME,
+        "monthly_payment": DEFAULT_MONTHLY_PAYMENT,
+        "period_months": -1,
+        "principal": None,
+        "amortization_rate": None,
+    }
+
+
+def _value_list(_ctx: click.Context, param: click.Parameter, value: str) -> List[float]:
+    try:
+        return parse_values(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param=param) from e
+
+
+def _tranche_list(_ctx: click.Context, param: click.Parameter, values: Tuple[str, ...]) -> List[Tuple[float, float]]:
+    tranches = []
+    for value in values:
+        try:
+            loan, rate = value.split(":")
+            tranches.append((float(loan), normalize_rate(float(rate))))
+        except ValueError as e:
+            raise click.BadParameter(f"expected LOAN:RATE, got {value}", param=param) from e
+    return tranches
+
+
+def _tranche_option(command: Callable) -> Callable:
+    return click.option(
+        "--tranche",
+        "tranches",
+        multiple=True,
+        metavar="LOAN:RATE",
+        callback=_tranche_list,
+        help="split the loan in tranches, e.g. --tranche 1000000:2.9 --tranche 1500000:3.2, the rest of the loan"
+        " being a tranche at the interest rate",
+    )(command)
+
+
+def _export_options(command: Callable) -> Callable:
+    options = [
+        click.option(
+            "-o",
+            "--output",
+            type=click.Path(dir_okay=False, writable=True),
+            default=None,
+            help="write numeric results to a npy, arrow or parquet file instead of printing a table",
+        ),
+        click.option(
+            "--output-format",
+            type=click.Choice(EXPORT_FORMATS),
+            default=None,
+            help="output file format, inferred from the output extension by default",
+        ),
+        click.option("--append", is_flag=True, default=False, help="append to the output file"),
+        click.option("--loan-id", type=int, default=0, show_default=True, help="loan id stored in the output file"),
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+
+class ProfiledCommand(click.Command):
+    """
+    Command whose option parsing is timed as the parse stage
+    """
+
+    def make_context(self, info_name: str, args: List[str], parent: click.Context = None, **extra: Any):
+        with stage("parse"):
+            return super().make_context(info_name, args, parent=parent, **extra)
+
+
+@click.group(help="simulate mortgages and their payment schedules")
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    envvar=profiling.PROFILE_ENV,
+    help=f"write a JSON summary of the time spent in every stage to stderr, or set {profiling.PROFILE_ENV}=1",
+)
+@click.option(
+    "--profile-output",
+    type=click.Path(dir_okay=False, writable=True, allow_dash=True),
+    default=None,
+    envvar=profiling.PROFILE_OUTPUT_ENV,
+    help="also write cProfile statistics to a pstats file, - prints them to stderr, implies --profile",
+)
+@click.option(
+    "--cache",
+    "use_cache",
+    is_flag=True,
+    default=False,
+    envvar=DISK_CACHE_ENV,
+    help=f"reuse simulate and schedule results from a persistent cache shared by every run, or set {DISK_CACHE_ENV}=1",
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    default=None,
+    envvar=DISK_CACHE_DIR_ENV,
+    help="persistent cache directory, ~/.cache/mortgage-simulator by default",
+)
+@click.option(
+    "--cache-max-mb",
+    type=click.IntRange(min=1),
+    default=DEFAULT_DISK_CACHE_MB,
+    show_default=True,
+    envvar=DISK_CACHE_SIZE_ENV,
+    help="persistent cache size in MB, the least recently used results are evicted beyond it",
+)
+@click.pass_context
+def loan_simulation(
+    ctx: click.Context, profile: bool, profile_output: str, use_cache: bool, cache_dir: str, cache_max_mb: int
+):
+    """
+    Options shared by every command: stage profiling and the persistent result cache
+    :param ctx:
+    :param profile: time the stages of the command
+    :param profile_output: pstats file of a cProfile of the command, "-" prints the statistics
+    :param use_cache:
+    :param cache_dir:
+    :param cache_max_mb:
+    :return:
+    """
+    logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
+    if profile or profile_output:
+        profiling.enable(ctx.invoked_subcommand, profile_output)
+        ctx.call_on_close(lambda: profiling.disable().finish(sys.stderr))
+    ctx.obj = {"cache_dir": cache_dir, "cache_bytes": cache_max_mb * 2**20, "cache": None}
+    if use_cache:
+        ctx.obj["cache"] = _open_disk_cache(ctx)
+
+
+loan_simulation.command_class = ProfiledCommand
 
 
 @loan_simulation.command(name="minimum-payment", help="calculate minimum required payment given amortization rate")
@@ -50,12 +209,15 @@ def get_minimum_monthly_payment(principal, interest_rate, amortization_rate) ->
     :param amortization_rate:
     :return:
     """
-    amortization_rate = normalize_rate(amortization_rate)
-    interest_rate = normalize_rate(interest_rate)
-    amortization_payment = get_minimum_monthly_amortization(principal, amortization_rate)
-    interest_payment = get_monthly_starting_interest(principal, interest_rate)
-    payment = amortization_payment + interest_payment
-    print(f"Minimum monthly payment: {payment:.0f} SEK")
+    with stage("parse"):
+        amortization_rate = normalize_rate(amortization_rate)
+        interest_rate = normalize_rate(interest_rate)
+    with stage("compute"):
+        amortization_payment = get_minimum_monthly_amortization(principal, amortization_rate)
+        interest_payment = get_monthly_starting_interest(principal, interest_rate)
+        payment = amortization_payment + interest_payment
+    with stage("write"):
+        print(f"Minimum monthly payment: {payment:.0f} SEK")
 
 
 @loan_simulation.command("simulate", help="simulate mortgage given its parameters")
@@ -93,6 +255,15 @@ def get_minimum_monthly_payment(principal, interest_rate, amortization_rate) ->
     show_default=True,
     help="monthly payment",
 )
+@click.option("--no-color", is_flag=True, default=False, help="print the report without colors")
+@click.option(
+    "--sensitivities",
+    is_flag=True,
+    default=False,
+    help="also print how the payment, term and total interest move with the rate, payment and loan",
+)
+@_tranche_option
+@_export_options
 def simulate_mortgage(
     property_value: int,
     down_payment: int,
@@ -100,6 +271,13 @@ def simulate_mortgage(
     mortgage_term: int,
     monthly_income: int,
     monthly_payment: int,
+    no_color: bool,
+    sensitivities: bool,
+    tranches: List[Tuple[float, float]],
+    output: str,
+    output_format: str,
+    append: bool,
+    loan_id: int,
 ) -> None:
     """
     API
@@ -109,28 +287,44 @@ def simulate_mortgage(
     :param mortgage_term:
     :param monthly_income:
     :param monthly_payment:
+    :param no_color:
+    :param sensitivities:
+    :param tranches: (loan, rate) pairs, the monthly payment is then simulated per tranche and in total
+    :param output:
+    :param output_format:
+    :param append:
+    :param loan_id:
     :return:
     """
-    interest_rate = normalize_rate(interest_rate)
-    yearly_income = monthly_income * 12
-
-    loan = Mortgage(
-        property_value=property_value,
-        downpayment=down_payment,
-        yearly_income=yearly_income,
-        rate=interest_rate,
-    )
-
-    simulation_by_payment = loan.simulate_by_payment(monthly_payment, title="monthly payment")
-    simulations = SimulationReport()
-    simulations.add_simulation(simulation_by_payment)
-    simulation_by_minimum_payment = loan.simulate_by_payment(loan.minimum_monthly_payment, title="minimum payment")
-    simulations.add_simulation(simulation_by_minimum_payment)
+    with stage("parse"):
+        inputs: Dict[str, Any] = {
+            "property_value": property_value,
+            "down_payment": down_payment,
+            "yearly_income": monthly_income * 12,
+            "interest_rate": normalize_rate(interest_rate),
+            "mortgage_term": mortgage_term,
+            "monthly_payment": monthly_payment,
+            "tranches": tranches,
+        }
+    cache = _disk_cache()
 
-    simulation_by_term = loan.simulate_by_term(mortgage_term, title=f"term {mortgage_term:.1f} Y")
-    simulations.add_simulation(simulation_by_term)
+    if output:
+        simulations = _cached(cache, "simulations", inputs, lambda: command_results.simulations(**inputs), "json")
+        with stage("import"):
+            from .export import export_records, simulation_records
+        with stage("write"):
+            try:
+                export_records(simulation_records(simulations, loan_id), output, output_format, append)
+            except (ImportError, ValueError) as e:
+                raise click.ClickException(str(e)) from e
+        return
 
-    print(simulations.get_report())
+    report_inputs = {**inputs, "color": not no_color, "sensitivities": sensitivities}
+    report = _cached(
+        cache, "simulation report", report_inputs, lambda: command_results.simulation_report(**report_inputs)
+    )
+    with stage("write"):
+        print(report)
 
 
 @loan_simulation.command("schedule", help="compute installments schedule")
@@ -168,13 +362,54 @@ def simulate_mortgage(
     show_default=True,
     help="number of months to simulate, set to -1 to simulate until total repayment",
 )
-def simulate_schedule(
+@click.option(
+    "--resolution",
+    type=click.Choice(("month", "quarter", "year")),
+    default="month",
+    show_default=True,
+    help="one row per month, or per quarter or year with the interest and amortization of the period",
+)
+@click.option(
+    "--stepped",
+    is_flag=True,
+    default=False,
+    help="re-evaluate the amortization requirement as the loan to value and loan to income ratios fall,"
+    " paying the larger of the monthly payment and the requirement",
+)
+@click.option(
+    "-e",
+    "--events",
+    "events_file",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="prepayments, payment changes and rate changes as CSV with month, event and value columns, as a JSON list"
+    " (.json) or as JSON lines (.jsonl), e.g. 12,prepayment,100000 or 24,rate,0.04",
+)
+@click.option(
+    "-s",
+    "--stream",
+    is_flag=True,
+    default=False,
+    help="write rows as they are computed, with constant memory, monthly schedules printed to stdout only",
+)
+@_tranche_option
+@_export_options
+def simulate_schedule(  # pylint: disable=too-many-arguments
     property_value: int,
     down_payment: int,
     interest_rate: float,
     monthly_income: int,
     monthly_payment: int,
     period_months: int,
+    resolution: str,
+    stepped: bool,
+    events_file: str,
+    stream: bool,
+    tranches: List[Tuple[float, float]],
+    output: str,
+    output_format: str,
+    append: bool,
+    loan_id: int,
 ) -> None:
     """
     Computes at the end of every month:
@@ -189,24 +424,541 @@ def simulate_schedule(
     :param monthly_income:
     :param monthly_payment:
     :param period_months:
+    :param resolution:
+    :param stepped:
+    :param events_file:
+    :param stream:
+    :param tranches: (loan, rate) pairs, tranches amortize in proportion to their loan
+    :param output:
+    :param output_format:
+    :param append:
+    :param loan_id:
+    :return:
+    """
+    variants = (stepped, events_file, tranches)
+    if sum(map(bool, variants)) > 1:
+        raise click.UsageError("--stepped, --events and --tranche cannot be combined")
+    if stream and (resolution != "month" or any(variants) or output):
+        raise click.UsageError(
+            "--stream cannot be combined with --resolution, --stepped, --events, --tranche or --output"
+        )
+
+    with stage("parse"):
+        inputs: Dict[str, Any] = {
+            "property_value": property_value,
+            "down_payment": down_payment,
+            "yearly_income": monthly_income * 12,
+            "interest_rate": normalize_rate(interest_rate),
+            "monthly_payment": monthly_payment,
+            "period_months": period_months,
+            "resolution": resolution,
+            "stepped": stepped,
+            "events": [],
+            "tranches": tranches,
+        }
+        if events_file:
+            with stage("import"):
+                from .schedule import load_events
+            try:
+                inputs["events"] = load_events(events_file)
+            except ValueError as e:
+                raise click.ClickException(str(e)) from e
+
+    if stream:
+        with stage("import"):
+            from .mortgage import Mortgage
+        try:
+            with stage("compute"):
+                loan = Mortgage(property_value, down_payment, inputs["yearly_income"], inputs["interest_rate"])
+        except ValueError as e:
+            raise click.ClickException(str(e)) from e
+        _stream_schedule(loan, monthly_payment, period_months)
+        return
+
+    cache = _disk_cache()
+    try:
+        if output:
+            payment_schedule = _cached(
+                cache, "schedule", inputs, lambda: command_results.payment_schedule(**inputs), "schedule"
+            )
+        elif cache is None:
+            payment_schedule = command_results.payment_schedule(**inputs)
+        else:
+            report = _cached(
+                cache,
+                "schedule report",
+                inputs,
+                lambda: command_results.schedule_report(command_results.payment_schedule(**inputs)),
+            )
+            with stage("write"):
+                print(report)
+            return
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+
+    if output:
+        with stage("import"):
+            from .export import export_records, schedule_records
+        with stage("write"):
+            try:
+                export_records(schedule_records(payment_schedule, loan_id), output, output_format, append)
+            except (ImportError, ValueError) as e:
+                raise click.ClickException(str(e)) from e
+        return
+    with stage("import"):
+        from .schedule_report import ScheduleReport
+    ScheduleReport(payment_schedule).write(sys.stdout)
+
+
+@loan_simulation.command("sweep", help="simulate every combination of the given parameter values")
+@click.option("-v", "--property-value", required=True, callback=_value_list, help="property values")
+@click.option(
+    "-d",
+    "--down-payment",
+    default=str(DEFAULT_DOWN_PAYMENT),
+    show_default=True,
+    callback=_value_list,
+    help="down payments",
+)
+@click.option(
+    "-r",
+    "--interest-rate",
+    default=str(DEFAULT_INTEREST_RATE),
+    show_default=True,
+    callback=_value_list,
+    help="interest rates",
+)
+@click.option(
+    "-t",
+    "--mortgage-term",
+    default=str(DEFAULT_MORTGAGE_TERM_IN_YEARS),
+    show_default=True,
+    callback=_value_list,
+    help="mortgage terms in years",
+)
+@click.option(
+    "-i",
+    "--monthly-income",
+    default=str(DEFAULT_MONTHLY_INCOME),
+    show_default=True,
+    callback=_value_list,
+    help="monthly incomes",
+)
+@click.option(
+    "-p",
+    "--monthly-payment",
+    default=str(DEFAULT_MONTHLY_PAYMENT),
+    show_default=True,
+    callback=_value_list,
+    help="monthly payments",
+)
+@click.option("-w", "--workers", type=int, default=os.cpu_count(), show_default=True, help="number of worker processes")
+@click.option("-o", "--output", type=click.File("w"), default="-", help="output CSV file, stdout by default")
+def sweep_mortgage(
+    property_value: List[float],
+    down_payment: List[float],
+    interest_rate: List[float],
+    mortgage_term: List[float],
+    monthly_income: List[float],
+    monthly_payment: List[float],
+    workers: int,
+    output: TextIO,
+) -> None:
+    """
+    Parameter sweep, every option takes a comma separated list of values and start:stop:step ranges
+    :param property_value:
+    :param down_payment:
+    :param interest_rate:
+    :param mortgage_term:
+    :param monthly_income:
+    :param monthly_payment:
+    :param workers:
+    :param output:
+    :return:
+    """
+    with stage("import"):
+        from .sweep import run_sweep, sweep_grid, write_sweep
+
+    with stage("parse"):
+        interest_rate = [normalize_rate(rate) for rate in interest_rate]
+        grid = sweep_grid(property_value, down_payment, interest_rate, monthly_income)
+    with stage("write"):
+        write_sweep(run_sweep(grid, monthly_payment, mortgage_term, workers=workers), output)
+
+
+@loan_simulation.command("variable-rate", help="monte carlo simulation of a variable rate mortgage")
+@click.option("-v", "--property-value", type=int, required=True, help="property value")
+@click.option("-d", "--down-payment", type=int, default=DEFAULT_DOWN_PAYMENT, show_default=True, help="down payment")
+@click.option(
+    "-r",
+    "--interest-rate",
+    type=float,
+    default=DEFAULT_INTEREST_RATE,
+    show_default=True,
+    help="starting interest rate",
+)
+@click.option("--mean-rate", type=float, default=None, help="long term mean rate, defaults to the starting rate")
+@click.option("--reversion", type=float, default=0.2, show_default=True, help="yearly mean reversion speed")
+@click.option("--volatility", type=float, default=0.01, show_default=True, help="yearly rate volatility")
+@click.option(
+    "-i",
+    "--monthly-income",
+    type=int,
+    default=DEFAULT_MONTHLY_INCOME,
+    show_default=True,
+    help="monthly income",
+)
+@click.option("-p", "--monthly-payment", type=int, default=None, help="monthly payment, defaults to minimum payment")
+@click.option(
+    "-n", "--paths", type=click.IntRange(min=1), default=10000, show_default=True, help="number of rate paths"
+)
+@click.option(
+    "-m", "--period-months", type=click.IntRange(min=1), default=600, show_default=True, help="simulated months"
+)
+@click.option("--seed", type=int, default=None, help="random seed")
+@click.option(
+    "--rate-paths",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="yearly rate paths, one per row, as .npy or csv, replaces the built-in rate model",
+)
+def simulate_variable_rate(
+    property_value: int,
+    down_payment: int,
+    interest_rate: float,
+    mean_rate: float,
+    reversion: float,
+    volatility: float,
+    monthly_income: int,
+    monthly_payment: int,
+    paths: int,
+    period_months: int,
+    seed: int,
+    rate_paths: str,
+) -> None:
+    """
+    Distribution of total interest, payoff month and peak monthly interest over rate paths
+    :param property_value:
+    :param down_payment:
+    :param interest_rate:
+    :param mean_rate:
+    :param reversion:
+    :param volatility:
+    :param monthly_income:
+    :param monthly_payment:
+    :param paths:
+    :param period_months:
+    :param seed:
+    :param rate_paths:
+    :return:
+    """
+    with stage("import"):
+        from .monte_carlo import RatePathSimulation, load_rate_paths, vasicek_paths
+        from .monte_carlo_report import MonteCarloReport
+        from .mortgage import Mortgage
+
+    with stage("parse"):
+        interest_rate = normalize_rate(interest_rate)
+        loan = Mortgage(
+            property_value=property_value,
+            downpayment=down_payment,
+            yearly_income=monthly_income * 12,
+            rate=interest_rate,
+        )
+        rates = None if rate_paths is None else load_rate_paths(rate_paths)
+
+    with stage("compute"):
+        if rates is None:
+            mean_rate = interest_rate if mean_rate is None else normalize_rate(mean_rate)
+            rates = vasicek_paths(paths, period_months, interest_rate, mean_rate, reversion, volatility, seed=seed)
+        simulation = RatePathSimulation(loan, rates, monthly_payment)
+    with stage("format"):
+        report = MonteCarloReport(simulation).get_report()
+    with stage("write"):
+        print(report)
+
+
+@loan_simulation.command("afford", help="maximum property value or minimum down payment for a monthly payment")
+@click.option("-p", "--monthly-payment", type=int, required=True, help="monthly payment")
+@click.option("-v", "--property-value", type=int, default=None, help="property value, solves for the down payment")
+@click.option("-d", "--down-payment", type=int, default=None, help="down payment, solves for the property value")
+@click.option(
+    "-r",
+    "--interest-rate",
+    type=float,
+    default=DEFAULT_INTEREST_RATE,
+    show_default=True,
+    help="interest rate",
+)
+@click.option(
+    "-i",
+    "--monthly-income",
+    type=int,
+    default=DEFAULT_MONTHLY_INCOME,
+    show_default=True,
+    help="monthly income",
+)
+@click.option("-t", "--mortgage-term", type=float, default=None, help="maximum mortgage term in years")
+@click.option(
+    "--loan-to-value-limit/--no-loan-to-value-limit",
+    default=True,
+    show_default=True,
+    help=f"keep the loan to value ratio within {LOAN_TO_VALUE_LIMIT}",
+)
+def solve_affordability(
+    monthly_payment: int,
+    property_value: int,
+    down_payment: int,
+    interest_rate: float,
+    monthly_income: int,
+    mortgage_term: float,
+    loan_to_value_limit: bool,
+) -> None:
+    """
+    Inverse simulation
+    :param monthly_payment:
+    :param property_value:
+    :param down_payment:
+    :param interest_rate:
+    :param monthly_income:
+    :param mortgage_term:
+    :param loan_to_value_limit:
     :return:
     """
+    with stage("import"):
+        from .solvers import max_property_value, min_downpayment
+
+    if (property_value is None) == (down_payment is None):
+        raise click.UsageError("Give exactly one of --property-value and --down-payment")
     interest_rate = normalize_rate(interest_rate)
     yearly_income = monthly_income * 12
+    limit = LOAN_TO_VALUE_LIMIT if loan_to_value_limit else None
+
+    with stage("compute"):
+        if property_value is None:
+            value = max_property_value(
+                monthly_payment, down_payment, yearly_income, interest_rate, mortgage_term, limit
+            )
+            text = f"Maximum property value: {math.floor(value):,} SEK"
+        else:
+            downpayment = min_downpayment(
+                monthly_payment, property_value, yearly_income, interest_rate, mortgage_term, limit
+            )
+            text = f"Minimum down payment: {math.ceil(downpayment):,} SEK"
+    with stage("write"):
+        print(text)
 
-    loan = Mortgage(
-        property_value=property_value,
-        downpayment=down_payment,
-        yearly_income=yearly_income,
-        rate=interest_rate,
+
+@loan_simulation.command("batch", help="simulate loan applications read from a CSV or JSON lines file")
+@click.argument("input_file", metavar="INPUT", type=click.File("r"), default="-")
+@click.option("-o", "--output", type=click.File("w"), default="-", help="output file, stdout by default")
+@click.option(
+    "-f",
+    "--format",
+    "file_format",
+    type=click.Choice(BATCH_FORMATS),
+    default=None,
+    help="input and output format, inferred from the input extension by default",
+)
+@click.option("-w", "--workers", type=int, default=os.cpu_count(), show_default=True, help="number of worker processes")
+@click.option("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, show_default=True, help="records per task")
+@click.option(
+    "--sensitivities",
+    is_flag=True,
+    default=False,
+    help="append analytic derivatives of the term, total interest and term payment to rate, payment and loan",
+)
+def simulate_batch(
+    input_file: TextIO, output: TextIO, file_format: str, workers: int, chunk_size: int, sensitivities: bool
+) -> None:
+    """
+    Batch simulation, records carry the simulate options as fields, e.g. property_value and monthly_payment,
+    missing fields take the option defaults
+    :param input_file:
+    :param output:
+    :param file_format:
+    :param workers:
+    :param chunk_size:
+    :param sensitivities:
+    :return:
+    """
+    with stage("import"):
+        from .batch import infer_batch_format, read_records, run_batch, write_records
+
+    file_format = file_format or infer_batch_format(input_file.name)
+    records = run_batch(
+        read_records(input_file, file_format),
+        _option_defaults(),
+        workers=workers,
+        chunk_size=chunk_size,
+        sensitivities=sensitivities,
     )
+    try:
+        with stage("write"):
+            write_records(records, output, file_format)
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
 
-    payment_schedule = loan.get_payment_schedule(monthly_payment, period_months)
 
-    schedule = ScheduleReport(payment_schedule)
-    schedule_report = schedule.get_report()
-    print(schedule_report)
+@loan_simulation.command("cash-flow", help="month by month interest, amortization and remaining loan of a loan book")
+@click.argument("input_file", metavar="INPUT", type=click.File("r"), default="-")
+@click.option("-o", "--output", type=click.File("w"), default="-", help="output file, stdout by default")
+@click.option(
+    "-f",
+    "--format",
+    "file_format",
+    type=click.Choice(BATCH_FORMATS),
+    default=None,
+    help="input and output format, inferred from the input extension by default",
+)
+@click.option("-m", "--months", type=click.IntRange(min=0), default=360, show_default=True, help="projected months")
+@click.option("--by", "group_by", default=None, help="break the totals down by rate bucket (rate) or a record field")
+@click.option("--rate-bucket", type=float, default=0.5, show_default=True, help="rate bucket width in percent")
+@click.option("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, show_default=True, help="loans evaluated at once")
+def project_cash_flow(
+    input_file: TextIO,
+    output: TextIO,
+    file_format: str,
+    months: int,
+    group_by: str,
+    rate_bucket: float,
+    chunk_size: int,
+) -> None:
+    """
+    Loan book cash flows, see `cash_flow.run_cash_flows`
+    :param input_file:
+    :param output:
+    :param file_format:
+    :param months:
+    :param group_by:
+    :param rate_bucket:
+    :param chunk_size:
+    :return:
+    """
+    with stage("import"):
+        from .cash_flow import run_cash_flows
+
+    try:
+        run_cash_flows(input_file, output, file_format, _option_defaults(), months, group_by, rate_bucket, chunk_size)
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+
+
+@loan_simulation.command("serve", help="serve simulate, minimum-payment and schedule as JSON over HTTP")
+@click.option("--host", default="127.0.0.1", show_default=True, help="address to listen on")
+@click.option("--port", type=int, default=8080, show_default=True, help="port to listen on")
+@click.option("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, show_default=True, help="cached responses")
+def serve_http(host: str, port: int, cache_size: int) -> None:
+    """
+    HTTP service, e.g. GET /simulate?property_value=4000000&monthly_payment=15000 or POST /schedule with a JSON
+    object, parameters take the option names and defaults
+    :param host:
+    :param port:
+    :param cache_size:
+    :return:
+    """
+    with stage("import"):
+        from .server import serve
+
+    serve(host, port, _option_defaults(), cache_size)
+
+
+@loan_simulation.command("gui", help="interactive simulator window")
+def run_gui() -> None:
+    """
+    Simulator window with sliders, needs PyQt5
+    :return:
+    """
+    try:
+        from .gui import main
+    except ImportError as e:
+        raise click.ClickException(f"{e}, install the gui extra: pip install mortgage-simulator[gui]") from e
+    main()
+
+
+@loan_simulation.command("cache", help="show or clear the persistent result cache")
+@click.option("--clear", is_flag=True, default=False, help="remove every cached result")
+def manage_cache(clear: bool) -> None:
+    """
+    Persistent cache location and size
+    :param clear:
+    :return:
+    """
+    cache = _disk_cache(required=True)
+    if cache is None:
+        raise click.ClickException("The persistent cache cannot be opened")
+    if clear:
+        cache.clear()
+    size = cache.size / 2**20
+    print(f"{len(cache):,} cached results, {size:.1f} of {cache.max_bytes / 2 ** 20:.0f} MB in {cache.path}")
+
+
+def _open_disk_cache(ctx: click.Context) -> Optional["DiskCache"]:
+    """
+    Open the persistent cache for the duration of a command, runs go on without it when it cannot be opened
+    :param ctx: root context holding the cache settings
+    :return:
+    """
+    import sqlite3
+
+    from .disk_cache import DiskCache
+
+    try:
+        cache = DiskCache(ctx.obj["cache_dir"], ctx.obj["cache_bytes"])
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Persistent cache disabled: {e}")
+        return None
+    ctx.call_on_close(cache.close)
+    return cache
+
+
+def _disk_cache(required: bool = False) -> Optional["DiskCache"]:
+    """
+    Persistent cache of the current run
+    :param required: open the cache even when --cache is not given
+    :return: None when the cache is disabled
+    """
+    ctx = click.get_current_context().find_root()
+    if not ctx.obj:
+        return None
+    if ctx.obj["cache"] is None and required:
+        ctx.obj["cache"] = _open_disk_cache(ctx)
+    return ctx.obj["cache"]
+
+
+def _cached(cache: Optional["DiskCache"], kind: str, inputs: Dict[str, Any], compute: Callable, encoding: str = "text"):
+    if cache is None:
+        return compute()
+    from .disk_cache import cached
+
+    return cached(cache, kind, inputs, compute, encoding)
+
+
+def _stream_schedule(loan: "Mortgage", monthly_payment: int, period_months: int) -> None:
+    """
+    Stream schedule to stdout, stops quietly when the reader closes the pipe
+    :param loan:
+    :param monthly_payment:
+    :param period_months:
+    :return:
+    """
+    with stage("import"):
+        from .schedule_report import ScheduleStream
+
+    try:
+        with stage("compute"):
+            period_months = loan.schedule_length(monthly_payment, period_months)
+            bounds = loan.get_payment_schedule_months(monthly_payment, [0, min(1, period_months), period_months])
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+    report = ScheduleStream(bounds)
+    try:
+        report.write(loan.iter_payment_schedule(monthly_payment, period_months), sys.stdout)
+    except BrokenPipeError:
+        # keep the interpreter from failing again when flushing stdout at exit
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
 
 
 if __name__ == "__main__":
-    loan_simulation()
+    loan_simulation()  # pylint: disable=no-value-for-parameter
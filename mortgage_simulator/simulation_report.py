@@ -1,10 +1,9 @@
 """
 report generation
 """
-from typing import List
-
-from terminaltables import DoubleTable
+from typing import Dict, List, Sequence, Tuple
 
+from mortgage_simulator.table import render_table
 from mortgage_simulator.utils import add_color
 
 ROW_INDEX = [
@@ -34,6 +33,20 @@ ROW_INDEX = [
     "APR",
 ]
 
+# (row, sensitivity field, scale, format): rate changes are shown per basis point, payment changes per 1,000 sek,
+# loan changes per 100,000 sek and term changes per year, terms being shown in months
+SENSITIVITY_ROWS = (
+    ("Monthly payment per rate bp", "monthly_payment_per_rate", 1e-4, "{:+,.1f} sek"),
+    ("Monthly payment per 100,000 sek loan", "monthly_payment_per_loan", 1e5, "{:+,.0f} sek"),
+    ("Monthly payment per year of term", "monthly_payment_per_term_y", 1.0, "{:+,.0f} sek"),
+    ("Term per rate bp", "term_y_per_rate", 12e-4, "{:+.2f} months"),
+    ("Term per 1,000 sek payment", "term_y_per_payment", 12e3, "{:+.1f} months"),
+    ("Term per 100,000 sek loan", "term_y_per_loan", 12e5, "{:+.1f} months"),
+    ("Total interest per rate bp", "total_interest_per_rate", 1e-4, "{:+,.0f} sek"),
+    ("Total interest per 1,000 sek payment", "total_interest_per_payment", 1e3, "{:+,.0f} sek"),
+    ("Total interest per 100,000 sek loan", "total_interest_per_loan", 1e5, "{:+,.0f} sek"),
+)
+
 
 class SimulationReport:
     """
@@ -54,15 +67,23 @@ class SimulationReport:
         for i, row in enumerate(ROW_INDEX):
             self.columns[add_color(row)].append(add_color(row, data[i]))
 
-    def get_report(self) -> str:
+    def get_report(self, color: bool = True) -> str:
         """
         Get report
+        :param color: keep field colors
         :return:
         """
         simulation_list = [[key] + value for key, value in self.columns.items()]
-        report_table = DoubleTable(simulation_list)
+        return render_table(simulation_list, right=range(1, self.size + 1), color=color)
 
-        for i in range(1, self.size + 1):
-            report_table.justify_columns[i] = "right"
 
-        return report_table.table
+def get_sensitivity_report(simulations: Sequence[Tuple[str, Dict[str, float]]]) -> str:
+    """
+    Sensitivity report, one column per simulation
+    :param simulations: (title, `Mortgage.sensitivities` output) pairs
+    :return:
+    """
+    rows = [["Sensitivity"] + [title for title, _ in simulations]]
+    for row, field, scale, text in SENSITIVITY_ROWS:
+        rows.append([row] + [text.format(values[field] * scale) for _, values in simulations])
+    return render_table(rows, right=range(1, len(simulations) + 1))
@@ -0,0 +1,196 @@
+"""
+Inverse solvers: maximum affordable property value and minimum down payment
+
+The minimum monthly payment `loan * (r + amort_rate(loan) / 12)` is piecewise linear in the loan, the
+amortization rate stepping up where the loan crosses the loan to value and loan to income thresholds. Each
+solver turns the thresholds into loan breakpoints, solves every linear piece in closed form and keeps the
+largest feasible loan. Amortization thresholds are inclusive, so solutions capped by a breakpoint are nudged by
+a few ulps until the forward evaluation used by `Mortgage` confirms them. All functions accept scalars or arrays
+and broadcast.
+"""
+from typing import Any, Callable, List, Tuple
+
+import numpy as np
+
+from mortgage_simulator import annuity, rules
+
+# float rounding in the forward evaluation can put a solution a few ulps on the wrong side of a threshold
+MAX_POLISH_STEPS = 64
+
+
+def max_loan(
+    monthly_payment: Any, rate: Any, breakpoints: List[Any], steps: List[float], loan_limit: Any = np.inf
+) -> np.ndarray:
+    """
+    Largest loan whose minimum monthly payment does not exceed `monthly_payment`
+    :param monthly_payment:
+    :param rate: yearly rate
+    :param breakpoints: loans at which the amortization rate steps up, one entry per step
+    :param steps: amortization rate added at each breakpoint
+    :param loan_limit: upper bound on the loan
+    :return:
+    """
+    monthly_payment, r, loan_limit, *breakpoints = np.broadcast_arrays(
+        np.asarray(monthly_payment, dtype=float),
+        _normalize_rate(rate) / 12.0,
+        np.asarray(loan_limit, dtype=float),
+        *(np.asarray(b, dtype=float) for b in breakpoints),
+    )
+    shape = monthly_payment.shape
+    order = np.argsort(np.stack(breakpoints, axis=-1), axis=-1)
+    sorted_breakpoints = np.take_along_axis(np.stack(breakpoints, axis=-1), order, axis=-1)
+    sorted_steps = np.asarray(steps, dtype=float)[order]
+
+    lower = np.concatenate([np.zeros(shape + (1,)), sorted_breakpoints], axis=-1)
+    upper = np.concatenate([np.nextafter(sorted_breakpoints, -np.inf), np.full(shape + (1,), np.inf)], axis=-1)
+    amort_rate = np.concatenate([np.zeros(shape + (1,)), np.cumsum(sorted_steps, axis=-1)], axis=-1)
+
+    with np.errstate(divide="ignore"):
+        cap = monthly_payment[..., None] / (r[..., None] + amort_rate / 12.0)
+    cap = np.minimum(cap, loan_limit[..., None])
+    feasible = cap >= lower
+    return np.max(np.where(feasible, np.minimum(cap, upper), 0.0), axis=-1)
+
+
+def max_property_value(
+    monthly_payment: Any,
+    downpayment: Any,
+    yearly_income: Any,
+    rate: Any,
+    max_term_y: Any = None,
+    loan_to_value_limit: float = None,
+) -> Any:
+    """
+    Most expensive property affordable at `monthly_payment` with the given down payment
+    :param monthly_payment:
+    :param downpayment:
+    :param yearly_income:
+    :param rate: yearly rate
+    :param max_term_y: optionally require the loan to be repaid within this many years
+    :param loan_to_value_limit: optionally cap the loan to value ratio, e.g. rules.LOAN_TO_VALUE_LIMIT
+    :return:
+    """
+    downpayment = np.asarray(downpayment, dtype=float)
+    breakpoints, steps = _breakpoints(
+        lambda ratio: downpayment * ratio / (1.0 - ratio), np.asarray(yearly_income, dtype=float)
+    )
+    loan_limit = _term_loan_limit(monthly_payment, rate, max_term_y)
+    if loan_to_value_limit is not None:
+        loan_limit = np.minimum(loan_limit, downpayment * loan_to_value_limit / (1.0 - loan_to_value_limit))
+    property_value = downpayment + max_loan(monthly_payment, rate, breakpoints, steps, loan_limit)
+    return _result(
+        _polish(
+            property_value,
+            -np.inf,
+            lambda v: _minimum_monthly_payment(v, downpayment, yearly_income, rate) <= monthly_payment,
+        )
+    )
+
+
+def min_downpayment(
+    monthly_payment: Any,
+    property_value: Any,
+    yearly_income: Any,
+    rate: Any,
+    max_term_y: Any = None,
+    loan_to_value_limit: float = None,
+) -> Any:
+    """
+    Smallest down payment keeping the minimum monthly payment within `monthly_payment`
+    :param monthly_payment:
+    :param property_value:
+    :param yearly_income:
+    :param rate: yearly rate
+    :param max_term_y: optionally require the loan to be repaid within this many years
+    :param loan_to_value_limit: optionally cap the loan to value ratio, e.g. rules.LOAN_TO_VALUE_LIMIT
+    :return:
+    """
+    property_value = np.asarray(property_value, dtype=float)
+    breakpoints, steps = _breakpoints(lambda ratio: property_value * ratio, np.asarray(yearly_income, dtype=float))
+    loan_limit = np.minimum(_term_loan_limit(monthly_payment, rate, max_term_y), property_value)
+    if loan_to_value_limit is not None:
+        loan_limit = np.minimum(loan_limit, property_value * loan_to_value_limit)
+    downpayment = property_value - max_loan(monthly_payment, rate, breakpoints, steps, loan_limit)
+    return _result(
+        _polish(
+            downpayment,
+            np.inf,
+            lambda d: _minimum_monthly_payment(property_value, d, yearly_income, rate) <= monthly_payment,
+        )
+    )
+
+
+def min_downpayment_for_amort_rate(property_value: Any, yearly_income: Any, amort_rate: Any) -> Any:
+    """
+    Smallest down payment bringing the minimum amortization rate down to `amort_rate`, e.g. 0.01 for a loan to
+    value ratio below 70 % and a loan below 4.5 times the income
+    :param property_value:
+    :param yearly_income:
+    :param amort_rate: target minimum yearly amortization rate
+    :return:
+    """
+    property_value = np.asarray(property_value, dtype=float)
+    breakpoints, steps = _breakpoints(lambda ratio: property_value * ratio, np.asarray(yearly_income, dtype=float))
+    amort_rate = np.asarray(amort_rate, dtype=float)
+    *breakpoints, amort_rate = np.broadcast_arrays(*breakpoints, amort_rate)
+    stacked = np.stack(breakpoints, axis=-1)
+    order = np.argsort(stacked, axis=-1)
+    sorted_breakpoints = np.take_along_axis(stacked, order, axis=-1)
+    exceeded = np.cumsum(np.asarray(steps)[order], axis=-1) > amort_rate[..., None] + 1e-12
+    first = np.take_along_axis(sorted_breakpoints, exceeded.argmax(axis=-1)[..., None], axis=-1)[..., 0]
+    loan = np.where(exceeded.any(axis=-1), first, np.inf)
+    downpayment = np.maximum(property_value - loan, 0.0)
+    return _result(
+        _polish(
+            downpayment,
+            np.inf,
+            lambda d: rules.min_amort_rate((property_value - d) / property_value, (property_value - d) / yearly_income)
+            <= amort_rate + 1e-12,
+        )
+    )
+
+
+def _breakpoints(
+    loan_at_value_ratio: Callable[[float], np.ndarray], yearly_income: np.ndarray
+) -> Tuple[List[np.ndarray], List[float]]:
+    breakpoints = [loan_at_value_ratio(threshold) for threshold, _ in rules.LOAN_TO_VALUE_AMORT_STEPS]
+    breakpoints += [yearly_income * threshold for threshold, _ in rules.LOAN_TO_INCOME_AMORT_STEPS]
+    steps = [step for _, step in rules.LOAN_TO_VALUE_AMORT_STEPS + rules.LOAN_TO_INCOME_AMORT_STEPS]
+    return breakpoints, steps
+
+
+def _term_loan_limit(monthly_payment: Any, rate: Any, max_term_y: Any) -> np.ndarray:
+    if max_term_y is None:
+        return np.asarray(np.inf)
+    r = _normalize_rate(rate) / 12.0
+    term_months = np.asarray(max_term_y, dtype=float) * 12
+    # largest loan an annuity of `monthly_payment` repays within the term
+    return np.asarray(monthly_payment, dtype=float) / annuity.monthly_payment(1.0, r, term_months)
+
+
+def _minimum_monthly_payment(property_value: Any, downpayment: Any, yearly_income: Any, rate: Any) -> np.ndarray:
+    # evaluated exactly as Mortgage.minimum_monthly_payment
+    loan = property_value - downpayment
+    amort_rate = rules.min_amort_rate(loan / property_value, loan / yearly_income)
+    return loan * (_normalize_rate(rate) / 12.0) + loan * amort_rate / 12.0
+
+
+def _polish(values: np.ndarray, direction: float, feasible: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+    """
+    Move values by a few ulps towards `direction` until the forward computation agrees they are feasible
+    """
+    for _ in range(MAX_POLISH_STEPS):
+        infeasible = ~feasible(values)
+        if not infeasible.any():
+            break
+        values = np.where(infeasible, np.nextafter(values, direction), values)
+    return values
+
+
+def _normalize_rate(rate: Any) -> np.ndarray:
+    rate = np.asarray(rate, dtype=float)
+    return np.where(rate > 1.0, rate / 100.0, rate)
+
+
+def _result(values: np.ndarray) -> Any:
+    return float(values) if np.ndim(values) == 0 else values
@@ -0,0 +1,154 @@
+"""
+Parameter sweeps
+
+The Cartesian product of property values, down payments, interest rates and incomes is split in chunks,
+every chunk is evaluated as a `MortgagePortfolio` for each monthly payment (as `simulate_by_payment` does)
+and each term (as `simulate_by_term` does), chunks being spread over a process pool.
+"""
+import csv
+import itertools
+import math
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Sequence, TextIO
+
+import numpy as np
+
+from mortgage_simulator.portfolio import MortgagePortfolio
+from mortgage_simulator.profiling import stage_iter
+
+SWEEP_COLUMNS = [
+    "property_value",
+    "down_payment",
+    "interest_rate",
+    "monthly_income",
+    "simulation",
+    "monthly_payment",
+    "term_y",
+    "loan",
+    "loan_to_value_ratio",
+    "loan_to_income_ratio",
+    "min_amort_rate",
+    "minimum_monthly_payment",
+    "below_minimum_payment",
+    "amortization",
+    "amortization_rate",
+    "total_interest",
+    "total_payment",
+    "interest_to_principal",
+]
+
+SIMULATION_TYPES = ("payment", "term")
+
+MAX_CHUNK_SIZE = 50000
+
+
+def sweep_grid(
+    property_values: Sequence[float],
+    down_payments: Sequence[float],
+    interest_rates: Sequence[float],
+    monthly_incomes: Sequence[float],
+) -> np.ndarray:
+    """
+    Cartesian product of the loan parameters, one row per combination
+    :param property_values:
+    :param down_payments:
+    :param interest_rates:
+    :param monthly_incomes:
+    :return:
+    """
+    grid = itertools.product(property_values, down_payments, interest_rates, monthly_incomes)
+    return np.array(list(grid), dtype=float).reshape(-1, 4)
+
+
+def simulate_grid(grid: np.ndarray, monthly_payments: Sequence[float], terms: Sequence[float]) -> np.ndarray:
+    """
+    Simulate every grid row by payment and by term
+    :param grid: rows of (property value, down payment, interest rate, monthly income)
+    :param monthly_payments:
+    :param terms: terms in years
+    :return: array with one row per simulation and SWEEP_COLUMNS as columns, the simulations of a grid row being
+    consecutive so that the rows do not depend on how the grid is chunked
+    """
+    portfolio = MortgagePortfolio(grid[:, 0], grid[:, 1], grid[:, 3] * 12, grid[:, 2])
+    size = len(portfolio)
+    blocks = [
+        _simulation_block(grid, portfolio, 0, np.full(size, float(payment)), portfolio.term_y(float(payment)))
+        for payment in monthly_payments
+    ]
+    blocks += [
+        _simulation_block(grid, portfolio, 1, portfolio.monthly_payment(float(term)), np.full(size, float(term)))
+        for term in terms
+    ]
+    if not blocks:
+        return np.empty((0, len(SWEEP_COLUMNS)))
+    return np.stack(blocks, axis=1).reshape(-1, len(SWEEP_COLUMNS))
+
+
+def _simulation_block(
+    grid: np.ndarray, portfolio: MortgagePortfolio, simulation: int, monthly_payment: np.ndarray, term_y: np.ndarray
+) -> np.ndarray:
+    total_interest = portfolio.total_interest(monthly_payment)
+    return np.column_stack(
+        [
+            grid,
+            np.full(len(portfolio), simulation),
+            monthly_payment,
+            term_y,
+            portfolio.loan,
+            portfolio.loan_to_value_ratio,
+            portfolio.loan_to_income_ratio,
+            portfolio.min_amort_rate,
+            portfolio.minimum_monthly_payment,
+            monthly_payment < portfolio.minimum_monthly_payment,
+            portfolio.amortization(monthly_payment),
+            portfolio.amort_rate(monthly_payment),
+            total_interest,
+            total_interest + portfolio.loan,
+            total_interest / portfolio.loan,
+        ]
+    )
+
+
+def run_sweep(
+    grid: np.ndarray,
+    monthly_payments: Sequence[float],
+    terms: Sequence[float],
+    workers: int = 1,
+    chunk_size: int = None,
+) -> Iterator[np.ndarray]:
+    """
+    Simulate the grid chunk by chunk, results are yielded in grid order
+    :param grid: see `sweep_grid`
+    :param monthly_payments:
+    :param terms:
+    :param workers: number of worker processes, 1 runs in process
+    :param chunk_size: grid rows per task, by default a few tasks per worker
+    :return:
+    """
+    if chunk_size is None:
+        chunk_size = min(MAX_CHUNK_SIZE, max(1, math.ceil(len(grid) / (4 * workers))))
+    chunks = [grid[i : i + chunk_size] for i in range(0, len(grid), chunk_size)]
+    if workers <= 1:
+        yield from stage_iter("compute", (simulate_grid(chunk, monthly_payments, terms) for chunk in chunks))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        n = len(chunks)
+        yield from stage_iter("compute", executor.map(simulate_grid, chunks, [monthly_payments] * n, [terms] * n))
+
+
+def write_sweep(results: Iterator[np.ndarray], stream: TextIO) -> None:
+    """
+    Write sweep results as a tidy CSV table
+    :param results:
+    :param stream:
+    :return:
+    """
+    writer = csv.writer(stream, lineterminator="\n")
+    writer.writerow(SWEEP_COLUMNS)
+    simulation = SWEEP_COLUMNS.index("simulation")
+    below_minimum = SWEEP_COLUMNS.index("below_minimum_payment")
+    for result in results:
+        for row in result.tolist():
+            row[simulation] = SIMULATION_TYPES[int(row[simulation])]
+            row[below_minimum] = bool(row[below_minimum])
+            writer.writerow(row)
@@ -0,0 +1,135 @@
+"""
+Double-line box tables
+
+Tables are drawn in the terminaltables DoubleTable style, but every cell is measured once, rows are formatted
+with a single precomputed `str.format` template and lines are written to a stream as they are produced.
+"""
+import io
+import re
+from typing import List, Optional, Sequence, TextIO
+
+from mortgage_simulator.profiling import stage
+
+ANSI_COLOR = re.compile(r"\033\[[\d;]*m")
+
+
+def strip_colors(text: str) -> str:
+    """
+    Remove ANSI color codes
+    :param text:
+    :return:
+    """
+    return ANSI_COLOR.sub("", text) if "\033" in text else str(text)
+
+
+def visible_width(text: str) -> int:
+    """
+    Printed width of a text, ignoring ANSI color codes
+    :param text:
+    :return:
+    """
+    return len(ANSI_COLOR.sub("", text)) if "\033" in text else len(text)
+
+
+class DoubleBoxTable:
+    """
+    Table layout with fixed column widths
+    """
+
+    def __init__(self, widths: Sequence[int], right: Sequence[int] = (), title: str = None):
+        """
+        Table constructor
+        :param widths: column widths without padding
+        :param right: indices of the right-justified columns, the others are left-justified
+        :param title: text laid over the top border when it fits
+        """
+        self.widths = list(widths)
+        self.right = [i in right for i in range(len(self.widths))]
+        self.title = title
+        self._template = self.row_template()
+
+    def row_template(self, specs: Sequence[str] = None, suffixes: Sequence[str] = None) -> str:
+        """
+        `str.format` template of a table line, fields are justified to the column widths
+        :param specs: format spec of every field without alignment and width, e.g. "," for thousands separators
+        :param suffixes: text following right-justified fields within the column, e.g. " %"
+        :return:
+        """
+        specs = specs or [""] * len(self.widths)
+        suffixes = suffixes or [""] * len(self.widths)
+        fields = [
+            f"{{:{'>' if right else '<'}{width - len(suffix)}{spec}}}{suffix}"
+            for width, right, spec, suffix in zip(self.widths, self.right, specs, suffixes)
+        ]
+        return "║ " + " ║ ".join(fields) + " ║\n"
+
+    def top(self) -> str:
+        border = self._border("╔", "╦", "╗")
+        if self.title is None or visible_width(self.title) > len(border) - 3:
+            return border
+        return border[0] + self.title + border[1 + visible_width(self.title) :]
+
+    def separator(self) -> str:
+        return self._border("╠", "╬", "╣")
+
+    def bottom(self) -> str:
+        return self._border("╚", "╩", "╝")
+
+    def line(self, cells: Sequence[str]) -> str:
+        """
+        Table line
+        :param cells: one text per column
+        :return:
+        """
+        if not any("\033" in cell for cell in cells):
+            return self._template.format(*cells)
+        # colored cells are padded on their printed width
+        padded = []
+        for cell, width, right in zip(cells, self.widths, self.right):
+            padding = " " * (width - visible_width(cell))
+            padded.append(padding + cell if right else cell + padding)
+        return "║ " + " ║ ".join(padded) + " ║\n"
+
+    def _border(self, left: str, middle: str, right: str) -> str:
+        return left + middle.join("═" * (width + 2) for width in self.widths) + right + "\n"
+
+
+def render_table(
+    rows: Sequence[Sequence[str]],
+    right: Sequence[int] = (),
+    title: str = None,
+    color: bool = True,
+    stream: TextIO = None,
+) -> Optional[str]:
+    """
+    Render a table whose first row is the header
+    :param rows: rows of texts, possibly colored
+    :param right: indices of the right-justified columns
+    :param title: text laid over the top border when it fits
+    :param color: keep ANSI color codes, strip them otherwise
+    :param stream: stream the table is written to, the table is returned without its final line break otherwise
+    :return:
+    """
+    with stage("render"):
+        if not color:
+            rows = [[strip_colors(cell) for cell in row] for row in rows]
+            title = None if title is None else strip_colors(title)
+        widths: List[int] = [0] * max((len(row) for row in rows), default=0)
+        for row in rows:
+            for i, cell in enumerate(row):
+                width = visible_width(cell)
+                if width > widths[i]:
+                    widths[i] = width
+        table = DoubleBoxTable(widths, right, title)
+
+        buffer = io.StringIO()
+        output = buffer if stream is None else stream
+        output.write(table.top())
+        for i, row in enumerate(rows):
+            output.write(table.line(row))
+            if i == 0 and len(rows) > 1:
+                output.write(table.separator())
+        output.write(table.bottom())
+    if stream is None:
+        return buffer.getvalue()[:-1]
+    return None
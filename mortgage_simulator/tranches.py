@@ -0,0 +1,291 @@
+"""
+Mortgages split in tranches
+
+Swedish mortgages are usually split in tranches (lånedelar) with their own rates and fixation periods, sharing one
+property and one income. The amortization requirement applies to the total loan and is shared between tranches in
+proportion to their size, so every tranche amortizes at the household rate. Tranches are stacked along the last
+axis of every array: a household is a 1-d array of tranches and a loan book a households x tranches array, loans
+with fewer tranches being padded with empty tranches.
+"""
+import logging
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from mortgage_simulator import annuity, rules, schedule
+from mortgage_simulator.mortgage import SIMULATION_FIELDS, Mortgage
+from mortgage_simulator.rules import TAX_DEDUCTION_RATE
+from mortgage_simulator.schedule import PaymentSchedule
+from mortgage_simulator.simulation_report import ROW_INDEX, SimulationReport
+
+logger = logging.getLogger(__name__)
+
+TOTAL_TITLE = "total"
+
+# report rows describing the household rather than a tranche
+HOUSEHOLD_ROWS = ("Property value", "Down payment", "Loan to value ratio", "Loan to income ratio")
+
+
+class MultiTrancheMortgage:
+    """
+    Mortgage made of tranches sharing one property and one income, every attribute is an array whose last axis
+    is the tranche axis for tranche figures and absent for household figures
+    """
+
+    def __init__(self, property_value: Any, yearly_income: Any, loans: Any, rates: Any):
+        """
+        Multi-tranche mortgage constructor, the down payment is what the tranches do not cover
+        :param property_value: one value per household
+        :param yearly_income: one value per household
+        :param loans: tranche loans, households x tranches, 0 for padding
+        :param rates: yearly tranche rates, values above 1 are read as percentages
+        """
+        loans, rates = np.broadcast_arrays(np.asarray(loans, dtype=float), np.asarray(rates, dtype=float))
+        if loans.ndim == 0:
+            raise ValueError("Tranche loans must have a tranche axis")
+        if np.any(loans < 0):
+            raise ValueError("Negative tranche loan")
+        self.loans = loans
+        self.rates = np.where(rates > 1.0, rates / 100.0, rates)
+        self.r = self.rates / 12.0
+        self.loan = loans.sum(axis=-1)
+        self.property_value, self.yearly_income = np.broadcast_arrays(
+            np.asarray(property_value, dtype=float), np.asarray(yearly_income, dtype=float)
+        )
+        self.downpayment = self.property_value - self.loan
+        if np.any(self.downpayment < 0):
+            raise ValueError("Tranche loans exceed the property value")
+        # empty tranches take no share of the amortization
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.shares = np.where(loans > 0, loans / self.loan[..., None], 0.0)
+
+        self.loan_to_value_ratio = self.loan / self.property_value
+        self.loan_to_income_ratio = self.loan / self.yearly_income
+        self.min_amort_rate = rules.min_amort_rate(self.loan_to_value_ratio, self.loan_to_income_ratio)
+        self.tranche_interest = self.loans * self.r
+        self.monthly_interest = self.tranche_interest.sum(axis=-1)
+        self.minimum_amortization = self.loan * self.min_amort_rate / 12.0
+        self.minimum_monthly_payment = self.monthly_interest + self.minimum_amortization
+        # loan weighted yearly rate
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.rate = np.where(self.loan > 0, self.tranche_interest.sum(axis=-1) * 12.0 / self.loan, 0.0)
+
+        if np.any(self.exceeds_loan_to_value_limit):
+            logger.warning(f"Your loan to value ratio is too large, the limit is {rules.LOAN_TO_VALUE_LIMIT}")
+
+    @classmethod
+    def from_tranches(
+        cls, property_value: float, downpayment: float, yearly_income: float, tranches: Sequence[Sequence[float]]
+    ) -> "MultiTrancheMortgage":
+        """
+        Household mortgage from (loan, rate) tranches, a tranche with a negative loan takes the part of the loan
+        that the other tranches leave, e.g. the variable rate part
+        :param property_value:
+        :param downpayment:
+        :param yearly_income:
+        :param tranches: (loan, yearly rate) pairs
+        :return:
+        """
+        loans = [float(loan) for loan, _ in tranches]
+        rest = property_value - downpayment - sum(loan for loan in loans if loan >= 0)
+        if rest < 0:
+            raise ValueError(f"Tranches exceed the loan {property_value - downpayment:,.0f} by {-rest:,.0f}")
+        loans = [rest if loan < 0 else loan for loan in loans]
+        if sum(loans) != property_value - downpayment:
+            raise ValueError(f"Tranches cover {sum(loans):,.0f} of the loan {property_value - downpayment:,.0f}")
+        return cls(property_value, yearly_income, loans, [rate for _, rate in tranches])
+
+    def __len__(self) -> int:
+        return self.loans.shape[-1]
+
+    @property
+    def exceeds_loan_to_value_limit(self) -> np.ndarray:
+        return self.loan_to_value_ratio > rules.LOAN_TO_VALUE_LIMIT
+
+    def tranche_payments(self, monthly_payment: Any) -> np.ndarray:
+        """
+        Monthly payment of every tranche, the amortization left after interest is shared in proportion to the
+        tranche loans
+        :param monthly_payment: household monthly payment
+        :return:
+        """
+        amortization = np.asarray(monthly_payment, dtype=float) - self.monthly_interest
+        return self.tranche_interest + self.shares * amortization[..., None]
+
+    def tranche_term_m(self, monthly_payment: Any) -> np.ndarray:
+        """
+        Term in months of every tranche, NaN where the payment does not exceed the interest, 0 for empty tranches
+        :param monthly_payment: household monthly payment
+        :return:
+        """
+        payments = self.tranche_payments(monthly_payment)
+        loan_term = annuity.term_m(self.loans, self.r, payments)
+        return np.where(self.loans > 0, np.where(payments > self.tranche_interest, loan_term, np.nan), 0.0)
+
+    def term_m(self, monthly_payment: Any) -> np.ndarray:
+        """
+        household term in months, the term of the longest tranche
+        :param monthly_payment:
+        :return:
+        """
+        return self.tranche_term_m(monthly_payment).max(axis=-1)
+
+    def term_y(self, monthly_payment: Any) -> np.ndarray:
+        return self.term_m(monthly_payment) / 12.0
+
+    def tranche_total_interest(self, monthly_payment: Any) -> np.ndarray:
+        return self.tranche_payments(monthly_payment) * self.tranche_term_m(monthly_payment) - self.loans
+
+    def total_interest(self, monthly_payment: Any) -> np.ndarray:
+        return self.tranche_total_interest(monthly_payment).sum(axis=-1)
+
+    def simulation_values(self, monthly_payment: Any = None) -> Dict[str, np.ndarray]:
+        """
+        Numeric simulation figures of every tranche followed by the household total, keyed by SIMULATION_FIELDS
+        :param monthly_payment: household monthly payment, the minimum payment by default
+        :return: arrays whose last axis holds the tranches then the total
+        """
+        if monthly_payment is None:
+            monthly_payment = self.minimum_monthly_payment
+        monthly_payment = np.asarray(monthly_payment, dtype=float)
+        payments = self.tranche_payments(monthly_payment)
+        minimum_payments = self.tranche_payments(self.minimum_monthly_payment)
+        term_m = self.tranche_term_m(monthly_payment)
+        maximum_term_m = self.tranche_term_m(self.minimum_monthly_payment)
+        total_interest = payments * term_m - self.loans
+
+        def with_total(tranche: np.ndarray, total: Any) -> np.ndarray:
+            return np.concatenate([tranche, np.asarray(total, dtype=float)[..., None]], axis=-1)
+
+        def household(values: Any) -> np.ndarray:
+            return np.repeat(np.asarray(values, dtype=float)[..., None], len(self) + 1, axis=-1)
+
+        loans = with_total(self.loans, self.loan)
+        rates = with_total(self.rates, self.rate)
+        interest = with_total(self.tranche_interest, self.monthly_interest)
+        payment = with_total(payments, monthly_payment)
+        total_interest = with_total(total_interest, total_interest.sum(axis=-1))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = {
+                "property_value": household(self.property_value),
+                "downpayment": household(self.downpayment),
+                "loan": loans,
+                "rate": rates,
+                "loan_to_value_ratio": household(self.loan_to_value_ratio),
+                "loan_to_income_ratio": household(self.loan_to_income_ratio),
+                "min_amort_rate": household(self.min_amort_rate),
+                "minimum_amortization": with_total(minimum_payments - self.tranche_interest, self.minimum_amortization),
+                "minimum_monthly_payment": with_total(minimum_payments, self.minimum_monthly_payment),
+                "maximum_term_y": with_total(maximum_term_m, maximum_term_m.max(axis=-1)) / 12.0,
+                "monthly_payment": payment,
+                "monthly_interest": interest,
+                "tax_deduction": interest * TAX_DEDUCTION_RATE,
+                "interest_post_tax_deduction": interest * (1 - TAX_DEDUCTION_RATE),
+                "amortization": payment - interest,
+                "amortization_rate": (payment - interest) / loans * 12.0,
+                "term_y": with_total(term_m, term_m.max(axis=-1)) / 12.0,
+                "total_principal": loans,
+                "total_interest": total_interest,
+                "total_payment": total_interest + loans,
+                "interest_to_principal": total_interest / loans,
+                "apy": (1 + rates / 12.0) ** 12 - 1.0,
+                "apr": rates,
+            }
+        return {name: values[name] for name in SIMULATION_FIELDS}
+
+    def simulations(self, monthly_payment: float = None) -> List[Tuple[str, Dict[str, float]]]:
+        """
+        Simulation figures of a household, one (title, values) pair per tranche then the total, as expected by
+        export.simulation_records
+        :param monthly_payment:
+        :return:
+        """
+        values = self.simulation_values(monthly_payment)
+        titles = [f"tranche {i + 1} {100 * rate:.2f} %" for i, rate in enumerate(self.rates)] + [TOTAL_TITLE]
+        return [(title, {name: float(values[name][i]) for name in values}) for i, title in enumerate(titles)]
+
+    def get_report(self, monthly_payment: float = None, color: bool = True) -> str:
+        """
+        Simulation report of a household, one column per tranche and a total column
+        :param monthly_payment:
+        :param color: keep field colors
+        :return:
+        """
+        report = SimulationReport()
+        household_rows = [ROW_INDEX.index(row) for row in HOUSEHOLD_ROWS]
+        for title, values in self.simulations(monthly_payment):
+            data = Mortgage._get_simulation_data(values, title)  # pylint: disable=protected-access
+            if title != TOTAL_TITLE:
+                for i in household_rows:
+                    data[i] = "-"
+            report.add_simulation(data)
+        return report.get_report(color=color)
+
+    def schedule_months(self, monthly_payment: float, months: Any) -> PaymentSchedule:
+        """
+        Schedule of one household at the end of the given months, the tranches being evaluated as one stacked
+        array. Tranches stop once repaid, their last installment covering only what remains.
+        :param monthly_payment: household monthly payment
+        :param months: month index or array of month indices
+        :return:
+        """
+        months = np.asarray(months)
+        started = months > 0
+        loans, r = self.loans[:, None], self.r[:, None]
+        payments = self.tranche_payments(monthly_payment)[:, None]
+        last_month = np.ceil(self.tranche_term_m(monthly_payment))[:, None]
+        paying = started & (months <= last_month)
+
+        paid_months = np.minimum(months, last_month)
+        balance = annuity.balance(loans, r, payments, paid_months)
+        previous_loan = annuity.balance(loans, r, payments, np.maximum(paid_months - 1, 0))
+        remaining = np.maximum(balance, 0.0)
+        month_interest = np.where(paying, previous_loan * r, 0.0).sum(axis=0)
+        month_amortization = np.where(paying, previous_loan - remaining, 0.0).sum(axis=0)
+        # the overpayment of the last installment is not paid, it cancels out of the interest
+        interest_paid = (payments * paid_months - (loans - balance)).sum(axis=0)
+        remaining_loan = remaining.sum(axis=0)
+
+        return PaymentSchedule(
+            {
+                "year": np.where(started, (months - 1) // 12 + 1, 0),
+                "month": months,
+                "debt ratio": remaining_loan / self.property_value,
+                "month interest": month_interest,
+                "month amortization": month_amortization,
+                "remaining loan": remaining_loan,
+                "total paid": self.downpayment + interest_paid + self.loan - remaining_loan,
+                "total interest paid": interest_paid,
+                "total amortized": self.downpayment + self.loan - remaining_loan,
+                "total tax return": interest_paid * TAX_DEDUCTION_RATE,
+            }
+        )
+
+    def get_payment_schedule(
+        self, monthly_payment: float, period_months: int, resolution: str = "month"
+    ) -> PaymentSchedule:
+        """
+        Household payment schedule from signature until `period_months`, or until every tranche is repaid
+        :param monthly_payment:
+        :param period_months: negative to schedule until total repayment
+        :param resolution: one of schedule.RESOLUTIONS
+        :return:
+        """
+        if self.loans.ndim != 1:
+            raise ValueError("Payment schedules are computed for one household at a time")
+        if resolution not in schedule.RESOLUTIONS:
+            raise ValueError(f"Unknown resolution {resolution}, expected one of {', '.join(schedule.RESOLUTIONS)}")
+        if monthly_payment <= self.monthly_interest:
+            raise ValueError(
+                f"Monthly payment {monthly_payment} needs to be above monthly interest {self.monthly_interest}"
+            )
+        loan_term = int(np.ceil(self.term_m(monthly_payment)))
+        if period_months < 0 or period_months > loan_term:
+            period_months = loan_term
+        if resolution == "month":
+            return self.schedule_months(monthly_payment, np.arange(period_months + 1))
+        return schedule.schedule_periods(
+            lambda months: self.schedule_months(monthly_payment, months),
+            period_months,
+            schedule.RESOLUTIONS[resolution],
+        )
@@ -1,9 +1,8 @@
 """
 Utility functions
 """
-from typing import Optional
-
-from colorclass import Color
+import math
+from typing import List, Optional
 
 COLORS = {
     "Property value": "autoyellow",
@@ -33,5 +32,28 @@ def add_color(field: str, text: Optional[str] = None) -> str:
     """
     text = text or field
     if field in COLORS:
+        # colorclass is only needed when rendering reports
+        from colorclass import Color  # pylint: disable=import-outside-toplevel
+
         return Color(f"{{{COLORS[field]}}}{text}{{/{COLORS[field]}}}")
     return text
+
+
+def parse_values(text: str) -> List[float]:
+    """
+    parse a comma separated list of values and inclusive `start:stop:step` ranges, e.g. "1,2,5:10:2.5"
+    :param text:
+    :return:
+    """
+    values: List[float] = []
+    for item in text.split(","):
+        bounds = [float(bound) for bound in item.split(":")]
+        if len(bounds) == 1:
+            values.extend(bounds)
+        elif len(bounds) == 3 and bounds[2] > 0 and bounds[0] <= bounds[1]:
+            start, stop, step = bounds
+            count = int(math.floor((stop - start) / step + 1e-9)) + 1
+            values.extend(start + i * step for i in range(count))
+        else:
+            raise ValueError(f"Invalid range {item}, expected start:stop:step with a positive step")
+    return values
@@ -12,10 +12,15 @@ with open("HISTORY.rst") as history_file:
 
 requirements = [
     "Click>=7.0",
-    "terminaltables==3.1.*",
     "colorclass==2.2.*",
+    "numpy>=1.17",
 ]
 
+extra_requirements = {
+    "arrow": ["pyarrow"],
+    "gui": ["PyQt5"],
+}
+
 setup_requirements = [
     "pytest-runner",
 ]
@@ -27,21 +32,20 @@ test_requirements = [
 setup(
     author="Sofiane Soussi",
     author_email="sofiane.soussi@gmail.com",
-    python_requires=">=3.5",
+    python_requires=">=3.7",
     classifiers=[
         "Development Status :: 2 - Pre-Alpha",
         "Intended Audience :: Developers",
         "License :: OSI Approved :: MIT License",
         "Natural Language :: English",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.5",
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
     ],
     description="Mortgage simulator based on Swedish bank rules",
     entry_points={"console_scripts": ["mortgage-simulator=mortgage_simulator.simulate_mortgage:loan_simulation",],},
     install_requires=requirements,
+    extras_require=extra_requirements,
     license="MIT license",
     long_description=readme + "\n\n" + history,
     include_package_data=True,
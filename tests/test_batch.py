@@ -0,0 +1,78 @@
+"""Tests for `mortgage_simulator.batch`."""
+import io
+import json
+
+import pytest
+
+from mortgage_simulator.batch import BATCH_COLUMNS, read_records, run_batch, write_records
+from mortgage_simulator.mortgage import SENSITIVITY_FIELDS, Mortgage
+
+DEFAULTS = {
+    "property_value": None,
+    "down_payment": 1000000,
+    "interest_rate": 0.015,
+    "mortgage_term": 25,
+    "monthly_income": 40000,
+    "monthly_payment": 10000,
+}
+
+
+def test_batch_matches_mortgage_in_input_order():
+    lines = ["id,property_value,down_payment,monthly_payment"]
+    lines += [f"{i},{3000000 + 10000 * i},{500000 + 1000 * i},{15000 + 10 * i}" for i in range(50)]
+    records = read_records(io.StringIO("\n".join(lines)), "csv")
+    results = list(run_batch(records, DEFAULTS, workers=2, chunk_size=7))
+
+    assert [int(result["id"]) for result in results] == list(range(50))
+    for result in results:
+        loan = Mortgage(float(result["property_value"]), float(result["down_payment"]), 40000 * 12, 0.015)
+        assert result["interest_rate"] == 0.015
+        assert result["minimum_monthly_payment"] == pytest.approx(loan.minimum_monthly_payment)
+        assert result["term_y"] == pytest.approx(loan.term_y(float(result["monthly_payment"])))
+        assert result["term_monthly_payment"] == pytest.approx(loan.monthly_payment(25))
+
+
+def test_batch_flags_and_jsonl_roundtrip():
+    records = [
+        {"property_value": 4000000, "down_payment": 200000, "monthly-payment": 30000},
+        {"property_value": 4000000, "down_payment": 1000000, "monthly-payment": 1000, "interest_rate": 2},
+    ]
+    stream = io.StringIO("".join(json.dumps(record) + "\n" for record in records))
+    output = io.StringIO()
+    write_records(run_batch(read_records(stream, "jsonl"), DEFAULTS), output, "jsonl")
+    exceeding, underpaying = [json.loads(line) for line in output.getvalue().splitlines()]
+
+    assert exceeding["exceeds_loan_to_value_limit"] and not exceeding["below_minimum_payment"]
+    assert underpaying["below_minimum_payment"] and not underpaying["exceeds_loan_to_value_limit"]
+    assert underpaying["term_y"] is None
+    assert set(BATCH_COLUMNS) <= set(underpaying)
+
+
+def test_batch_rejects_incomplete_records():
+    with pytest.raises(ValueError, match="record 1"):
+        list(run_batch([{"property_value": 3000000}, {"down_payment": 100}], DEFAULTS))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_batch_reports_the_record_index_across_chunks(workers):
+    lines = ["property_value,down_payment"] + [f"3000000,{5000000 if i == 12 else 500000}" for i in range(20)]
+    records = read_records(io.StringIO("\n".join(lines)), "csv")
+    with pytest.raises(ValueError, match="Invalid record 12: negative loan to value ratio"):
+        list(run_batch(records, DEFAULTS, workers=workers, chunk_size=5))
+
+
+def test_batch_rejects_extra_cells():
+    records = read_records(io.StringIO("property_value,down_payment\n3000000,500000\n3000000,500000,1,2\n"), "csv")
+    with pytest.raises(ValueError, match="Invalid record 1: 2 more values than fields"):
+        list(run_batch(records, DEFAULTS))
+
+
+def test_batch_sensitivities():
+    records = [{"property_value": 3000000 + 100000 * i, "monthly_payment": 15000} for i in range(5)]
+    results = list(run_batch(records, DEFAULTS, sensitivities=True))
+    for result in results:
+        loan = Mortgage(result["property_value"], 1000000, 40000 * 12, 0.015)
+        expected = loan.sensitivities(15000, 25)
+        for field in SENSITIVITY_FIELDS:
+            assert result[field] == pytest.approx(expected[field])
+    assert not set(SENSITIVITY_FIELDS) & set(next(run_batch(records, DEFAULTS)))
@@ -0,0 +1,26 @@
+"""Tests for `benchmarks.run_benchmarks`."""
+import pytest
+
+from benchmarks.run_benchmarks import BENCHMARKS, compare_results, schedule_scaling, time_benchmark
+
+
+def test_time_benchmark():
+    result = time_benchmark(BENCHMARKS["mortgage.construct"](), repeat=2, min_time=0.001)
+    assert result["repeat"] == 2
+    assert 0 < result["min"] <= result["median"]
+
+
+def test_compare_results_flags_regressions():
+    baseline = {"results": {"fast": {"min": 1.0}, "slow": {"min": 1.0}, "removed": {"min": 1.0}}}
+    current = {"results": {"fast": {"min": 1.1}, "slow": {"min": 1.5}, "added": {"min": 1.0}}}
+    comparison = {entry["name"]: entry for entry in compare_results(baseline, current, threshold=0.2)}
+    assert set(comparison) == {"fast", "slow"}
+    assert not comparison["fast"]["regression"]
+    assert comparison["slow"]["regression"]
+
+
+def test_schedule_scaling():
+    result = schedule_scaling([2], loans=50, months=24, repeat=1)
+    assert [entry["workers"] for entry in result["scaling"]] == [1, 2]
+    assert result["scaling"][0]["efficiency"] == 1.0
+    assert result["scaling"][1]["efficiency"] == pytest.approx(result["scaling"][1]["speedup"] / 2)
@@ -0,0 +1,112 @@
+"""Tests for `mortgage_simulator.cash_flow`."""
+import csv
+import io
+import json
+
+import numpy as np
+import pytest
+
+from mortgage_simulator.cash_flow import TOTAL_GROUP, project_cash_flows, rate_buckets, run_cash_flows, write_cash_flows
+from mortgage_simulator.mortgage import Mortgage
+
+DEFAULTS = {
+    "property_value": None,
+    "down_payment": 1000000,
+    "interest_rate": 0.03,
+    "mortgage_term": 25,
+    "monthly_income": 40000,
+    "monthly_payment": 20000,
+}
+
+
+def loan_book(count: int):
+    return [
+        {
+            "property_value": 2000000 + 50000 * i,
+            "monthly_payment": 12000 + 500 * i,
+            "interest_rate": 0.02 + 0.001 * i,
+            "cohort": f"{2015 + i % 3}",
+        }
+        for i in range(count)
+    ]
+
+
+def test_totals_match_loan_schedules():
+    records = loan_book(20)
+    total = project_cash_flows(records, DEFAULTS, 480)[TOTAL_GROUP]
+    remaining_loan = np.zeros(481)
+    interest = np.zeros(481)
+    for record in records:
+        loan = Mortgage(record["property_value"], 1000000, 480000, record["interest_rate"])
+        schedule = loan.get_payment_schedule_months(record["monthly_payment"], np.arange(481))
+        remaining_loan += np.maximum(schedule["remaining loan"], 0)
+        interest += np.where(
+            schedule["remaining loan"] + schedule["month amortization"] > 0, schedule["month interest"], 0
+        )
+    np.testing.assert_allclose(total["remaining_loan"], remaining_loan, atol=1e-6)
+    np.testing.assert_allclose(total["interest"], interest, atol=1e-6)
+    # repaid loans stop paying, the book is fully amortized within the horizon
+    assert total["amortization"].sum() == pytest.approx(remaining_loan[0])
+    assert total["active_loans"][0] == 20 and total["active_loans"][-1] == 0
+
+
+def test_chunk_size_and_groups():
+    records = loan_book(25)
+    projection = project_cash_flows(records, DEFAULTS, 120, group_by="cohort", chunk_size=7)
+    assert list(projection) == [TOTAL_GROUP, "2015", "2016", "2017"]
+    unchunked = project_cash_flows(records, DEFAULTS, 120)[TOTAL_GROUP]
+    for column in projection[TOTAL_GROUP].columns:
+        np.testing.assert_allclose(projection[TOTAL_GROUP][column], unchunked[column])
+        if column != "month":
+            groups = sum(projection[group][column] for group in ("2015", "2016", "2017"))
+            np.testing.assert_allclose(groups, unchunked[column])
+
+
+def test_extra_cells_are_rejected():
+    records = csv.DictReader(io.StringIO("property_value\n2000000\n2000000,12000\n"))
+    with pytest.raises(ValueError, match="Invalid record 1"):
+        project_cash_flows(records, DEFAULTS, 12)
+
+
+def test_rate_buckets():
+    assert rate_buckets([0.02, 0.0249, 0.025, 0.1]).tolist() == [
+        "2.00-2.50 %",
+        "2.00-2.50 %",
+        "2.50-3.00 %",
+        "10.00-10.50 %",
+    ]
+    projection = project_cash_flows(loan_book(12), DEFAULTS, 12, group_by="rate", rate_bucket=0.0025)
+    assert list(projection) == [TOTAL_GROUP, "2.00-2.25 %", "2.25-2.50 %", "2.50-2.75 %", "2.75-3.00 %", "3.00-3.25 %"]
+    assert sum(projection[group]["active_loans"][0] for group in list(projection)[1:]) == 12
+
+
+def test_aged_loans_start_into_their_schedule():
+    record = loan_book(1)[0]
+    fresh = project_cash_flows([record], DEFAULTS, 60)[TOTAL_GROUP]
+    aged = project_cash_flows([{**record, "age_months": 24}], DEFAULTS, 36)[TOTAL_GROUP]
+    for column in ("interest", "amortization", "remaining_loan"):
+        np.testing.assert_allclose(aged[column][1:], fresh[column][25:])
+    assert aged["remaining_loan"][0] == pytest.approx(fresh["remaining_loan"][24])
+
+
+def test_invalid_records():
+    with pytest.raises(ValueError, match="Invalid record 1: missing cohort"):
+        project_cash_flows([loan_book(1)[0], {"property_value": 2000000}], DEFAULTS, 12, group_by="cohort")
+
+
+def test_write_cash_flows():
+    output = io.StringIO()
+    write_cash_flows(project_cash_flows(loan_book(3), DEFAULTS, 2, group_by="cohort"), output, "csv")
+    lines = output.getvalue().splitlines()
+    assert lines[0] == "group,month,active_loans,interest,amortization,remaining_loan"
+    assert len(lines) == 1 + 4 * 3
+    assert lines[1].startswith("total,0,3,0.0,0.0,")
+
+
+def test_run_cash_flows_reads_and_writes_batch_files():
+    source = io.StringIO("".join(json.dumps(record) + "\n" for record in loan_book(4)))
+    output = io.StringIO()
+    run_cash_flows(source, output, "jsonl", DEFAULTS, 6, group_by="rate", rate_bucket_percent=1)
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert {line["group"] for line in lines} == {TOTAL_GROUP, "2.00-3.00 %"}
+    assert lines[0]["active_loans"] == 4
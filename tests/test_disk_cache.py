@@ -0,0 +1,101 @@
+"""Tests for `mortgage_simulator.disk_cache`."""
+import os
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from mortgage_simulator.disk_cache import DiskCache, cache_key, cached
+from mortgage_simulator.mortgage import Mortgage
+
+ENTRY_POINT = "mortgage_simulator.simulate_mortgage"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    disk_cache = DiskCache(str(tmp_path), max_bytes=10000)
+    yield disk_cache
+    disk_cache.close()
+
+
+def test_key_is_canonical():
+    inputs = {"property_value": 4000000, "interest_rate": 0.03, "tranches": [(1000000, 0.02)]}
+    same = {"tranches": [[1e6, 0.02]], "interest_rate": 0.03, "property_value": 4e6}
+    assert cache_key("simulations", inputs) == cache_key("simulations", same)
+    assert cache_key("simulations", inputs) != cache_key("simulation report", inputs)
+    assert cache_key("simulations", inputs) != cache_key("simulations", {**inputs, "interest_rate": 0.031})
+    with pytest.raises(TypeError):
+        cache_key("simulations", {"loan": object()})
+
+
+def test_cached_computes_once(cache):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return [["monthly payment", {"term_y": float("inf")}]]
+
+    for _ in range(2):
+        assert cached(cache, "simulations", {"a": 1}, compute, "json") == compute()
+    assert len(calls) == 3
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_schedule_round_trip(cache):
+    schedule = Mortgage(4000000, 1000000, 480000, 0.03).get_payment_schedule(15000, 24)
+    cached(cache, "schedule", {"a": 1}, lambda: schedule, "schedule")
+    restored = cached(cache, "schedule", {"a": 1}, pytest.fail, "schedule")
+    assert restored.columns == schedule.columns
+    for column in schedule.columns:
+        np.testing.assert_array_equal(restored[column], schedule[column])
+
+
+def test_least_recently_read_entries_are_evicted(cache):
+    for i in range(4):
+        cache.put(str(i), bytes(3000))
+    assert len(cache) == 3 and cache.size <= cache.max_bytes
+    assert cache.get("0") is None
+    cache.get("1")
+    cache.put("4", bytes(3000))
+    assert cache.get("1") is not None and cache.get("2") is None
+    # larger than the whole cache
+    cache.put("5", bytes(20000))
+    assert cache.get("5") is None
+
+
+def _fill(directory: str, worker: int) -> int:
+    disk_cache = DiskCache(directory, max_bytes=50000)
+    for i in range(50):
+        disk_cache.put(f"{worker}-{i}", bytes(100 + i))
+        disk_cache.get(f"{(worker + 1) % 4}-{i}")
+    found = sum(disk_cache.get(f"{worker}-{i}") is not None for i in range(50))
+    disk_cache.close()
+    return found
+
+
+def test_concurrent_processes(tmp_path):
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        found = list(executor.map(_fill, [str(tmp_path)] * 4, range(4)))
+    assert found == [50] * 4
+    disk_cache = DiskCache(str(tmp_path))
+    assert len(disk_cache) == 200
+    disk_cache.close()
+
+
+def test_cli_warm_hits_match_cold_runs(tmp_path):
+    env = {**os.environ, "MORTGAGE_SIMULATOR_CACHE_DIR": str(tmp_path)}
+
+    def run(*args):
+        command = [sys.executable, "-m", ENTRY_POINT] + list(args)
+        return subprocess.run(command, check=True, stdout=subprocess.PIPE, universal_newlines=True, env=env).stdout
+
+    simulate = ["simulate", "-v", "4000000", "-p", "15000", "--no-color"]
+    schedule = ["schedule", "-v", "4000000", "-p", "15000", "-m", "36"]
+    for args in (simulate, schedule):
+        expected = run(*args)
+        assert run("--cache", *args) == expected
+        assert run("--cache", *args) == expected
+    assert run("cache").startswith("2 cached results")
+    assert run("cache", "--clear").startswith("0 cached results")
@@ -0,0 +1,61 @@
+"""Tests for `mortgage_simulator.export`."""
+import sys
+
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from mortgage_simulator.export import LOAN_ID, export_records, schedule_records, simulation_records
+from mortgage_simulator.mortgage import Mortgage
+from mortgage_simulator.simulate_mortgage import loan_simulation
+
+
+@pytest.fixture
+def loan():
+    return Mortgage(property_value=3000000, downpayment=1000000, yearly_income=480000, rate=0.015)
+
+
+def test_npy_export_appends_loans(loan, tmp_path):
+    path = str(tmp_path / "schedules.npy")
+    first = schedule_records(loan.get_payment_schedule(12000, -1), loan_id=0)
+    second = schedule_records(loan.get_payment_schedule(15000, -1), loan_id=1)
+    export_records(first, path)
+    export_records(second, path, append=True)
+
+    records = np.load(path, mmap_mode="r")
+    assert len(records) == len(first) + len(second)
+    np.testing.assert_array_equal(records[LOAN_ID][len(first) :], 1)
+    np.testing.assert_array_equal(records["remaining loan"][: len(first)], first["remaining loan"])
+
+
+def test_npy_append_to_plain_numpy_file(loan, tmp_path):
+    path = str(tmp_path / "schedules.npy")
+    records = schedule_records(loan.get_payment_schedule(12000, 12))
+    np.save(path, records)
+    export_records(records, path, append=True)
+    assert len(np.load(path)) == 2 * len(records)
+
+
+def test_simulation_records(loan):
+    records = simulation_records([("minimum payment", loan.simulation_values())])
+    assert records["simulation"][0] == "minimum payment"
+    assert records["term_y"][0] == pytest.approx(loan.maximum_term_y)
+
+
+def test_arrow_export(loan, tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    path = str(tmp_path / "schedules.arrow")
+    records = schedule_records(loan.get_payment_schedule(12000, -1))
+    export_records(records, path)
+    export_records(records, path, append=True)
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    assert table.num_rows == 2 * len(records)
+
+
+@pytest.mark.parametrize("command", ["simulate", "schedule"])
+def test_export_without_pyarrow(command, tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    result = CliRunner().invoke(loan_simulation, [command, "-v", "4000000", "-o", str(tmp_path / "out.parquet")])
+    assert result.exit_code == 1
+    assert "Error: Exporting to parquet requires pyarrow" in result.output
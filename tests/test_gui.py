@@ -0,0 +1,90 @@
+"""Tests for `mortgage_simulator.gui`, run headless on the offscreen Qt platform."""
+import os
+import time
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PyQt5.QtWidgets")
+
+# pylint: disable=wrong-import-position
+from mortgage_simulator import gui  # noqa: E402
+from mortgage_simulator.scenario import Scenario  # noqa: E402
+from mortgage_simulator.simulation_report import ROW_INDEX  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+@pytest.fixture
+def window(app):
+    simulator = gui.SimulatorWindow(debounce_ms=10)
+    yield simulator
+    simulator.close()
+
+
+def wait_for(app, condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        app.processEvents()
+        time.sleep(0.002)
+
+
+def table_columns(window):
+    table = window.table
+    return [
+        [table.horizontalHeaderItem(j).text()] + [table.item(i, j).text() for i in range(table.rowCount())]
+        for j in range(table.columnCount())
+    ]
+
+
+def test_report_matches_scenario(app, window):
+    wait_for(app, lambda: window.shown == window.generation)
+    assert table_columns(window) == Scenario(**window.inputs()).report_columns()
+    assert len(window.chart.curves["months"]) > 2
+    assert not window.chart.grab().isNull()
+
+
+def test_slider_moves_are_debounced(app, window):
+    wait_for(app, lambda: window.shown == window.generation)
+    computed = window.worker.computed
+    for payment in range(16000, 26000, 500):
+        window.set_value("monthly_payment", payment)
+    window.set_value("rate", 0.035)
+    wait_for(app, lambda: window.shown == window.generation and window.generation > 1)
+    assert window.worker.computed == computed + 1
+    inputs = window.inputs()
+    assert inputs["monthly_payment"] == 25500 and inputs["rate"] == pytest.approx(0.035)
+    assert table_columns(window) == Scenario(**inputs).report_columns()
+
+
+def test_invalid_inputs_are_reported(app, window):
+    window.set_value("monthly_payment", 1000)
+    wait_for(app, lambda: window.shown == window.generation and window.generation > 1)
+    assert "interest" in window.statusBar().currentMessage()
+    window.set_value("monthly_payment", 20000)
+    wait_for(app, lambda: window.shown == window.generation and window.generation > 2)
+    assert window.statusBar().currentMessage() == ""
+    assert table_columns(window)[0][ROW_INDEX.index("Monthly payment")] == "20,000 sek"
+
+
+def test_stale_requests_are_skipped(app):
+    worker = gui.SimulationWorker()
+    results = []
+    worker.finished.connect(results.append)
+    inputs = {
+        "property_value": 4000000,
+        "downpayment": 1000000,
+        "yearly_income": 480000,
+        "rate": 0.03,
+        "monthly_payment": 15000,
+        "mortgage_term": 25,
+    }
+    worker.latest = 2
+    worker.compute(1, inputs)
+    assert not results and worker.computed == 0
+    worker.compute(2, inputs)
+    assert [result.generation for result in results] == [2]
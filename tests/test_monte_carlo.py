@@ -0,0 +1,50 @@
+"""Tests for `mortgage_simulator.monte_carlo`."""
+import math
+
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from mortgage_simulator.monte_carlo import RatePathSimulation, load_rate_paths, vasicek_paths
+from mortgage_simulator.mortgage import Mortgage
+from mortgage_simulator.simulate_mortgage import loan_simulation
+
+
+@pytest.fixture
+def loan():
+    return Mortgage(property_value=3000000, downpayment=1000000, yearly_income=480000, rate=0.015)
+
+
+def test_constant_paths_match_fixed_rate(loan):
+    simulation = RatePathSimulation(loan, np.full((3, 400), loan.rate), 12000)
+    term_m = loan.term_m(12000)
+    schedule = loan.get_payment_schedule_months(12000, math.ceil(term_m) - 1)
+
+    np.testing.assert_array_equal(simulation.payoff_month, math.ceil(term_m))
+    last_interest = schedule["remaining loan"] * loan._r
+    np.testing.assert_allclose(simulation.total_interest, schedule["total interest paid"] + last_interest)
+    np.testing.assert_allclose(simulation.peak_monthly_interest, loan.monthly_interest)
+
+
+def test_vasicek_paths_are_seeded():
+    paths = vasicek_paths(1000, 24, 0.02, 0.03, seed=42)
+    assert paths.shape == (1000, 24)
+    np.testing.assert_array_equal(paths[:, 0], 0.02)
+    np.testing.assert_array_equal(paths, vasicek_paths(1000, 24, 0.02, 0.03, seed=42))
+    assert (paths >= 0).all()
+
+
+def test_rate_paths_in_percent_are_normalized(tmp_path):
+    fractions = np.array([[0.02, 0.025, 0.03], [0.01, 0.015, 0.02]])
+    np.savetxt(tmp_path / "fractions.csv", fractions, delimiter=",")
+    np.save(tmp_path / "percent.npy", fractions * 100)
+    np.testing.assert_allclose(load_rate_paths(str(tmp_path / "fractions.csv")), fractions)
+    np.testing.assert_allclose(load_rate_paths(str(tmp_path / "percent.npy")), fractions)
+
+
+@pytest.mark.parametrize("option", ["-m", "-n"])
+def test_empty_rate_paths_are_rejected(option):
+    result = CliRunner().invoke(loan_simulation, ["variable-rate", "-v", "4000000", option, "0"])
+    assert result.exit_code == 2 and "0 is not in the range x>=1" in result.output
+    with pytest.raises(ValueError):
+        vasicek_paths(10, 0, 0.02, 0.03)
@@ -0,0 +1,76 @@
+"""Tests for `mortgage_simulator.mortgage`."""
+import pickle
+
+import numpy as np
+import pytest
+
+from mortgage_simulator.mortgage import TERM_CACHE_SIZE, Mortgage
+
+
+@pytest.fixture
+def loan():
+    return Mortgage(property_value=3000000, downpayment=1000000, yearly_income=480000, rate=1.5)
+
+
+def test_mortgage_is_immutable(loan):
+    with pytest.raises(AttributeError):
+        loan.rate = 0.02
+    assert loan == Mortgage(3000000, 1000000, 480000, 0.015)
+    assert hash(loan) == hash(Mortgage(3000000, 1000000, 480000, 0.015))
+    assert pickle.loads(pickle.dumps(loan)) == loan
+
+
+def test_replace_keeps_independent_figures(loan):
+    assert loan.minimum_monthly_payment > 0
+    assert loan.term_m(12000) > 0
+
+    other = loan.replace(rate=2)
+    assert other.rate == 0.02
+    assert "_loan_to_value_ratio" in other._cache and "min_amort_rate" in other._cache
+    assert "monthly_interest" not in other._cache and "term_m" not in other._cache
+    assert other.minimum_monthly_payment == Mortgage(3000000, 1000000, 480000, 0.02).minimum_monthly_payment
+    assert loan.rate == 0.015
+
+    with pytest.raises(TypeError):
+        loan.replace(term=20)
+
+
+def test_term_memo_is_bounded(loan):
+    payments = [12000 + 100 * i for i in range(TERM_CACHE_SIZE + 4)]
+    terms = [loan.term_m(payment) for payment in payments]
+    assert list(loan._cache["term_m"]) == payments[-TERM_CACHE_SIZE:]
+    assert loan.term_m(payments[0]) == terms[0]
+
+
+def test_sensitivities_match_finite_differences(loan):
+    payment, term_y, h = 12000, 20, 1e-6
+    sensitivities = loan.sensitivities(payment, term_y)
+    up, down = loan.replace(rate=loan.rate + h), loan.replace(rate=loan.rate - h)
+
+    def central(f):
+        return (f(up) - f(down)) / (2 * h)
+
+    assert sensitivities["monthly_payment_per_rate"] == pytest.approx(central(lambda m: m.monthly_payment(term_y)))
+    assert sensitivities["term_y_per_rate"] == pytest.approx(central(lambda m: m.term_y(payment)))
+    assert sensitivities["total_interest_per_rate"] == pytest.approx(central(lambda m: m.total_interest(payment)))
+    assert sensitivities["term_y_per_payment"] == pytest.approx(
+        (loan.term_y(payment + 1) - loan.term_y(payment - 1)) / 2
+    )
+    more = loan.replace(downpayment=loan.downpayment - 1)
+    assert sensitivities["total_interest_per_loan"] == pytest.approx(
+        more.total_interest(payment) - loan.total_interest(payment), rel=1e-4
+    )
+    # the term defaults to the term at the payment
+    assert loan.sensitivities(payment)["monthly_payment_per_loan"] == pytest.approx(payment / loan._loan)
+
+
+def test_balance_sensitivities_match_finite_differences(loan):
+    months = np.arange(0, 121, 30)
+    derivatives = loan.balance_sensitivities(12000, months)
+    h = 1e-6
+    up = loan.replace(rate=loan.rate + h).get_payment_schedule_months(12000, months)["remaining loan"]
+    down = loan.replace(rate=loan.rate - h).get_payment_schedule_months(12000, months)["remaining loan"]
+    np.testing.assert_allclose(derivatives["rate"], (up - down) / (2 * h), rtol=1e-5, atol=1e-3)
+    more = loan.get_payment_schedule_months(12001, months)["remaining loan"]
+    less = loan.get_payment_schedule_months(11999, months)["remaining loan"]
+    np.testing.assert_allclose(derivatives["payment"], (more - less) / 2, rtol=1e-6, atol=1e-9)
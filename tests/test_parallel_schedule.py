@@ -0,0 +1,66 @@
+"""Tests for `mortgage_simulator.parallel_schedule`."""
+import numpy as np
+import pytest
+
+from mortgage_simulator.parallel_schedule import parallel_schedule
+from mortgage_simulator.portfolio import MortgagePortfolio
+from mortgage_simulator.schedule import SCHEDULE_COLUMNS
+
+
+@pytest.fixture
+def portfolio():
+    rng = np.random.default_rng(0)
+    return MortgagePortfolio(rng.uniform(2e6, 5e6, 30), 1e6, 600000, rng.uniform(0.01, 0.05, 30))
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_schedules_match_mortgage(portfolio, workers):
+    payments = portfolio.minimum_monthly_payment * np.linspace(1.2, 3, len(portfolio))
+    with parallel_schedule(portfolio, payments, 400, workers=workers, block_size=7) as schedules:
+        assert len(schedules) == len(portfolio)
+        assert schedules["remaining loan"].shape == (len(portfolio), 401)
+        np.testing.assert_array_equal(schedules["month"][5], np.arange(401))
+        for i in range(len(portfolio)):
+            expected = portfolio[i].get_payment_schedule(payments[i], 400)
+            result = schedules.loan_schedule(i)
+            assert result.columns == SCHEDULE_COLUMNS and len(result) == len(expected)
+            for column in SCHEDULE_COLUMNS:
+                np.testing.assert_allclose(result[column], expected[column], rtol=1e-12)
+                assert result[column].dtype == expected[column].dtype
+        del result
+
+
+def test_horizon_until_last_repayment(portfolio):
+    payments = portfolio.monthly_interest * 0.5
+    with pytest.raises(ValueError, match="horizon"):
+        parallel_schedule(portfolio, payments, -1)
+    payments[0] = portfolio.minimum_monthly_payment[0] * 2
+    with parallel_schedule(portfolio, payments, -1) as schedules:
+        assert schedules.lengths[0] == np.ceil(portfolio.term_m(payments)[0])
+        # loans never repaid run until the horizon
+        assert (schedules.lengths[1:] == schedules.lengths[0]).all()
+
+
+def test_closed_schedule(portfolio):
+    schedules = parallel_schedule(portfolio, portfolio.minimum_monthly_payment, 12, workers=2)
+    schedules.close()
+    with pytest.raises(ValueError, match="closed"):
+        schedules.loan_schedule(0)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_state_is_held_after_repayment(workers):
+    portfolio = MortgagePortfolio(np.array([4e6, 4e6]), 1e6, 480000, 0.015)
+    payments = np.array([20000.0, 2000.0])
+    with parallel_schedule(portfolio, payments, 360, workers=workers) as schedules:
+        length = schedules.lengths[0]
+        repaid = schedules.loan_schedule(0)
+        assert length < 360 and len(repaid) == length + 1
+        for column in ("debt ratio", "month interest", "month amortization", "remaining loan"):
+            assert (schedules[column][0, length + 1 :] == 0).all()
+        for column in ("total paid", "total interest paid", "total amortized", "total tax return"):
+            assert (schedules[column][0, length + 1 :] == repaid[column][-1]).all()
+        # the loan never repaid runs on until the horizon
+        assert schedules.lengths[1] == 360
+        assert schedules["remaining loan"][1, -1] > schedules["remaining loan"][1, -2] > 3e6
+        del repaid
@@ -0,0 +1,59 @@
+"""Tests for `mortgage_simulator.portfolio`."""
+import numpy as np
+import pytest
+
+from mortgage_simulator.mortgage import Mortgage
+from mortgage_simulator.portfolio import MortgagePortfolio
+
+PROPERTY_VALUES = [3000000, 4000000, 2500000, 5000000, 1000000]
+DOWNPAYMENTS = [1000000, 600000, 1000000, 1500000, 200000]
+YEARLY_INCOMES = [480000, 600000, 300000, 900000, 200000]
+RATES = [0.015, 1.8, 0.02, 0.0115, 3.0]
+
+
+@pytest.fixture
+def portfolio():
+    return MortgagePortfolio(PROPERTY_VALUES, DOWNPAYMENTS, YEARLY_INCOMES, RATES)
+
+
+@pytest.fixture
+def mortgages():
+    return [Mortgage(*args) for args in zip(PROPERTY_VALUES, DOWNPAYMENTS, YEARLY_INCOMES, RATES)]
+
+
+def test_portfolio_matches_scalar_properties(portfolio, mortgages):
+    for name in ("min_amort_rate", "minimum_monthly_payment", "maximum_term_y", "apy", "tax_deduction"):
+        expected = [getattr(m, name) for m in mortgages]
+        np.testing.assert_allclose(getattr(portfolio, name), expected, rtol=1e-12, err_msg=name)
+
+
+def test_portfolio_matches_scalar_methods(portfolio, mortgages):
+    payments = np.array([15000, 20000, 8000, 30000, 5000])
+    np.testing.assert_allclose(portfolio.term_m(payments), [m.term_m(p) for m, p in zip(mortgages, payments)])
+    np.testing.assert_allclose(
+        portfolio.total_interest(payments), [m.total_interest(p) for m, p in zip(mortgages, payments)]
+    )
+    np.testing.assert_allclose(portfolio.monthly_payment(25), [m.monthly_payment(25) for m in mortgages])
+
+
+def test_portfolio_term_is_nan_below_interest(portfolio):
+    assert np.isnan(portfolio.term_m(1.0)).all()
+
+
+def test_portfolio_rejects_negative_loan():
+    with pytest.raises(ValueError):
+        MortgagePortfolio([1000000, 1000000], [500000, 1500000], 400000)
+
+
+def test_portfolio_roundtrip(portfolio, mortgages):
+    assert len(portfolio) == len(mortgages)
+    assert portfolio[1].minimum_monthly_payment == pytest.approx(mortgages[1].minimum_monthly_payment)
+
+
+def test_portfolio_sensitivities_match_scalar(portfolio, mortgages):
+    payments = np.array([15000, 20000, 8000, 30000, 5000])
+    sensitivities = portfolio.sensitivities(payments, 25)
+    for i, (loan, payment) in enumerate(zip(mortgages, payments)):
+        expected = loan.sensitivities(payment, 25)
+        for field, value in expected.items():
+            assert sensitivities[field][i] == pytest.approx(value, rel=1e-12), field
@@ -0,0 +1,68 @@
+"""Tests for `mortgage_simulator.profiling`."""
+import json
+import os
+import pstats
+import subprocess
+import sys
+
+import pytest
+
+from mortgage_simulator import profiling
+
+ENTRY_POINT = "mortgage_simulator.simulate_mortgage"
+
+
+@pytest.fixture(autouse=True)
+def disabled():
+    yield
+    profiling.disable()
+
+
+def test_disabled_stages_are_shared_no_ops():
+    assert profiling.stage("compute") is profiling.stage("format")
+    items = [1, 2]
+    assert profiling.stage_iter("compute", items) is items
+
+
+def test_nested_stages_count_their_own_time():
+    profiler = profiling.enable("test")
+    with profiling.stage("write"):
+        with profiling.stage("format"):
+            sum(range(100000))
+    assert list(profiling.stage_iter("compute", iter([1, 2, 3]))) == [1, 2, 3]
+    summary = profiler.summary()
+    stages = summary["stages"]
+    assert stages["compute"]["calls"] == 4
+    assert stages["write"]["seconds"] < stages["format"]["seconds"]
+    assert sum(stage["seconds"] for stage in stages.values()) + summary["other"] == pytest.approx(summary["seconds"])
+
+
+def _run(args, **env):
+    return subprocess.run(
+        [sys.executable, "-m", ENTRY_POINT] + args,
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        env={**os.environ, **env},
+    )
+
+
+def test_profile_option_writes_summary_to_stderr(tmp_path):
+    args = ["simulate", "-v", "4000000", "--no-color"]
+    plain = _run(args)
+    output = tmp_path / "simulate.pstats"
+    result = _run(["--profile-output", str(output)] + args)
+    assert result.stdout == plain.stdout
+    summary = json.loads(result.stderr.splitlines()[-1])
+    assert summary["command"] == "simulate"
+    assert {"parse", "compute", "format", "render", "write"} <= set(summary["stages"])
+    assert pstats.Stats(str(output)).total_calls > 0
+
+
+def test_profile_environment_variable():
+    args = ["schedule", "-v", "4000000", "-p", "15000", "-m", "24"]
+    result = _run(args, **{profiling.PROFILE_ENV: "1"})
+    assert json.loads(result.stderr.splitlines()[-1])["command"] == "schedule"
+    result = _run(args, **{profiling.PROFILE_ENV: "0"})
+    assert result.stderr == ""
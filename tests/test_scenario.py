@@ -0,0 +1,68 @@
+"""Tests for `mortgage_simulator.scenario`."""
+import pytest
+
+from mortgage_simulator.mortgage import Mortgage
+from mortgage_simulator.scenario import Scenario
+from mortgage_simulator.simulation_report import SimulationReport
+
+INPUTS = {
+    "property_value": 4000000,
+    "downpayment": 800000,
+    "yearly_income": 600000,
+    "rate": 0.03,
+    "monthly_payment": 20000,
+    "mortgage_term": 25,
+}
+
+
+def full_report(property_value, downpayment, yearly_income, rate, monthly_payment, mortgage_term):
+    loan = Mortgage(property_value, downpayment, yearly_income, rate)
+    report = SimulationReport()
+    report.add_simulation(loan.simulate_by_payment(monthly_payment, title="monthly payment"))
+    report.add_simulation(loan.simulate_by_payment(loan.minimum_monthly_payment, title="minimum payment"))
+    report.add_simulation(loan.simulate_by_term(mortgage_term, title=f"term {mortgage_term:.1f} Y"))
+    return report.get_report()
+
+
+@pytest.fixture
+def scenario():
+    return Scenario(**INPUTS)
+
+
+def test_scenario_report_matches_simulate_report(scenario):
+    assert scenario.get_report() == full_report(**INPUTS)
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [{"rate": 3.5}, {"monthly_payment": 25000}, {"mortgage_term": 20}, {"downpayment": 1200000, "rate": 0.02}],
+)
+def test_update_matches_full_recomputation(scenario, changes):
+    scenario.update(**changes)
+    assert scenario.get_report() == full_report(**{**INPUTS, **changes})
+
+
+def test_rate_update_skips_independent_figures(scenario):
+    updated = scenario.update(rate=0.035)
+    fields = {field for _, field in updated}
+    assert "rate" in fields and "monthly_interest" in fields
+    assert not fields & {"property_value", "downpayment", "loan", "loan_to_value_ratio", "loan_to_income_ratio"}
+    # the mortgage keeps the figures that do not depend on the rate
+    assert "loan_to_income_ratio" in scenario.loan._cache
+
+
+def test_payment_update_only_touches_payment_simulation(scenario):
+    updated = scenario.update(monthly_payment=22000)
+    assert updated and {i for i, _ in updated} == {0}
+    assert scenario.update(monthly_payment=22000) == []
+    updated = scenario.update(mortgage_term=20)
+    assert (2, "title") in updated and {i for i, _ in updated} == {2}
+
+
+def test_variant_leaves_scenario_unchanged(scenario):
+    report = scenario.get_report()
+    variant = scenario.variant(rate=0.04)
+    assert scenario.get_report() == report
+    assert variant.get_report() == full_report(**{**INPUTS, "rate": 0.04})
+    with pytest.raises(TypeError):
+        scenario.update(term=20)
@@ -0,0 +1,228 @@
+"""Tests for `mortgage_simulator.schedule`."""
+import math
+
+import numpy as np
+import pytest
+
+from mortgage_simulator import rules
+from mortgage_simulator.mortgage import TAX_DEDUCTION_RATE, Mortgage
+from mortgage_simulator.schedule import RESOLUTIONS, SCHEDULE_COLUMNS, ScheduleEvent, load_events
+
+
+def iterative_schedule(loan: Mortgage, monthly_payment: float, period_months: int):
+    """month by month reference implementation"""
+    schedule = {
+        "year": [0],
+        "month": [0],
+        "debt ratio": [loan._loan / loan.property_value],
+        "month interest": [0],
+        "month amortization": [0],
+        "remaining loan": [loan._loan],
+        "total paid": [loan.downpayment],
+        "total interest paid": [0],
+        "total amortized": [loan.downpayment],
+        "total tax return": [0],
+    }
+    loan_term = math.ceil(loan.term_m(monthly_payment))
+    if period_months < 0 or period_months > loan_term:
+        period_months = loan_term
+    for m in range(1, period_months + 1):
+        month_interest = schedule["remaining loan"][-1] * loan._r
+        month_amortization = monthly_payment - month_interest
+        schedule["year"].append((m - 1) // 12 + 1)
+        schedule["month"].append(m)
+        schedule["month interest"].append(month_interest)
+        schedule["month amortization"].append(month_amortization)
+        schedule["total paid"].append(schedule["total paid"][-1] + monthly_payment)
+        schedule["total interest paid"].append(schedule["total interest paid"][-1] + month_interest)
+        schedule["total amortized"].append(schedule["total amortized"][-1] + month_amortization)
+        schedule["total tax return"].append(schedule["total tax return"][-1] + month_interest * TAX_DEDUCTION_RATE)
+        schedule["remaining loan"].append(schedule["remaining loan"][-1] - month_amortization)
+        schedule["debt ratio"].append(schedule["remaining loan"][-1] / loan.property_value)
+    return schedule
+
+
+@pytest.fixture
+def loan():
+    return Mortgage(property_value=3000000, downpayment=1000000, yearly_income=480000, rate=0.015)
+
+
+@pytest.mark.parametrize("period_months", [-1, 0, 12, 180])
+def test_schedule_matches_iterative(loan, period_months):
+    expected = iterative_schedule(loan, 12000, period_months)
+    schedule = loan.get_payment_schedule(12000, period_months)
+    assert schedule.columns == SCHEDULE_COLUMNS
+    for column in SCHEDULE_COLUMNS:
+        np.testing.assert_allclose(schedule[column], expected[column], rtol=1e-9, atol=1e-4, err_msg=column)
+
+
+def test_schedule_random_access(loan):
+    full = loan.get_payment_schedule(12000, -1)
+    months = np.array([180, 1, 17])
+    partial = loan.get_payment_schedule_months(12000, months)
+    for column in SCHEDULE_COLUMNS:
+        np.testing.assert_allclose(partial[column], full[column][months], err_msg=column)
+
+
+def test_schedule_rows_and_slices(loan):
+    schedule = loan.get_payment_schedule(12000, 24)
+    assert len(schedule) == 25
+    row = schedule[13]
+    assert row.month == 13 and row.year == 2
+    assert row.remaining_loan == schedule["remaining loan"][13]
+    assert schedule[-1].month == 24
+
+    window = schedule[12:24]
+    assert len(window) == 12 and window[0].month == 12
+    assert np.shares_memory(window["remaining loan"], schedule["remaining loan"])
+    assert schedule.to_dict()["month"] == list(range(25))
+
+
+@pytest.mark.parametrize("resolution", ["quarter", "year"])
+def test_period_rollup_matches_monthly_sums(resolution):
+    loan = Mortgage(property_value=3000000, downpayment=1000000, yearly_income=480000, rate=0.015)
+    monthly = loan.get_payment_schedule(12000, 100)
+    periods = loan.get_payment_schedule(12000, 100, resolution=resolution)
+    step = RESOLUTIONS[resolution]
+
+    assert periods["month"].tolist() == list(range(0, 100, step)) + [100]
+    bounds = periods["month"]
+    for column, period_column in [("month interest", "period interest"), ("month amortization", "period amortization")]:
+        sums = [monthly[column][start + 1 : end + 1].sum() for start, end in zip(bounds[:-1], bounds[1:])]
+        np.testing.assert_allclose(periods[period_column][1:], sums, rtol=1e-9)
+    for column in ("remaining loan", "total interest paid", "total tax return", "year"):
+        np.testing.assert_allclose(periods[column], monthly[column][bounds], rtol=1e-12)
+
+
+def test_unknown_resolution():
+    loan = Mortgage(property_value=3000000, downpayment=1000000, yearly_income=480000, rate=0.015)
+    with pytest.raises(ValueError, match="resolution"):
+        loan.get_payment_schedule(12000, -1, resolution="week")
+
+
+def _stepped_reference(loan, yearly_income, monthly_payment, months):
+    r = loan.rate / 12
+    balance = loan.property_value - loan.downpayment
+
+    def payment_for(balance):
+        amort_rate = rules.min_amort_rate(balance / loan.property_value, balance / yearly_income)
+        return amort_rate, max(monthly_payment, balance * (r + amort_rate / 12))
+
+    amort_rate, payment = payment_for(balance)
+    balances, payments = [balance], [0.0]
+    for _ in range(months):
+        balance -= payment - balance * r
+        balances.append(balance)
+        payments.append(payment)
+        new_rate, new_payment = payment_for(balance)
+        if new_rate < amort_rate:
+            amort_rate, payment = new_rate, new_payment
+    return np.array(balances), np.array(payments)
+
+
+@pytest.mark.parametrize("monthly_payment", [0, 14000])
+def test_stepped_schedule_matches_monthly_reevaluation(monthly_payment):
+    loan = Mortgage(property_value=4000000, downpayment=800000, yearly_income=600000, rate=0.03)
+    stepped = loan.get_stepped_payment_schedule(monthly_payment, 480)
+    # the schedule stops once the loan is repaid
+    balances, payments = _stepped_reference(loan, 600000, monthly_payment, len(stepped) - 1)
+
+    assert len(set(stepped["amortization requirement"].tolist())) == 4
+    np.testing.assert_allclose(stepped["monthly payment"], payments, rtol=1e-9)
+    np.testing.assert_allclose(stepped["remaining loan"], balances, rtol=1e-9, atol=1e-4)
+    total_interest = stepped["month interest"].cumsum()
+    np.testing.assert_allclose(stepped["total interest paid"], total_interest, rtol=1e-9, atol=1e-4)
+
+
+def test_stepped_schedule_interest_only_needs_a_period():
+    loan = Mortgage(property_value=4000000, downpayment=800000, yearly_income=600000, rate=0.03)
+    with pytest.raises(ValueError, match="months"):
+        loan.get_stepped_payment_schedule(0, -1)
+    repaid = loan.get_stepped_payment_schedule(20000, -1, resolution="year")
+    assert repaid["remaining loan"][-1] <= 0 < repaid["remaining loan"][-2]
+
+
+def _event_reference(loan, monthly_payment, events, months):
+    r = loan.rate / 12
+    balance = loan.property_value - loan.downpayment
+    payment, paid = monthly_payment, 0.0
+    balances, totals = [], []
+    for month in range(months + 1):
+        if month:
+            balance -= payment - balance * r
+            paid += payment
+        for event_month, event, value in events:
+            if event_month != month:
+                continue
+            if event == "prepayment":
+                balance -= value
+                paid += value
+            elif event == "rate":
+                r = value / 12
+            else:
+                payment = value
+        balances.append(balance)
+        totals.append(paid)
+    return np.array(balances), np.array(totals)
+
+
+def test_event_schedule_matches_monthly_iteration():
+    loan = Mortgage(property_value=4000000, downpayment=800000, yearly_income=600000, rate=0.03)
+    events = [
+        ScheduleEvent(36, "payment", 20000),
+        ScheduleEvent(0, "prepayment", 50000),
+        ScheduleEvent(12, "prepayment", 100000),
+        ScheduleEvent(24, "rate", 0.04),
+        ScheduleEvent(24, "prepayment", 20000),
+    ]
+    schedule = loan.get_event_payment_schedule(15000, events, -1)
+    balances, totals = _event_reference(loan, 15000, events, len(schedule) - 1)
+
+    assert schedule.columns == SCHEDULE_COLUMNS
+    assert balances[-1] <= 0 < balances[-2]
+    np.testing.assert_allclose(schedule["remaining loan"], balances, rtol=1e-9, atol=1e-4)
+    np.testing.assert_allclose(schedule["total paid"], loan.downpayment + totals, rtol=1e-12)
+    amortized = np.diff(schedule["total amortized"], prepend=loan.downpayment)
+    np.testing.assert_allclose(schedule["month amortization"], amortized, rtol=1e-9, atol=1e-4)
+
+    yearly = loan.get_event_payment_schedule(15000, events, -1, resolution="year")
+    np.testing.assert_allclose(yearly["remaining loan"], schedule["remaining loan"][yearly["month"]], rtol=1e-12)
+
+
+def test_event_schedule_without_events_matches_fixed_schedule():
+    loan = Mortgage(property_value=4000000, downpayment=800000, yearly_income=600000, rate=0.03)
+    fixed = loan.get_payment_schedule(15000, -1)
+    schedule = loan.get_event_payment_schedule(15000, [], -1)
+    for column in SCHEDULE_COLUMNS:
+        np.testing.assert_allclose(schedule[column], fixed[column], rtol=1e-9, atol=1e-6)
+
+
+def test_event_schedule_repaid_by_prepayment():
+    loan = Mortgage(property_value=4000000, downpayment=800000, yearly_income=600000, rate=0.03)
+    schedule = loan.get_event_payment_schedule(15000, [ScheduleEvent(6, "prepayment", 10**7)], -1)
+    assert len(schedule) == 7
+    assert schedule["remaining loan"][-1] == 0
+    with pytest.raises(ValueError, match="Unknown event"):
+        loan.get_event_payment_schedule(15000, [ScheduleEvent(6, "holiday", 0)], -1)
+    with pytest.raises(ValueError, match="months to schedule"):
+        loan.get_event_payment_schedule(15000, [ScheduleEvent(6, "payment", 1000)], -1)
+
+
+def test_load_events(tmp_path):
+    csv_path = tmp_path / "events.csv"
+    csv_path.write_text("month,event,value\n12,prepayment,100000\n24,rate,4\n")
+    jsonl_path = tmp_path / "events.jsonl"
+    jsonl_path.write_text(
+        '{"month": 12, "event": "prepayment", "value": 100000}\n{"month": 24, "event": "rate", "value": 4}\n'
+    )
+    expected = [ScheduleEvent(12, "prepayment", 100000.0), ScheduleEvent(24, "rate", 4.0)]
+    assert load_events(str(csv_path)) == expected
+    assert load_events(str(jsonl_path)) == expected
+    json_path = tmp_path / "events.json"
+    json_path.write_text(
+        '[{"month": 12, "event": "prepayment", "value": 100000}, {"month": 24, "event": "rate", "value": 4}]'
+    )
+    assert load_events(str(json_path)) == expected
+    json_path.write_text('{"month": 12, "event": "prepayment", "value": 100000}')
+    with pytest.raises(ValueError, match="JSON list"):
+        load_events(str(json_path))
@@ -0,0 +1,43 @@
+"""Tests for `mortgage_simulator.schedule_report`."""
+import io
+
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from mortgage_simulator.mortgage import Mortgage
+from mortgage_simulator.schedule_report import ScheduleReport, ScheduleStream, _format_column
+from mortgage_simulator.simulate_mortgage import loan_simulation
+
+
+def test_stream_matches_table_report():
+    loan = Mortgage(property_value=3000000, downpayment=1000000, yearly_income=480000, rate=0.015)
+    period_months = loan.schedule_length(12000, -1)
+    bounds = loan.get_payment_schedule_months(12000, [0, 1, period_months])
+    output = io.StringIO()
+    ScheduleStream(bounds).write(loan.iter_payment_schedule(12000, period_months, chunk_months=50), output)
+
+    expected = ScheduleReport(loan.get_payment_schedule(12000, -1)).get_report()
+    assert output.getvalue() == expected + "\n"
+
+
+def test_report_cells_match_column_formats():
+    loan = Mortgage(property_value=3000000, downpayment=1000000, yearly_income=480000, rate=0.015)
+    schedule = loan.get_payment_schedule(12000, -1)
+    lines = ScheduleReport(schedule).get_report().splitlines()
+    assert len(lines) == len(schedule) + 4
+    for row, line in zip(schedule, lines[3:-1]):
+        cells = [cell.strip() for cell in line.strip("║").split("║")]
+        assert cells == [_format_column(column, np.array([row[column]]))[0].strip() for column in schedule.columns]
+
+
+def test_stream_command_errors():
+    result = CliRunner().invoke(loan_simulation, ["schedule", "-v", "4000000", "-p", "3000", "-s"])
+    assert result.exit_code == 1
+    assert result.output == "Error: Monthly payment 3000 needs to be above monthly interest 3750.0\n"
+
+
+@pytest.mark.parametrize("option", [["--resolution", "year"], ["--stepped"], ["-o", "schedule.npy"]])
+def test_stream_rejects_other_schedules(option):
+    result = CliRunner().invoke(loan_simulation, ["schedule", "-v", "4000000", "-s"] + option)
+    assert result.exit_code == 2 and "--stream cannot be combined" in result.output
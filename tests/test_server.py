@@ -0,0 +1,96 @@
+"""Tests for `mortgage_simulator.server`."""
+import asyncio
+import json
+
+import pytest
+
+from mortgage_simulator.mortgage import Mortgage
+from mortgage_simulator.server import MortgageServer
+
+DEFAULTS = {
+    "property_value": None,
+    "down_payment": 1000000,
+    "interest_rate": 0.015,
+    "mortgage_term": 25,
+    "monthly_income": 40000,
+    "monthly_payment": 10000,
+    "period_months": -1,
+    "principal": None,
+    "amortization_rate": None,
+}
+
+
+async def _exchange(requests):
+    server = MortgageServer(DEFAULTS, cache_size=8)
+    listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    responses = []
+    for method, target, body in requests:
+        body = json.dumps(body).encode() if body is not None else b""
+        writer.write(f"{method} {target} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode().partition(":")
+            headers[name.lower()] = value.strip()
+        responses.append((status, json.loads(await reader.readexactly(int(headers["content-length"])))))
+    writer.close()
+    listener.close()
+    await listener.wait_closed()
+    return server, responses
+
+
+def test_endpoints_over_keep_alive_connection():
+    server, responses = asyncio.run(
+        _exchange(
+            [
+                ("GET", "/simulate?property-value=4000000&monthly_payment=15000&interest_rate=2", None),
+                ("POST", "/simulate", {"property_value": 4000000, "monthly_payment": 15000, "interest_rate": 0.02}),
+                ("GET", "/minimum-payment?principal=3000000&amortization_rate=0.02", None),
+                ("POST", "/schedule", {"property_value": 4000000, "monthly_payment": 15000}),
+            ]
+        )
+    )
+    (status, simulate), (_, cached), (_, minimum), (_, schedule) = responses
+    loan = Mortgage(4000000, 1000000, 40000 * 12, 0.02)
+    assert status == 200 and simulate == cached
+    assert server.cache.hits == 1
+    assert not simulate["exceeds_loan_to_value_limit"]
+    assert simulate["simulations"]["monthly payment"]["term_y"] == pytest.approx(loan.term_y(15000))
+    assert minimum["minimum_monthly_payment"] == pytest.approx(3000000 * (0.02 + 0.015) / 12)
+    expected = Mortgage(4000000, 1000000, 40000 * 12, 0.015).get_payment_schedule(15000, -1)
+    assert schedule["remaining loan"] == pytest.approx(expected["remaining loan"].tolist())
+
+
+def test_errors():
+    _, responses = asyncio.run(
+        _exchange(
+            [
+                ("GET", "/unknown", None),
+                ("GET", "/simulate", None),
+                ("GET", "/simulate?property_value=4000000&monthly_payment=100", None),
+                ("GET", "/simulate?property_value=4000000&colour=blue", None),
+                ("PUT", "/simulate", {}),
+            ]
+        )
+    )
+    assert [status for status, _ in responses] == [404, 400, 400, 400, 405]
+    assert all("error" in body for _, body in responses)
+
+
+def test_post_with_query_parameters():
+    _, responses = asyncio.run(
+        _exchange(
+            [
+                ("POST", "/minimum-payment?principal=3000000&amortization_rate=0.02", None),
+                ("POST", "/minimum-payment?principal=3000000", {"amortization_rate": 0.02}),
+            ]
+        )
+    )
+    (status, minimum), (_, merged) = responses
+    assert status == 200 and minimum == merged
+    assert minimum["minimum_monthly_payment"] == pytest.approx(3000000 * (0.02 + 0.015) / 12)
@@ -0,0 +1,49 @@
+"""Tests for `mortgage_simulator.solvers`."""
+import logging
+
+import numpy as np
+import pytest
+
+from mortgage_simulator.mortgage import Mortgage
+from mortgage_simulator.solvers import max_property_value, min_downpayment, min_downpayment_for_amort_rate
+
+PAYMENTS = [3000, 5000, 8000, 12000, 20000]
+
+
+@pytest.fixture(autouse=True)
+def quiet_loan_to_value_warnings():
+    logging.disable(logging.WARNING)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+@pytest.mark.parametrize("payment", PAYMENTS)
+def test_max_property_value_is_tight(payment):
+    value = max_property_value(payment, 1000000, 480000, 0.03)
+    assert Mortgage(value, 1000000, 480000, 0.03).minimum_monthly_payment <= payment
+    assert Mortgage(value + 1, 1000000, 480000, 0.03).minimum_monthly_payment > payment
+
+
+@pytest.mark.parametrize("payment", PAYMENTS[:-1])
+def test_min_downpayment_is_tight(payment):
+    downpayment = min_downpayment(payment, 4000000, 480000, 0.03)
+    assert Mortgage(4000000, downpayment, 480000, 0.03).minimum_monthly_payment <= payment
+    assert Mortgage(4000000, downpayment - 1, 480000, 0.03).minimum_monthly_payment > payment
+
+
+def test_solvers_vectorized():
+    values = max_property_value(np.array(PAYMENTS), 1000000, 480000, 0.03)
+    np.testing.assert_array_equal(values, [max_property_value(p, 1000000, 480000, 0.03) for p in PAYMENTS])
+
+
+def test_min_downpayment_for_amort_rate():
+    downpayments = min_downpayment_for_amort_rate(4000000, 480000, np.array([0.0, 0.01, 0.02, 0.03]))
+    for target, downpayment in zip([0.0, 0.01, 0.02, 0.03], downpayments):
+        assert Mortgage(4000000, downpayment, 480000, 0.03).min_amort_rate <= target
+        if downpayment > 0:
+            assert Mortgage(4000000, downpayment - 1, 480000, 0.03).min_amort_rate > target
+
+
+def test_max_term_limits_property_value():
+    value = max_property_value(8000, 1000000, 480000, 0.03, max_term_y=20)
+    assert Mortgage(value, 1000000, 480000, 0.03).term_y(8000) == pytest.approx(20)
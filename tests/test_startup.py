@@ -0,0 +1,35 @@
+"""Tests for the command line startup cost."""
+import re
+import subprocess
+import sys
+
+ENTRY_POINT = "mortgage_simulator.simulate_mortgage"
+# cumulative import time of the entry point, click included
+IMPORT_TIME_BUDGET_US = 150000
+DEFERRED_MODULES = ("numpy", "colorclass", "PyQt5")
+
+
+def _import_times() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {ENTRY_POINT}"],
+        check=True,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)", line)
+        if match:
+            times[match.group(3)] = int(match.group(1))
+    return times
+
+
+def test_entry_point_import_time_budget():
+    # best of a few runs, to be robust to a busy machine
+    best = min(_import_times()[ENTRY_POINT] for _ in range(3))
+    assert best < IMPORT_TIME_BUDGET_US, f"importing {ENTRY_POINT} took {best / 1000:.1f} ms"
+
+
+def test_entry_point_defers_heavy_dependencies():
+    loaded = set(_import_times())
+    assert not loaded & set(DEFERRED_MODULES)
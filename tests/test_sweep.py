@@ -0,0 +1,42 @@
+"""Tests for `mortgage_simulator.sweep`."""
+import io
+
+import numpy as np
+import pytest
+
+from mortgage_simulator.mortgage import Mortgage
+from mortgage_simulator.sweep import SWEEP_COLUMNS, run_sweep, simulate_grid, sweep_grid, write_sweep
+from mortgage_simulator.utils import parse_values
+
+
+def test_parse_values():
+    assert parse_values("1,2,5:10:2.5") == [1, 2, 5, 7.5, 10]
+    with pytest.raises(ValueError):
+        parse_values("10:5:1")
+
+
+def test_sweep_matches_mortgage():
+    grid = sweep_grid([3000000, 4000000], [1000000], [0.015, 0.02], [40000])
+    result = simulate_grid(grid, [15000], [25])
+    assert result.shape == (2 * len(grid), len(SWEEP_COLUMNS))
+    for row in result:
+        values = dict(zip(SWEEP_COLUMNS, row))
+        loan = Mortgage(
+            values["property_value"], values["down_payment"], values["monthly_income"] * 12, values["interest_rate"]
+        )
+        if values["simulation"] == 0:
+            assert values["term_y"] == pytest.approx(loan.term_y(15000))
+        else:
+            assert values["monthly_payment"] == pytest.approx(loan.monthly_payment(25))
+        assert values["total_interest"] == pytest.approx(loan.total_interest(values["monthly_payment"]))
+
+
+def test_sweep_process_pool_matches_in_process():
+    grid = sweep_grid([3000000, 4000000, 5000000], [1000000, 1500000], [0.01, 0.02], [40000, 60000])
+    serial = np.vstack(list(run_sweep(grid, [15000, 20000], [20], workers=1)))
+    parallel = np.vstack(list(run_sweep(grid, [15000, 20000], [20], workers=2, chunk_size=5)))
+    np.testing.assert_allclose(parallel, serial)
+
+    output = io.StringIO()
+    write_sweep(iter([serial]), output)
+    assert len(output.getvalue().splitlines()) == len(serial) + 1
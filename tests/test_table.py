@@ -0,0 +1,29 @@
+"""Tests for `mortgage_simulator.table`."""
+import io
+
+from mortgage_simulator.table import render_table
+from mortgage_simulator.utils import add_color
+
+EXPECTED = """\
+╔ title ═════╦═════╗
+║ name       ║   a ║
+╠════════════╬═════╣
+║ Term       ║ 1.0 ║
+║ long field ║  22 ║
+╚════════════╩═════╝"""
+
+
+def test_render_table():
+    rows = [["name", "a"], ["Term", "1.0"], ["long field", "22"]]
+    assert render_table(rows, right=[1], title=" title ") == EXPECTED
+
+    output = io.StringIO()
+    render_table(rows, right=[1], title=" title ", stream=output)
+    assert output.getvalue() == EXPECTED + "\n"
+
+
+def test_colored_cells_are_padded_on_printed_width():
+    rows = [["name", "a"], [add_color("Term"), add_color("Term", "1.0")], ["long field", "22"]]
+    colored = render_table(rows, right=[1], title=" title ")
+    assert "\033[" in colored
+    assert render_table(rows, right=[1], title=" title ", color=False) == EXPECTED
@@ -0,0 +1,91 @@
+"""Tests for `mortgage_simulator.tranches`."""
+import numpy as np
+import pytest
+
+from mortgage_simulator import rules
+from mortgage_simulator.mortgage import SIMULATION_FIELDS, Mortgage
+from mortgage_simulator.schedule import SCHEDULE_COLUMNS
+from mortgage_simulator.tranches import TOTAL_TITLE, MultiTrancheMortgage
+
+TRANCHES = [(1000000, 2.9), (1000000, 3.2), (-1, 3.5)]
+
+
+@pytest.fixture
+def household():
+    return MultiTrancheMortgage.from_tranches(4000000, 800000, 600000, TRANCHES)
+
+
+def test_single_tranche_matches_mortgage():
+    household = MultiTrancheMortgage.from_tranches(4000000, 800000, 600000, [(-1, 0.03)])
+    loan = Mortgage(4000000, 800000, 600000, 0.03)
+    values = household.simulation_values(16000)
+    expected = loan.simulation_values(16000)
+    for name in SIMULATION_FIELDS:
+        np.testing.assert_allclose(values[name], expected[name], rtol=1e-12, err_msg=name)
+
+    schedule = household.get_payment_schedule(16000, -1)
+    expected_schedule = loan.get_payment_schedule(16000, -1)
+    for column in SCHEDULE_COLUMNS:
+        np.testing.assert_allclose(schedule[column][:-1], expected_schedule[column][:-1], rtol=1e-9, atol=1e-6)
+    # the last installment only covers what remains
+    assert schedule["remaining loan"][-1] == 0
+
+
+def test_amortization_rule_applies_to_total_loan(household):
+    np.testing.assert_allclose(household.loans, [1000000, 1000000, 1200000])
+    assert household.min_amort_rate == rules.min_amort_rate(0.8, 3200000 / 600000)
+    interest = 1000000 * 0.029 / 12 + 1000000 * 0.032 / 12 + 1200000 * 0.035 / 12
+    np.testing.assert_allclose(household.minimum_monthly_payment, interest + 3200000 * 0.03 / 12)
+
+    payments = household.tranche_payments(20000)
+    np.testing.assert_allclose(payments.sum(), 20000)
+    amortization = payments - household.tranche_interest
+    np.testing.assert_allclose(amortization / household.loans, amortization[0] / household.loans[0])
+
+    values = household.simulation_values(20000)
+    np.testing.assert_allclose(values["total_interest"][-1], values["total_interest"][:-1].sum())
+    np.testing.assert_allclose(values["term_y"][-1], values["term_y"][:-1].max())
+
+
+def test_schedule_sums_tranches(household):
+    schedule = household.get_payment_schedule(20000, -1)
+    first_end = int(np.ceil(household.tranche_term_m(20000).min()))
+    payments = schedule["month interest"] + schedule["month amortization"]
+    np.testing.assert_allclose(payments[1:first_end], 20000)
+    np.testing.assert_allclose(schedule["remaining loan"][-1], 0)
+    np.testing.assert_allclose(schedule["total amortized"][-1], 4000000)
+    # total_interest pays the fractional term at the full installment
+    np.testing.assert_allclose(schedule["total interest paid"][-1], household.total_interest(20000), rtol=1e-5)
+    np.testing.assert_allclose(np.diff(schedule["total paid"]), payments[1:], rtol=1e-9, atol=1e-6)
+
+    yearly = household.get_payment_schedule(20000, -1, resolution="year")
+    np.testing.assert_allclose(yearly["remaining loan"], schedule["remaining loan"][yearly["month"]])
+
+
+def test_stacked_households_match_single_households(household):
+    loans = [[1000000, 1000000, 1200000], [2000000, 500000, 0]]
+    rates = [[0.029, 0.032, 0.035], [0.03, 0.04, 0.05]]
+    households = MultiTrancheMortgage([4000000, 3000000], [600000, 500000], loans, rates)
+    payments = [20000, 15000]
+    values = households.simulation_values(payments)
+
+    second = MultiTrancheMortgage(3000000, 500000, [2000000, 500000], [0.03, 0.04])
+    expected = [household.simulation_values(20000), second.simulation_values(15000)]
+    for name in SIMULATION_FIELDS:
+        np.testing.assert_allclose(values[name][0], expected[0][name], rtol=1e-12, err_msg=name)
+        np.testing.assert_allclose(values[name][1, [0, 1, 3]], expected[1][name], rtol=1e-12, err_msg=name)
+
+
+def test_report_has_tranche_and_total_columns(household):
+    report = household.get_report(20000, color=False)
+    titles = [title for title, _ in household.simulations(20000)]
+    assert titles[-1] == TOTAL_TITLE
+    for title in titles:
+        assert title in report
+
+
+def test_tranches_must_fit_the_loan():
+    with pytest.raises(ValueError, match="exceed"):
+        MultiTrancheMortgage.from_tranches(4000000, 800000, 600000, [(4000000, 0.03)])
+    with pytest.raises(ValueError, match="cover"):
+        MultiTrancheMortgage.from_tranches(4000000, 800000, 600000, [(1000000, 0.03)])